@@ -94,7 +94,7 @@ CREATE INDEX IF NOT EXISTS idx_messages_provider_id ON messages(provider_id);
 CREATE INDEX IF NOT EXISTS idx_messages_model_id ON messages(model_id);
 
 -- Ensure only one default provider
-CREATE UNIQUE INDEX idx_provider_configs_default ON provider_configs(is_default) WHERE is_default = TRUE;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_provider_configs_default ON provider_configs(is_default) WHERE is_default = TRUE;
 
 -- Ensure only one default system prompt
-CREATE UNIQUE INDEX idx_system_prompts_default ON system_prompts(is_default) WHERE is_default = TRUE;
\ No newline at end of file
+CREATE UNIQUE INDEX IF NOT EXISTS idx_system_prompts_default ON system_prompts(is_default) WHERE is_default = TRUE;
\ No newline at end of file
@@ -0,0 +1,12 @@
+-- Migration adding composite indexes for hot query paths
+
+-- Keyset pagination of a chat's messages: WHERE chat_id = ? AND timestamp > ? ORDER BY timestamp
+CREATE INDEX IF NOT EXISTS idx_messages_chat_id_timestamp ON messages(chat_id, timestamp);
+
+-- Usage summaries: SUM/COUNT over WHERE user_id = ? [AND provider_id = ?] AND created_at >= ?,
+-- answered from the index alone
+CREATE INDEX IF NOT EXISTS ix_provider_usage_user_provider ON provider_usage(user_id, provider_id)
+    INCLUDE (tokens_total, cost_total, status, created_at);
+
+-- Time-window scans over append-only usage rows; BRIN stays tiny and lets the planner skip old blocks
+CREATE INDEX IF NOT EXISTS ix_provider_usage_created_at_brin ON provider_usage USING brin (created_at);
\ No newline at end of file
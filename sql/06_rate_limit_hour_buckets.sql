@@ -0,0 +1,13 @@
+-- Migration keying rate limit counters by an integer UTC hour bucket
+
+ALTER TABLE rate_limits ADD COLUMN IF NOT EXISTS period_hour BIGINT;
+
+-- Backfill existing counters from their period start
+UPDATE rate_limits SET period_hour = FLOOR(EXTRACT(EPOCH FROM period_start) / 3600)::BIGINT
+WHERE period_hour IS NULL AND period_start IS NOT NULL;
+
+-- Upsert conflict target and equality lookup for the current hour's counter
+CREATE UNIQUE INDEX IF NOT EXISTS uq_rate_limits_user_endpoint_hour ON rate_limits(user_id, endpoint, period_hour);
+
+-- Range scans for the batched cleanup of expired counters
+CREATE INDEX IF NOT EXISTS idx_rate_limits_period_hour ON rate_limits(period_hour);
\ No newline at end of file
@@ -0,0 +1,11 @@
+-- Migration storing SHA-256 hashes of API keys instead of the raw keys
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS api_key_hash BYTEA;
+
+-- Hash existing keys, then drop the raw values
+UPDATE users SET api_key_hash = sha256(convert_to(api_key, 'UTF8'))
+WHERE api_key IS NOT NULL AND api_key_hash IS NULL;
+UPDATE users SET api_key = NULL WHERE api_key_hash IS NOT NULL;
+
+-- API key authentication: WHERE api_key_hash = ?
+CREATE UNIQUE INDEX IF NOT EXISTS uq_users_api_key_hash ON users(api_key_hash);
\ No newline at end of file
@@ -0,0 +1,4 @@
+-- Migration adding a case-insensitive index for provider name lookups
+
+-- Provider resolution: WHERE lower(name) = lower(?)
+CREATE INDEX IF NOT EXISTS idx_provider_configs_lower_name ON provider_configs(lower(name));
\ No newline at end of file
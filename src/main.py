@@ -1,5 +1,5 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Body, Depends, Request
+from fastapi import FastAPI, Body, Depends, Request, Response
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -14,8 +14,9 @@ from utils.provider.manager import ProviderManager
 from utils.system_prompt_db import SystemPromptManagerDB
 from utils.auth import require_api_key
 from utils.config import config
-from utils.database import get_db, engine, Base
+from utils.database import get_db, engine, Base, SessionLocal
 from utils.mcp import MCPHost, MCPConfigLoader
+from utils.repository.provider_repository import UsageFlusher
 from utils.mcp.exceptions import MCPException
 from utils.models.api_models import (
     ChatRequest, 
@@ -63,6 +64,17 @@ async def lifespan(app: FastAPI):
             logger.info("MCP Host shutdown complete")
         except Exception as e:
             logger.error(f"Error during MCP Host shutdown: {e}")
+    
+    # Close pooled provider HTTP clients
+    if hasattr(app.state, 'provider_manager'):
+        await app.state.provider_manager.shutdown()
+    
+    # Write usage rows still queued for the next batch
+    if hasattr(app.state, 'usage_flusher'):
+        try:
+            await app.state.usage_flusher.flush()
+        except Exception as e:
+            logger.error(f"Error flushing usage records: {e}")
 
 def create_app():
     print("=== CREATE_APP CALLED ===")  # Debug: check if function called
@@ -85,7 +97,9 @@ def create_app():
     provider_manager = ProviderManager(mcp_host=mcp_host)
     # For backward compatibility, get the default provider
     # This will be initialized in the lifespan function
-    chat_interface = ChatInterfaceDB(provider_manager=provider_manager)
+    # Batches provider usage writes; drained on shutdown
+    usage_flusher = UsageFlusher(SessionLocal)
+    chat_interface = ChatInterfaceDB(provider_manager=provider_manager, usage_flusher=usage_flusher)
     
     # Create FastAPI app with lifespan
     app = FastAPI(
@@ -116,11 +130,13 @@ def create_app():
     app.state.provider_manager = provider_manager
     app.state.chat_interface = chat_interface
     app.state.mcp_host = mcp_host
+    app.state.usage_flusher = usage_flusher
     
     # Initialize rate limiter
     limiter = Limiter(
         key_func=get_remote_address,
-        default_limits=[f"{config.RATE_LIMIT_PER_HOUR}/hour"]
+        default_limits=[f"{config.RATE_LIMIT_PER_HOUR}/hour"],
+        storage_uri=config.RATE_LIMIT_STORAGE_URI
     )
     app.state.limiter = limiter
     app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
@@ -523,8 +539,14 @@ def create_app():
         """
         Get all system prompts in the library.
         Requires API key authentication.
-        """
-        return SystemPromptManagerDB.handle_get_all_prompts(db)
+        Responses carry an ETag; a matching If-None-Match gets a 304.
+        """
+        etag, body = SystemPromptManagerDB.get_all_prompts_json(db)
+        if etag is None:
+            return Response(content=body, media_type="application/json")
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
     
     @app.post("/system-prompts")
     @limiter.limit(f"{config.RATE_LIMIT_PER_HOUR}/hour")
@@ -5,6 +5,7 @@ import os
 import json
 import uuid
 import re
+import time
 from datetime import datetime
 from typing import Dict, Any, Optional, List, Protocol, Tuple
 from fastapi import HTTPException, Depends
@@ -15,6 +16,7 @@ from utils.database import get_db
 from utils.repository.chat_repository import ChatRepository
 from utils.repository.message_repository import MessageRepository
 from utils.repository.user_repository import UserRepository
+from utils.repository.provider_repository import UsageFlusher
 from utils.system_prompt_db import SystemPromptManagerDB
 from utils.models.db_models import Chat, Message
 from utils.provider.manager import ProviderManager
@@ -45,14 +47,21 @@ class ChatInterfaceDB:
     Handles chat management, persistence, and routing to the appropriate provider.
     """
     
-    def __init__(self, provider: Optional[LLMProvider] = None, provider_manager: Optional[ProviderManager] = None):
+    def __init__(
+        self,
+        provider: Optional[LLMProvider] = None,
+        provider_manager: Optional[ProviderManager] = None,
+        usage_flusher: Optional[UsageFlusher] = None
+    ):
         """
         Initialize with a provider or provider manager
         
         Args:
             provider: The language model provider to use (deprecated, for backward compatibility)
             provider_manager: The provider manager for multi-provider support
+            usage_flusher: Optional batch writer for provider usage records
         """
+        self.usage_flusher = usage_flusher
         if provider_manager:
             self.provider_manager = provider_manager
             self.provider = None  # Will be selected dynamically
@@ -297,8 +306,11 @@ You have access to the following tools through the Model Context Protocol (MCP).
         )
         
         try:
-            # Get all messages for this chat
-            db_messages = message_repo.list_by_chat(chat_uuid)
+            # Get all messages for this chat, one keyset page at a time
+            db_messages, cursor = message_repo.page_by_chat(chat_uuid)
+            while cursor is not None:
+                page, cursor = message_repo.page_by_chat(chat_uuid, after=cursor)
+                db_messages.extend(page)
             
             # Format messages for the provider
             messages = [
@@ -309,10 +321,15 @@ You have access to the following tools through the Model Context Protocol (MCP).
                 for msg in db_messages
             ]
             
+            # Usage record for this completion, completed once the reply is saved
+            usage_record = None
+            
             # Get the provider to use
             if self.provider_manager:
                 # Multi-provider support
                 provider_instance = self.provider_manager.get_provider(provider)
+                provider_config_id = provider_instance.config.id
+                usage_model_id = None
                 
                 # Store provider/model info with the chat if it's new
                 if created_new_chat and provider:
@@ -325,6 +342,7 @@ You have access to the following tools through the Model Context Protocol (MCP).
                     if db_provider and model:
                         db_model = model_repo.get_by_name(db_provider.id, model)
                         if db_model:
+                            usage_model_id = db_model.id
                             chat_repo.update(
                                 chat_uuid,
                                 provider_id=db_provider.id,
@@ -335,7 +353,7 @@ You have access to the following tools through the Model Context Protocol (MCP).
                 
                 # Convert messages to provider format
                 provider_messages = [
-                    ProviderMessage(
+                    ProviderMessage.from_stored(
                         role=MessageRole(msg["role"]),
                         content=msg["content"]
                     )
@@ -343,6 +361,7 @@ You have access to the following tools through the Model Context Protocol (MCP).
                 ]
                 
                 # Use the new provider interface
+                started = time.perf_counter()
                 chat_response = await provider_instance.chat_completion(
                     messages=provider_messages,
                     model=model or "llama3.1:8b-instruct-q8_0",  # Default model
@@ -350,6 +369,17 @@ You have access to the following tools through the Model Context Protocol (MCP).
                     max_tokens=max_tokens
                 )
                 
+                token_usage = chat_response.usage or {}
+                usage_record = {
+                    "user_id": effective_user_id,
+                    "provider_id": uuid.UUID(provider_config_id) if provider_config_id else None,
+                    "model_id": usage_model_id,
+                    "chat_id": chat_uuid,
+                    "tokens_input": token_usage.get("prompt_tokens", 0),
+                    "tokens_output": token_usage.get("completion_tokens", 0),
+                    "latency_ms": int((time.perf_counter() - started) * 1000)
+                }
+                
                 response = {
                     "message": {
                         "content": chat_response.content,
@@ -365,12 +395,16 @@ You have access to the following tools through the Model Context Protocol (MCP).
                 assistant_response = response["message"]["content"]
                 
                 # Add assistant response to chat history
-                message_repo.create_message(
+                assistant_message = message_repo.create_message(
                     chat_id=chat_uuid,
                     role="assistant",
                     content=assistant_response
                 )
                 
+                # Queued and written in batches off the request path
+                if self.usage_flusher is not None and usage_record is not None:
+                    self.usage_flusher.submit(message_id=assistant_message.id, **usage_record)
+                
                 # Update chat's last modified time
                 chat_repo.update(chat_uuid, updated_at=datetime.now())
                 
@@ -13,6 +13,9 @@ class Config:
     
     # Rate Limiting
     RATE_LIMIT_PER_HOUR: int = int(os.getenv("RATE_LIMIT_PER_HOUR", "1000"))
+    # Counter storage for the limiter, e.g. redis://localhost:6379/0 to share
+    # counters across workers; defaults to per-process memory
+    RATE_LIMIT_STORAGE_URI: str = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
     
     # Directory configurations (legacy, kept for migration)
     CHAT_HISTORY_DIR: str = os.getenv("CHAT_HISTORY_DIR", "chats")
@@ -0,0 +1,38 @@
+"""
+JSON helpers that use orjson when it is installed, falling back to the stdlib.
+"""
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so this catches both
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Deserialize JSON from a str or bytes object."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_bytes(obj: Any, indent: bool = False) -> bytes:
+    """Serialize an object to UTF-8 encoded JSON, compact or indented by two spaces."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    if indent:
+        return json.dumps(obj, indent=2).encode()
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> str:
+    """Serialize an object to a compact JSON string."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else None).decode()
+    return json.dumps(obj, separators=(",", ":"), sort_keys=sort_keys)
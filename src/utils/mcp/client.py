@@ -235,6 +235,10 @@ class MCPClient:
             if "inputSchema" in tool_data and "input_schema" not in tool_data:
                 tool_data["input_schema"] = tool_data.pop("inputSchema")
             
+            # Tools annotated as read-only are safe to memoize
+            annotations = tool_data.get("annotations") or {}
+            tool_data.setdefault("cacheable", bool(annotations.get("readOnlyHint", False)))
+            
             tool = Tool(**tool_data)
             self.tools[tool.name] = tool
             
@@ -28,6 +28,8 @@ class Tool(BaseModel):
     name: str
     description: Optional[str] = None
     input_schema: Dict[str, Any]
+    # Read-only tools may have their results reused within a single completion
+    cacheable: bool = False
     
     def get_namespaced_name(self, server_name: str) -> str:
         return f"{server_name}__{self.name}"
@@ -33,14 +33,22 @@ def run_sql_migrations(db: Session):
     # SQL files to run
     sql_files = [
         "sql/03_multi_provider_schema.sql",
-        "sql/04_seed_providers.sql"
+        "sql/04_seed_providers.sql",
+        "sql/05_performance_indexes.sql",
+        "sql/06_rate_limit_hour_buckets.sql",
+        "sql/07_api_key_hashes.sql",
+        "sql/08_provider_name_lower_index.sql"
     ]
     
     # Check if running in Docker
     if os.path.exists("/app/sql"):
         sql_files = [
             "/app/sql/03_multi_provider_schema.sql",
-            "/app/sql/04_seed_providers.sql"
+            "/app/sql/04_seed_providers.sql",
+            "/app/sql/05_performance_indexes.sql",
+            "/app/sql/06_rate_limit_hour_buckets.sql",
+            "/app/sql/07_api_key_hashes.sql",
+            "/app/sql/08_provider_name_lower_index.sql"
         ]
     
     for sql_file in sql_files:
@@ -212,8 +220,7 @@ def migrate_chats(db: Session) -> int:
                     continue
                 
                 # Check if a chat with this custom ID already exists
-                existing = chat_repo.get_by_custom_id(chat_id)
-                if existing:
+                if chat_repo.exists_by_custom_id(chat_id):
                     print(f"Warning: Chat with ID '{chat_id}' already exists, skipping.")
                     continue
                 
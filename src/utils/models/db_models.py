@@ -4,11 +4,11 @@ SQLAlchemy database models for the application.
 import uuid
 from datetime import datetime
 from sqlalchemy import (
-    Column, String, Text, Boolean, Integer, Numeric,
-    ForeignKey, DateTime, CheckConstraint, func, JSON
+    Column, String, Text, Boolean, Integer, BigInteger, Numeric,
+    ForeignKey, DateTime, LargeBinary, CheckConstraint, Index, UniqueConstraint, func, JSON
 )
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 
 from utils.database import Base
 
@@ -20,7 +20,8 @@ class User(Base):
     username = Column(String(100), unique=True, nullable=False)
     email = Column(String(255), unique=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
-    api_key = Column(String(255), unique=True)
+    # SHA-256 of the API key; the raw key is never stored
+    api_key_hash = Column(LargeBinary(32), unique=True)
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -52,7 +53,9 @@ class Chat(Base):
     
     # Relationships
     user = relationship("User", back_populates="chats")
-    messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
+    messages = relationship(
+        "Message", back_populates="chat", cascade="all, delete-orphan", order_by="Message.timestamp"
+    )
     provider = relationship("ProviderConfig", back_populates="chats")
     model = relationship("ProviderModel", back_populates="chats")
 
@@ -100,10 +103,16 @@ class RateLimit(Base):
     endpoint = Column(String(255), nullable=False)
     request_count = Column(Integer, default=0)
     period_start = Column(DateTime(timezone=True), server_default=func.now())
+    # UTC hour bucket (epoch seconds // 3600), the counter's lookup key
+    period_hour = Column(BigInteger)
     
     # Unique constraint
     __table_args__ = (
         CheckConstraint("user_id IS NOT NULL"),
+        UniqueConstraint("user_id", "endpoint", "period_start"),
+        UniqueConstraint("user_id", "endpoint", "period_hour", name="uq_rate_limits_user_endpoint_hour"),
+        # Lets the batched cleanup find expired counters without a full scan
+        Index("idx_rate_limits_period_hour", "period_hour"),
     )
     
     # Relationships
@@ -125,7 +134,15 @@ class ProviderConfig(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
-    # No restrictive constraints - let providers be flexible
+    # At most one default provider (matches idx_provider_configs_default);
+    # case-insensitive name lookups (matches idx_provider_configs_lower_name)
+    __table_args__ = (
+        Index(
+            "idx_provider_configs_default", "is_default",
+            unique=True, postgresql_where=(is_default == True)
+        ),
+        Index("idx_provider_configs_lower_name", func.lower(name)),
+    )
     
     # Relationships
     models = relationship("ProviderModel", back_populates="provider", cascade="all, delete-orphan")
@@ -173,12 +190,19 @@ class ProviderUsage(Base):
     cost_total = Column(Numeric(10, 6), default=0)
     latency_ms = Column(Integer)
     status = Column(String(50), default="success")
-    error_message = Column(Text)
+    # Only read when inspecting a failure, so row loads leave it out
+    error_message = deferred(Column(Text))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Check constraint for status
     __table_args__ = (
         CheckConstraint(status.in_(["success", "error", "timeout", "cancelled"])),
+        # Covers the usage summary aggregate so it can run as an index-only scan
+        Index(
+            "ix_provider_usage_user_provider", "user_id", "provider_id",
+            postgresql_include=["tokens_total", "cost_total", "status", "created_at"]
+        ),
+        Index("ix_provider_usage_created_at_brin", "created_at", postgresql_using="brin"),
     )
     
     # Relationships
@@ -82,7 +82,8 @@ class AnthropicProvider(BaseProvider):
             )
             return True
         except Exception as e:
-            if "authentication" in str(e).lower() or "api key" in str(e).lower():
+            error_str = str(e).lower()
+            if "authentication" in error_str or "api key" in error_str:
                 raise ProviderAuthenticationError(
                     f"Invalid API key for Anthropic",
                     provider=self.name
@@ -135,8 +136,7 @@ class AnthropicProvider(BaseProvider):
         anthropic_messages = []
         
         for msg in messages:
-            # Handle both string and enum roles
-            role_value = msg.role.value if hasattr(msg.role, 'value') else str(msg.role)
+            role_value = msg.role_str
             
             if msg.role == MessageRole.SYSTEM or role_value == "system":
                 # Anthropic uses a separate system parameter, not a message role
@@ -2,13 +2,59 @@
 Base provider infrastructure for multi-provider support.
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, AsyncGenerator, Union
-from dataclasses import dataclass
-from datetime import datetime
+from typing import List, Dict, Any, Optional, AsyncGenerator, AsyncIterator, Union, Tuple, Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from collections import OrderedDict
+from operator import attrgetter
 import asyncio
+import hashlib
+import time
+import secrets
 from enum import Enum
 
-from pydantic import BaseModel, Field, ConfigDict
+import httpx
+from pydantic import BaseModel, Field, ConfigDict, computed_field, model_validator
+
+from utils import json_utils
+
+# Connection pool sizing shared by provider HTTP clients; keeps idle
+# connections alive so concurrent requests avoid new handshakes
+HTTP_LIMITS = httpx.Limits(max_connections=256, max_keepalive_connections=64, keepalive_expiry=30.0)
+
+# Fetches (role, content) from a Message in one C-level call
+role_and_content = attrgetter("role_str", "content")
+
+# How many trailing messages a conversation may add and still reuse a
+# previously prepared prefix
+_PREFIX_MAX_TAIL = 4
+
+
+# Tool schema digests by id(tools): (tools, digest). The entry holds a reference
+# to the list so its id cannot be reused by another object while cached.
+_TOOLS_DIGESTS: "OrderedDict[int, Tuple[Any, str]]" = OrderedDict()
+_TOOLS_DIGESTS_SIZE = 32
+
+
+def tools_digest(tools: List[Dict[str, Any]]) -> str:
+    """
+    Return a digest of a tool schema list, serialized once per list object.
+    
+    Callers must not mutate a tools list in place after passing it.
+    """
+    key = id(tools)
+    entry = _TOOLS_DIGESTS.get(key)
+    if entry is not None and entry[0] is tools:
+        _TOOLS_DIGESTS.move_to_end(key)
+        return entry[1]
+    
+    digest = hashlib.blake2b(
+        json_utils.dumps(tools, sort_keys=True).encode(), digest_size=16
+    ).hexdigest()
+    _TOOLS_DIGESTS[key] = (tools, digest)
+    if len(_TOOLS_DIGESTS) > _TOOLS_DIGESTS_SIZE:
+        _TOOLS_DIGESTS.popitem(last=False)
+    return digest
 
 
 class MessageRole(str, Enum):
@@ -16,6 +62,7 @@ class MessageRole(str, Enum):
     SYSTEM = "system"
     USER = "user"
     ASSISTANT = "assistant"
+    TOOL = "tool"
 
 
 class ProviderError(Exception):
@@ -47,16 +94,47 @@ class ProviderModelNotFoundError(ProviderError):
     pass
 
 
-@dataclass
+def parse_structured_content(content: Any) -> Optional[Dict[str, Any]]:
+    """
+    Decode message content shaped like a JSON object.
+    
+    Surrounding whitespace is ignored, as it is by the JSON parser itself.
+    
+    Returns:
+        The decoded dict, or None for plain text and invalid JSON
+    """
+    if not isinstance(content, str):
+        return None
+    stripped = content.strip()
+    if not (len(stripped) >= 2 and stripped[0] == "{" and stripped[-1] == "}"):
+        return None
+    try:
+        parsed = json_utils.loads(stripped)
+    except json_utils.JSONDecodeError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+@dataclass(slots=True)
 class Message:
     """Message format for all providers."""
     role: MessageRole
     content: str
+    # Pre-parsed structured (tool/assistant JSON) content, if any
+    structured: Optional[Dict[str, Any]] = field(default=None, repr=False, compare=False)
+    # Plain string role value, resolved once at construction
+    role_str: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        """Normalize string roles once so consumers can rely on MessageRole."""
+        if not isinstance(self.role, MessageRole):
+            self.role = MessageRole(self.role)
+        self.role_str = self.role.value
     
     def to_dict(self) -> Dict[str, str]:
         """Convert to dictionary."""
         return {
-            "role": self.role.value if isinstance(self.role, MessageRole) else self.role,
+            "role": self.role_str,
             "content": self.content
         }
     
@@ -67,6 +145,11 @@ class Message:
             role=MessageRole(data["role"]),
             content=data["content"]
         )
+    
+    @classmethod
+    def from_stored(cls, role: Union[MessageRole, str], content: str) -> "Message":
+        """Create from stored content, parsing structured payloads once up front."""
+        return cls(role=role, content=content, structured=parse_structured_content(content))
 
 
 class ProviderConfig(BaseModel):
@@ -96,16 +179,17 @@ class ProviderConfig(BaseModel):
     )
 
 
-class ModelInfo(BaseModel):
-    """Model information."""
-    model_name: str = Field(..., description="Model identifier")
-    display_name: str = Field(..., description="Display name")
-    description: Optional[str] = Field(None, description="Model description")
-    context_window: Optional[int] = Field(None, description="Context window size")
-    max_tokens: Optional[int] = Field(None, description="Maximum output tokens")
-    supports_streaming: bool = Field(True, description="Supports streaming")
-    supports_functions: bool = Field(False, description="Supports function calling")
-    capabilities: Dict[str, bool] = Field(default_factory=dict, description="Model capabilities")
+@dataclass(slots=True)
+class ModelInfo:
+    """Model information (validated by pydantic only at the API response boundary)."""
+    model_name: str  # Model identifier
+    display_name: str
+    description: Optional[str] = None
+    context_window: Optional[int] = None  # Context window size
+    max_tokens: Optional[int] = None  # Maximum output tokens
+    supports_streaming: bool = True
+    supports_functions: bool = False  # Supports function calling
+    capabilities: Dict[str, bool] = field(default_factory=dict)
 
 
 class ChatResponse(BaseModel):
@@ -116,9 +200,32 @@ class ChatResponse(BaseModel):
     role: str = Field(default="assistant", description="Response role")
     finish_reason: Optional[str] = Field(None, description="Finish reason")
     usage: Optional[Dict[str, int]] = Field(None, description="Token usage")
-    created_at: datetime = Field(default_factory=datetime.now, description="Creation timestamp")
+    # Internal storage for created_at; left out of serialized output
+    created_at_ts: float = Field(default_factory=time.time, exclude=True, description="Creation time (epoch seconds)")
     tool_calls: Optional[List[Dict[str, Any]]] = Field(None, description="Tool calls if any")
     
+    @model_validator(mode="before")
+    @classmethod
+    def _accept_created_at(cls, data: Any) -> Any:
+        """Accept a created_at datetime for backward compatibility."""
+        if isinstance(data, dict) and "created_at" in data:
+            data = dict(data)
+            created_at = data.pop("created_at")
+            if isinstance(created_at, datetime):
+                data.setdefault("created_at_ts", created_at.timestamp())
+        return data
+    
+    @computed_field(description="Creation timestamp")
+    @property
+    def created_at(self) -> datetime:
+        """
+        Creation timestamp, materialized only when read.
+        
+        This is a timezone-aware UTC datetime; before it was derived from
+        created_at_ts it was a naive local-time datetime.now().
+        """
+        return datetime.fromtimestamp(self.created_at_ts, tz=timezone.utc)
+    
     model_config = ConfigDict(
         json_schema_extra={
             "example": {
@@ -137,12 +244,76 @@ class ChatResponse(BaseModel):
     )
 
 
-class StreamChunk(BaseModel):
-    """Stream chunk for streaming responses."""
-    content: str = Field(..., description="Chunk content")
-    is_final: bool = Field(False, description="Whether this is the final chunk")
-    finish_reason: Optional[str] = Field(None, description="Finish reason if final")
-    usage: Optional[Dict[str, int]] = Field(None, description="Token usage if final")
+@dataclass(slots=True)
+class StreamChunk:
+    """Stream chunk for streaming responses (built per token, so kept lightweight)."""
+    content: str
+    is_final: bool = False
+    finish_reason: Optional[str] = None  # Set on the final chunk
+    usage: Optional[Dict[str, int]] = None  # Token usage, set on the final chunk
+
+
+async def coalesce_stream_chunks(
+    chunks: AsyncIterator[StreamChunk],
+    min_batch_size: int = 1,
+    max_batch_size: int = 32,
+    growth_factor: float = 2.0,
+    max_delay: float = 0.005,
+    max_chars: Optional[int] = None
+) -> AsyncGenerator[StreamChunk, None]:
+    """
+    Merge consecutive stream chunks into fewer, larger ones.
+    
+    The batch size starts at min_batch_size and grows by growth_factor after
+    each flush up to max_batch_size, so the first tokens are sent right away
+    and later ones are batched. A batch is also flushed when a chunk arrives
+    max_delay seconds or more after the batch started. When max_chars is set,
+    batches are flushed once they hold that many characters instead of by
+    chunk count. Pending content is merged into the final chunk.
+    
+    Args:
+        chunks: Provider stream to coalesce
+        min_batch_size: Chunks per batch at the start of the stream
+        max_batch_size: Upper bound on chunks per batch
+        growth_factor: Batch size multiplier applied after each flush
+        max_delay: Seconds after which a partial batch is flushed
+        max_chars: Characters per batch; replaces the chunk-count policy
+    """
+    parts: List[str] = []
+    size = 0
+    batch_size = min_batch_size
+    started = 0.0
+    
+    async for chunk in chunks:
+        if chunk.is_final:
+            parts.append(chunk.content)
+            content = "".join(parts)
+            parts = []
+            size = 0
+            yield StreamChunk(
+                content=content,
+                is_final=True,
+                finish_reason=chunk.finish_reason,
+                usage=chunk.usage
+            )
+            continue
+        
+        if not parts:
+            started = time.perf_counter()
+        parts.append(chunk.content)
+        size += len(chunk.content)
+        
+        full = size >= max_chars if max_chars is not None else len(parts) >= batch_size
+        if full or time.perf_counter() - started >= max_delay:
+            content = "".join(parts)
+            parts = []
+            size = 0
+            batch_size = min(max_batch_size, max(batch_size + 1, int(batch_size * growth_factor)))
+            yield StreamChunk(content=content)
+    
+    if parts:
+        content = "".join(parts)
+        yield StreamChunk(content=content)
 
 
 class BaseProvider(ABC):
@@ -154,12 +325,35 @@ class BaseProvider(ABC):
         self.name = config.name
         self.display_name = config.display_name
         self._initialized = False
+        self._init_lock = asyncio.Lock()
+        
+        # Opt-in exact-match cache for deterministic completions
+        self._response_cache_size = (
+            config.config.get("response_cache_size", 1024)
+            if config.config.get("response_cache", False) else 0
+        )
+        self._response_cache_ttl = config.config.get("response_cache_ttl", 3600)
+        self._response_cache: "OrderedDict[bytes, Tuple[float, ChatResponse]]" = OrderedDict()
+        self._response_cache_lock = asyncio.Lock()
+        
+        # Opt-in cache of prepared message lists keyed by conversation
+        # (role, content) pairs
+        self._prefix_cache_size = (
+            config.config.get("prefix_cache_size", 256)
+            if config.config.get("prefix_cache", False) else 0
+        )
+        self._prefix_cache: "OrderedDict[Tuple[Tuple[str, str], ...], List[Dict[str, Any]]]" = OrderedDict()
     
     async def initialize(self):
-        """Initialize the provider (async setup)."""
-        if not self._initialized:
-            await self._initialize()
-            self._initialized = True
+        """Initialize the provider (async setup), once even under concurrent callers."""
+        if self._initialized:
+            return
+        # Single-flight: a burst of first requests shares one _initialize() run
+        # instead of each building its own client
+        async with self._init_lock:
+            if not self._initialized:
+                await self._initialize()
+                self._initialized = True
     
     @abstractmethod
     async def _initialize(self):
@@ -211,6 +405,47 @@ class BaseProvider(ABC):
         """Prepare messages for API call."""
         return [msg.to_dict() for msg in messages]
     
+    def _prepare_with_prefix_cache(
+        self,
+        messages: List[Message],
+        prepare: Callable[[List[Message]], List[Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Prepare messages, reusing the prepared form of an earlier conversation.
+        
+        Successive turns of a chat extend the previous request by a few messages
+        (assistant reply, user prompt, tool results), so only that tail is
+        prepared when the rest was seen before. Cached dicts are shared between
+        calls and must not be mutated.
+        
+        Args:
+            messages: Messages to prepare
+            prepare: Provider-specific conversion for a list of messages
+            
+        Returns:
+            Newly built list of prepared messages
+        """
+        if not self._prefix_cache_size:
+            return prepare(messages)
+        
+        pairs = tuple(map(role_and_content, messages))
+        cache = self._prefix_cache
+        for tail in range(min(_PREFIX_MAX_TAIL, len(pairs) - 1) + 1):
+            key = pairs[:len(pairs) - tail]
+            prefix = cache.get(key)
+            if prefix is not None:
+                cache.move_to_end(key)
+                prepared = prefix + prepare(messages[len(messages) - tail:])
+                break
+        else:
+            prepared = prepare(messages)
+        
+        if pairs not in cache:
+            cache[pairs] = prepared.copy()
+            if len(cache) > self._prefix_cache_size:
+                cache.popitem(last=False)
+        return prepared
+    
     async def _handle_error(self, error: Exception, provider_name: str):
         """Handle provider-specific errors."""
         if isinstance(error, asyncio.TimeoutError):
@@ -224,4 +459,58 @@ class BaseProvider(ABC):
             raise ProviderError(
                 f"Unexpected error: {str(error)}",
                 provider=provider_name
-            )
\ No newline at end of file
+            )
+    
+    def _response_cache_key(self, request: Dict[str, Any], deterministic: bool) -> Optional[bytes]:
+        """
+        Build the response cache key for a provider request payload.
+        
+        Args:
+            request: Provider-specific request parameters (model, messages, options, ...)
+            deterministic: Whether the request is expected to give repeatable output
+            
+        Returns:
+            BLAKE2b digest of the canonical request, or None if it should not be cached
+        """
+        if not self._response_cache_size or not deterministic:
+            return None
+        tools = request.get("tools")
+        if tools:
+            # Agent loops resend the same tool schemas every turn; fold them in
+            # as a memoized digest instead of re-serializing them
+            request = {**request, "tools": tools_digest(tools)}
+        try:
+            payload = json_utils.dumps([self.name, request], sort_keys=True)
+        except TypeError:
+            return None
+        return hashlib.blake2b(payload.encode(), digest_size=16).digest()
+    
+    async def _get_cached_response(self, key: bytes, created_at_ts: Optional[float] = None) -> Optional[ChatResponse]:
+        """Return a fresh copy of a cached response, if present and not expired."""
+        async with self._response_cache_lock:
+            entry = self._response_cache.get(key)
+            if entry is None:
+                return None
+            stored_at, cached = entry
+            if time.monotonic() - stored_at >= self._response_cache_ttl:
+                del self._response_cache[key]
+                return None
+            self._response_cache.move_to_end(key)
+        
+        response = cached.model_copy(
+            deep=True,
+            update={"id": f"{self.name}-{secrets.token_hex(12)}", "created_at_ts": created_at_ts or time.time()}
+        )
+        if response.tool_calls:
+            id_base = secrets.token_hex(12)
+            for i, tool_call in enumerate(response.tool_calls):
+                tool_call["id"] = f"{self.name}-{id_base}-{i}"
+        return response
+    
+    async def _store_cached_response(self, key: bytes, response: ChatResponse):
+        """Store a response in the LRU cache, evicting the oldest entry when full."""
+        async with self._response_cache_lock:
+            self._response_cache[key] = (time.monotonic(), response.model_copy(deep=True))
+            self._response_cache.move_to_end(key)
+            if len(self._response_cache) > self._response_cache_size:
+                self._response_cache.popitem(last=False)
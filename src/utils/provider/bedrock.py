@@ -272,8 +272,7 @@ class BedrockProvider(BaseProvider):
         converse_messages = []
         
         for i, msg in enumerate(messages):
-            # Handle both string and enum roles
-            role_value = msg.role.value if hasattr(msg.role, 'value') else str(msg.role)
+            role_value = msg.role_str
             
             logger.debug(f"Processing message {i}: role={role_value}, content_preview={str(msg.content)[:100]}...")
             
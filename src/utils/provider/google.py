@@ -157,8 +157,7 @@ class GoogleProvider(BaseProvider):
         contents = []
         
         for msg in messages:
-            # Handle both string and enum roles
-            role_value = msg.role.value if hasattr(msg.role, 'value') else str(msg.role)
+            role_value = msg.role_str
             
             if msg.role == MessageRole.SYSTEM or role_value == "system":
                 # Google uses system_instruction parameter for system messages
@@ -147,7 +147,8 @@ class ProviderManager:
         try:
             # Create provider instance
             provider_class = self._provider_classes[provider_type]
-            provider = provider_class(config)
+            # Providers with an instance registry hand back a shared instance
+            provider = getattr(provider_class, "shared", provider_class)(config)
             
             # Initialize the provider
             await provider.initialize()
@@ -275,4 +276,14 @@ class ProviderManager:
                 except Exception as e:
                     logger.error(f"Health check failed for provider '{provider_name}': {e}")
                     results[provider_name] = False
-            return results
\ No newline at end of file
+            return results
+    
+    async def shutdown(self):
+        """Close HTTP clients pooled across provider instances."""
+        for provider_class in (OllamaProvider, OpenAIProvider):
+            if provider_class is None:
+                continue
+            try:
+                await provider_class.aclose_all()
+            except Exception as e:
+                logger.error(f"Failed to close {provider_class.__name__} clients: {e}")
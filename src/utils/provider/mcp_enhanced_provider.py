@@ -3,7 +3,8 @@ MCP-enhanced provider wrapper that adds MCP tool capabilities to any base provid
 """
 import json
 import logging
-from typing import List, Dict, Any, Optional, AsyncGenerator
+from dataclasses import replace
+from typing import List, Dict, Any, Optional, AsyncGenerator, Tuple
 
 from .base import BaseProvider, Message, ChatResponse, StreamChunk, ModelInfo
 from ..mcp import MCPHost
@@ -36,6 +37,8 @@ class MCPEnhancedProvider(BaseProvider):
         self.mcp_host = mcp_host
         self.display_name = f"{base_provider.display_name} (MCP Enhanced)"
         self._initialized = False
+        self._tool_cache_hits = 0
+        self._tool_cache_misses = 0
     
     async def _initialize(self):
         """Initialize both base provider and MCP host."""
@@ -58,12 +61,16 @@ class MCPEnhancedProvider(BaseProvider):
         """List available models - delegates to base provider."""
         models = await self.base_provider.list_models()
         
-        # Update model capabilities to indicate MCP tool support
-        for model in models:
-            model.supports_functions = True
-            model.capabilities["mcp_tools"] = True
-        
-        return models
+        # Update model capabilities to indicate MCP tool support. Copies are
+        # returned since base providers may cache their ModelInfo objects.
+        return [
+            replace(
+                model,
+                supports_functions=True,
+                capabilities={**model.capabilities, "mcp_tools": True}
+            )
+            for model in models
+        ]
     
     async def chat_completion(
         self,
@@ -99,23 +106,26 @@ class MCPEnhancedProvider(BaseProvider):
         # Track all tool executions for the response
         all_tool_executions = []
         
+        # Results of cacheable tool calls, scoped to this completion
+        tool_cache: Dict[Tuple[str, str], ToolResult] = {}
+        
         # Implement the multi-tool chaining loop
-        while True:
-            # Check if we need to continue with tool execution
-            if not self._is_pending_tool_use(response):
-                # No more tools needed, add tool execution info to final response
-                if all_tool_executions:
-                    # Add tool execution summary to the response
-                    enhanced_response = self._enhance_response_with_tool_info(response, all_tool_executions)
-                    return enhanced_response
-                return response
-            
+        while self._is_pending_tool_use(response):
             # Extract tool calls from response
             tool_calls = self._extract_tool_calls(response)
+            if not tool_calls:
+                # Malformed response: tool use signalled without any calls.
+                # Treat as terminal rather than re-querying the model forever.
+                logger.warning(
+                    f"Response signalled tool use (finish_reason={response.finish_reason}) "
+                    "but contained no tool calls; ending tool loop"
+                )
+                break
+            
             logger.info(f"Executing {len(tool_calls)} tool calls via MCP")
             
             # Execute tool calls via MCP
-            tool_results = await self._execute_mcp_tools(tool_calls)
+            tool_results = await self._execute_mcp_tools(tool_calls, tool_cache)
             
             # Track this execution round
             execution_round = {
@@ -138,6 +148,9 @@ class MCPEnhancedProvider(BaseProvider):
             
             logger.info(f"Continuing loop - response finish_reason: {response.finish_reason}")
         
+        # No more tools needed, add tool execution info to final response
+        if all_tool_executions:
+            return self._enhance_response_with_tool_info(response, all_tool_executions)
         return response
     
     async def chat_completion_stream(
@@ -161,19 +174,21 @@ class MCPEnhancedProvider(BaseProvider):
         if mcp_tools:
             kwargs['tools'] = self._convert_mcp_tools_to_provider_format(mcp_tools)
         
-        # Buffer to collect streaming response
-        buffered_content = ""
+        # Buffer to collect streaming response (joined once at the final chunk)
+        buffered_parts: List[str] = []
         buffered_chunks = []
         
         # Stream initial response
         async for chunk in self.base_provider.chat_completion_stream(
             messages, model, temperature, max_tokens, **kwargs
         ):
-            buffered_content += chunk.content
+            buffered_parts.append(chunk.content)
             buffered_chunks.append(chunk)
             
             # If this is the final chunk, check for tool calls
             if chunk.is_final:
+                buffered_content = "".join(buffered_parts)
+                
                 # Create a mock response to check for tool calls
                 mock_response = ChatResponse(
                     id="stream-buffer",
@@ -246,9 +261,21 @@ class MCPEnhancedProvider(BaseProvider):
         
         return []
     
-    async def _execute_mcp_tools(self, tool_calls: List[Dict[str, Any]]) -> List[ToolResult]:
-        """Execute tool calls via MCP host."""
+    async def _execute_mcp_tools(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        tool_cache: Optional[Dict[Tuple[str, str], ToolResult]] = None
+    ) -> List[ToolResult]:
+        """
+        Execute tool calls via MCP host.
+        
+        Args:
+            tool_calls: Tool calls extracted from the provider response
+            tool_cache: Optional cache of results for cacheable tools, keyed by
+                tool name and canonical arguments
+        """
         results = []
+        available_tools = self.mcp_host.get_all_tools() if tool_cache is not None else {}
         
         for tool_call in tool_calls:
             # Handle different tool call formats (OpenAI vs Ollama vs Anthropic)
@@ -274,11 +301,26 @@ class MCPEnhancedProvider(BaseProvider):
                 logger.warning(f"Tool call missing name: {tool_call}")
                 continue
             
+            cache_key = None
+            tool = available_tools.get(tool_name)
+            if tool is not None and tool.cacheable:
+                cache_key = (tool_name, json.dumps(arguments, sort_keys=True, default=str))
+                cached = tool_cache.get(cache_key)
+                if cached is not None:
+                    self._tool_cache_hits += 1
+                    logger.debug(f"Reusing cached result for MCP tool {tool_name}")
+                    results.append(cached)
+                    continue
+                self._tool_cache_misses += 1
+            
             try:
                 # Execute tool via MCP host
                 result = await self.mcp_host.call_tool(tool_name, arguments)
                 results.append(result)
                 
+                if cache_key is not None and not result.is_error:
+                    tool_cache[cache_key] = result
+                
                 logger.info(f"Executed MCP tool {tool_name} successfully")
                 
             except MCPException as e:
@@ -305,6 +347,15 @@ class MCPEnhancedProvider(BaseProvider):
             "available_prompts": self.mcp_host.get_prompt_count()
         }
     
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get hit/miss statistics for the per-completion tool result cache."""
+        lookups = self._tool_cache_hits + self._tool_cache_misses
+        return {
+            "hits": self._tool_cache_hits,
+            "misses": self._tool_cache_misses,
+            "hit_rate": self._tool_cache_hits / lookups if lookups > 0 else 0
+        }
+    
     def _enhance_response_with_tool_info(self, response: ChatResponse, tool_executions: List[Dict[str, Any]]) -> ChatResponse:
         """Enhance the response with tool execution information."""
         # Build tool execution summary
@@ -341,7 +392,7 @@ class MCPEnhancedProvider(BaseProvider):
             role=response.role,
             finish_reason=response.finish_reason,
             usage=response.usage,
-            created_at=response.created_at,
+            created_at_ts=response.created_at_ts,
             tool_calls=response.tool_calls
         )
         
@@ -417,7 +468,8 @@ class MCPEnhancedProvider(BaseProvider):
             }
             messages.append(Message(
                 role="assistant",
-                content=json.dumps(assistant_message)  # Will be parsed by OpenAI provider
+                content=json.dumps(assistant_message),  # Will be parsed by OpenAI provider
+                structured=assistant_message
             ))
         elif isinstance(self.base_provider, OllamaProvider):
             # For Ollama, convert tool calls to Ollama format (dict arguments, not JSON strings)
@@ -443,7 +495,8 @@ class MCPEnhancedProvider(BaseProvider):
             }
             messages.append(Message(
                 role="assistant",
-                content=json.dumps(assistant_message)  # Will be parsed by Ollama provider
+                content=json.dumps(assistant_message),  # Will be parsed by Ollama provider
+                structured=assistant_message
             ))
         elif isinstance(self.base_provider, GoogleProvider):
             # For Google, we need to create structured content with function calls
@@ -454,7 +507,8 @@ class MCPEnhancedProvider(BaseProvider):
             
             messages.append(Message(
                 role="assistant",
-                content=json.dumps(google_content)  # Will be parsed by Google provider
+                content=json.dumps(google_content),  # Will be parsed by Google provider
+                structured=google_content
             ))
         elif isinstance(self.base_provider, BedrockProvider):
             # For Bedrock, we need to reconstruct the content blocks with text and toolUse
@@ -541,42 +595,45 @@ class MCPEnhancedProvider(BaseProvider):
                 
                 if isinstance(self.base_provider, OpenAIProvider):
                     # OpenAI requires tool_call_id in tool messages
-                    message_content = json.dumps({
+                    tool_message = {
                         "role": "tool",
                         "content": str(result.content),
                         "tool_call_id": tool_call_id
-                    })
+                    }
                     messages.append(Message(
                         role="tool",
-                        content=message_content
+                        content=json.dumps(tool_message),
+                        structured=tool_message
                     ))
                 elif isinstance(self.base_provider, OllamaProvider):
                     # Ollama uses tool messages with name but no tool_call_id
                     tool_call = tool_calls[i] if i < len(tool_calls) else tool_calls[0]
                     function_name = tool_call["function"]["name"]
                     
-                    message_content = json.dumps({
+                    tool_message = {
                         "role": "tool",
                         "content": str(result.content),
                         "name": function_name
-                    })
+                    }
                     messages.append(Message(
                         role="tool",
-                        content=message_content
+                        content=json.dumps(tool_message),
+                        structured=tool_message
                     ))
                 elif isinstance(self.base_provider, GoogleProvider):
                     # Google uses tool messages with name for function responses
                     tool_call = tool_calls[i] if i < len(tool_calls) else tool_calls[0]
                     function_name = tool_call["function"]["name"]
                     
-                    message_content = json.dumps({
+                    tool_message = {
                         "role": "tool",
                         "content": str(result.content),
                         "name": function_name
-                    })
+                    }
                     messages.append(Message(
                         role="tool",
-                        content=message_content
+                        content=json.dumps(tool_message),
+                        structured=tool_message
                     ))
                 else:
                     # Other providers
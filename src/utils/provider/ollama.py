@@ -2,27 +2,79 @@
 Ollama provider implementation.
 """
 import os
-import json
-import uuid
-from typing import Dict, Any, List, Optional, AsyncGenerator
-from datetime import datetime
+import time
+import secrets
+import logging
+from types import MappingProxyType
+from typing import ClassVar, Dict, Any, List, Optional, AsyncGenerator, Tuple
 import asyncio
 
-import ollama
+import httpx
 from ollama import AsyncClient, ResponseError
 
+from utils import json_utils
 from .base import (
     BaseProvider, ProviderConfig, Message, ChatResponse, StreamChunk,
     ModelInfo, ProviderError, ProviderTimeoutError, ProviderModelNotFoundError,
-    MessageRole
+    MessageRole, parse_structured_content, HTTP_LIMITS, role_and_content,
+    coalesce_stream_chunks
 )
 
+logger = logging.getLogger(__name__)
+
+# Shared default for missing stream chunk messages; never mutated
+_EMPTY: Dict[str, Any] = {}
+
+# Request kwargs passed through to Ollama as model options
+_ALLOWED_OPT_KEYS = frozenset({"top_p", "top_k", "seed"})
+
+# Ollama doesn't report these per model, so every ModelInfo gets the same
+# defaults. ModelInfo is a plain dataclass, so each model needs its own
+# capabilities dict (see list_models).
+_DEFAULT_CAPS: Dict[str, bool] = {"chat": True, "code": True, "reasoning": True}
+_MODEL_TEMPLATE_KWARGS = MappingProxyType({
+    "context_window": 128000,
+    "max_tokens": 128000,
+    "supports_streaming": True,
+    "supports_functions": True
+})
+
+
+def _coerce_tool_call(tool_call: Any) -> Optional[Dict[str, str]]:
+    """
+    Normalize an Ollama tool call (SDK object or dict) to a standard function dict.
+    
+    Ollama returns arguments as a dict; the standard format uses a JSON string.
+    Returns None if the tool call has no function.
+    """
+    if isinstance(tool_call, dict):
+        function = tool_call.get("function")
+        if not function:
+            return None
+        name = function["name"]
+        arguments = function.get("arguments", {})
+    else:
+        function = getattr(tool_call, "function", None)
+        if function is None:
+            return None
+        name = function.name
+        arguments = getattr(function, "arguments", None) or {}
+    
+    return {
+        "name": name,
+        "arguments": arguments if isinstance(arguments, str) else json_utils.dumps(arguments)
+    }
+
 
 class OllamaProvider(BaseProvider):
     """
     Provider implementation for Ollama LLM service.
     """
     
+    # Clients shared across instances, keyed by (base_url, timeout), so every
+    # provider talking to the same server uses one connection pool
+    _client_pool: ClassVar[Dict[Tuple[str, Any], AsyncClient]] = {}
+    
     def __init__(self, config: Optional[ProviderConfig] = None):
         """
         Initialize the Ollama provider.
@@ -47,12 +99,31 @@ class OllamaProvider(BaseProvider):
         self.base_url = config.base_url or "http://localhost:11434"
         self.timeout = config.config.get("timeout", 30)
         
+        # Model list cache: (fetched_at monotonic time, models)
+        self._models_cache: Optional[Tuple[float, List[ModelInfo]]] = None
+        self._models_ttl = config.config.get("models_cache_ttl", 60)
+        self._models_refresh: Optional[asyncio.Task] = None
+        
         # For backward compatibility
         self.model_name = "llama3.1:8b-instruct-q8_0"
     
     async def _initialize(self):
-        """Initialize Ollama client."""
-        self.client = AsyncClient(host=self.base_url, timeout=self.timeout)
+        """Initialize Ollama client, reusing a pooled client for the same server."""
+        key = (self.base_url, self.timeout)
+        client = self._client_pool.get(key)
+        if client is None:
+            client = self._client_pool[key] = AsyncClient(
+                host=self.base_url, timeout=self.timeout, limits=HTTP_LIMITS
+            )
+        self.client = client
+    
+    @classmethod
+    async def aclose_all(cls):
+        """Close all pooled clients. Call on application shutdown."""
+        clients = list(cls._client_pool.values())
+        cls._client_pool.clear()
+        for client in clients:
+            await client.close()
     
     async def validate_config(self) -> bool:
         """Validate Ollama configuration by checking connectivity."""
@@ -70,96 +141,113 @@ class OllamaProvider(BaseProvider):
             )
     
     async def list_models(self) -> List[ModelInfo]:
-        """List available Ollama models."""
+        """
+        List available Ollama models.
+        
+        Results are cached for models_cache_ttl seconds. Once stale, the cached
+        list is still returned immediately while a background refresh runs.
+        """
         try:
             if not self.client:
                 await self.initialize()
             
-            response = await self.client.list()
-            models = []
-            
-            # Debug logging
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.info(f"Ollama list response type: {type(response)}")
-            logger.info(f"Ollama list response: {response}")
-            
-            # Handle response as object with models attribute
-            model_list = response.models if hasattr(response, 'models') else response.get("models", [])
-            
-            for model in model_list:
-                # Handle model as object or dict
-                if hasattr(model, 'model'):
-                    # Ollama uses 'model' attribute, not 'name'
-                    name = model.model
-                    details = model.details if hasattr(model, 'details') else {}
-                else:
-                    name = model.get("model", model.get("name", ""))
-                    details = model.get("details", {})
-                
-                model_info = ModelInfo(
-                    model_name=name,
-                    display_name=name.replace(":", " "),
-                    description=f"Ollama model: {name}",
-                    context_window=128000,  # Default context window
-                    max_tokens=128000,  # Ollama doesn't provide this, using default
-                    supports_streaming=True,
-                    supports_functions=True,
-                    capabilities={
-                        "chat": True,
-                        "code": True,
-                        "reasoning": True
-                    }
-                )
-                models.append(model_info)
+            if self._models_cache is not None:
+                fetched_at, models = self._models_cache
+                if time.monotonic() - fetched_at >= self._models_ttl:
+                    if self._models_refresh is None or self._models_refresh.done():
+                        self._models_refresh = asyncio.create_task(self._refresh_models())
+                return list(models)
             
-            return models
+            return list(await self._fetch_models())
         except Exception as e:
             await self._handle_error(e, self.name)
             return []
     
+    async def _refresh_models(self):
+        """Refresh the model cache in the background, keeping stale data on failure."""
+        try:
+            await self._fetch_models()
+        except Exception as e:
+            logger.warning(f"Failed to refresh Ollama model list, serving cached list: {e}")
+    
+    async def _fetch_models(self) -> List[ModelInfo]:
+        """Fetch the model list from Ollama and update the cache."""
+        response = await self.client.list()
+        models = []
+        
+        # Debug logging; avoid stringifying the response unless it will be emitted
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Ollama list response type=%s body=%r", type(response), response)
+        
+        # Handle response as object with models attribute
+        model_list = response.models if hasattr(response, 'models') else response.get("models", [])
+        
+        for model in model_list:
+            # Handle model as object or dict
+            if hasattr(model, 'model'):
+                # Ollama uses 'model' attribute, not 'name'
+                name = model.model
+                details = model.details if hasattr(model, 'details') else {}
+            else:
+                name = model.get("model", model.get("name", ""))
+                details = model.get("details", {})
+            
+            model_info = ModelInfo(
+                model_name=name,
+                display_name=name.replace(":", " "),
+                description=f"Ollama model: {name}",
+                capabilities=dict(_DEFAULT_CAPS),
+                **_MODEL_TEMPLATE_KWARGS
+            )
+            models.append(model_info)
+        
+        self._models_cache = (time.monotonic(), models)
+        return models
+    
     def _prepare_messages(self, messages: List[Message]) -> List[Dict[str, Any]]:
         """
         Prepare messages for Ollama API, handling structured content.
         
         Ollama uses OpenAI-compatible format for tool calling.
         """
-        ollama_messages = []
+        return self._prepare_with_prefix_cache(messages, self._convert_messages)
+    
+    def _convert_messages(self, messages: List[Message]) -> List[Dict[str, Any]]:
+        """Convert messages to the API format without caching."""
+        ollama_messages = [
+            {"role": role, "content": content}
+            for role, content in map(role_and_content, messages)
+        ]
+        
+        # Fast path: only tool/assistant messages can carry structured content
+        if not any(msg.role is MessageRole.TOOL or msg.role is MessageRole.ASSISTANT for msg in messages):
+            return ollama_messages
         
-        for msg in messages:
-            # Handle both string and enum roles
-            role_value = msg.role.value if hasattr(msg.role, 'value') else str(msg.role)
+        # Unpack structured tool/assistant payloads in place (rare path)
+        for i, msg in enumerate(messages):
+            if msg.role is not MessageRole.TOOL and msg.role is not MessageRole.ASSISTANT:
+                continue
             
-            # Check if this is a structured message (JSON content)
-            if isinstance(msg.content, str):
-                try:
-                    # Try to parse as structured content
-                    parsed_content = json.loads(msg.content)
-                    if isinstance(parsed_content, dict):
-                        # Check if it's a tool message with name
-                        if role_value == "tool" and "name" in parsed_content:
-                            ollama_messages.append({
-                                "role": "tool",
-                                "content": parsed_content["content"],
-                                "name": parsed_content["name"]
-                            })
-                            continue
-                        # Check if it's an assistant message with tool_calls
-                        elif role_value == "assistant" and "tool_calls" in parsed_content:
-                            ollama_messages.append({
-                                "role": "assistant",
-                                "content": parsed_content["content"] or "",
-                                "tool_calls": parsed_content["tool_calls"]
-                            })
-                            continue
-                except (json.JSONDecodeError, TypeError):
-                    pass
+            parsed_content = msg.structured
+            if parsed_content is None:
+                parsed_content = parse_structured_content(msg.content)
+                if parsed_content is None:
+                    continue
             
-            # Convert to Ollama format
-            ollama_messages.append({
-                "role": role_value,
-                "content": msg.content
-            })
+            # Check if it's a tool message with name
+            if msg.role is MessageRole.TOOL and "name" in parsed_content:
+                ollama_messages[i] = {
+                    "role": "tool",
+                    "content": parsed_content["content"],
+                    "name": parsed_content["name"]
+                }
+            # Check if it's an assistant message with tool_calls
+            elif msg.role is MessageRole.ASSISTANT and "tool_calls" in parsed_content:
+                ollama_messages[i] = {
+                    "role": "assistant",
+                    "content": parsed_content["content"] or "",
+                    "tool_calls": parsed_content["tool_calls"]
+                }
         
         return ollama_messages
     
@@ -172,47 +260,32 @@ class OllamaProvider(BaseProvider):
         **kwargs
     ) -> ChatResponse:
         """Create a chat completion using Ollama."""
+        # Logical creation time of the response, taken once per request
+        created_at_ts = time.time()
         try:
             if not self.client:
                 await self.initialize()
             
-            # Convert messages to Ollama format
-            ollama_messages = self._prepare_messages(messages)
-            
-            # Prepare options
-            options = {"temperature": temperature}
-            if max_tokens:
-                options["num_predict"] = max_tokens
-            
-            # Add any additional options from kwargs
-            for key in ["top_p", "top_k", "seed"]:
-                if key in kwargs:
-                    options[key] = kwargs[key]
+            chat_params = self._build_chat_params(messages, model, temperature, max_tokens, kwargs, stream=False)
             
-            # Prepare chat parameters
-            chat_params = {
-                "model": model,
-                "messages": ollama_messages,
-                "options": options,
-                "stream": False
-            }
-            
-            # Add tools if provided (Ollama supports function calling)
-            if "tools" in kwargs and kwargs["tools"]:
-                chat_params["tools"] = kwargs["tools"]
-            
-            # Make the request with timeout
-            response = await asyncio.wait_for(
-                self.client.chat(**chat_params),
-                timeout=self.timeout
+            options = chat_params["options"]
+            cache_key = self._response_cache_key(
+                chat_params, deterministic=options["temperature"] == 0 or "seed" in options
             )
+            if cache_key is not None:
+                cached = await self._get_cached_response(cache_key, created_at_ts)
+                if cached is not None:
+                    return cached
+            
+            # Make the request; the client enforces self.timeout at the HTTP layer
+            response = await self.client.chat(**chat_params)
             
             # Extract message from response
             message = response["message"]
             
             # Create ChatResponse with tool calls if present
             chat_response = ChatResponse(
-                id=f"ollama-{uuid.uuid4()}",
+                id=f"ollama-{secrets.token_hex(12)}",
                 model=model,
                 content=message.get("content", ""),
                 role="assistant",
@@ -222,48 +295,37 @@ class OllamaProvider(BaseProvider):
                     "completion_tokens": response.get("eval_count", 0),
                     "total_tokens": response.get("prompt_eval_count", 0) + response.get("eval_count", 0)
                 },
-                created_at=datetime.now()
+                created_at_ts=created_at_ts
             )
             
             # Add tool calls if present (convert to standard format)
             if "tool_calls" in message and message["tool_calls"]:
                 tool_calls = []
-                for tool_call in message["tool_calls"]:
-                    # Convert Ollama tool call to standard format (Ollama uses dict arguments, not JSON strings)
-                    if hasattr(tool_call, 'function'):
-                        # Object format
-                        arguments = tool_call.function.arguments if hasattr(tool_call.function, 'arguments') else {}
-                        # Convert to JSON string for standard format
-                        tool_calls.append({
-                            "id": f"ollama-{uuid.uuid4()}",  # Ollama doesn't provide IDs
-                            "type": "function",
-                            "function": {
-                                "name": tool_call.function.name,
-                                "arguments": json.dumps(arguments) if isinstance(arguments, dict) else str(arguments)
-                            }
-                        })
-                    elif isinstance(tool_call, dict) and "function" in tool_call:
-                        # Dict format
-                        arguments = tool_call["function"].get("arguments", {})
+                # Ollama doesn't provide IDs; derive them all from one random base
+                id_base = secrets.token_hex(12)
+                for i, tool_call in enumerate(message["tool_calls"]):
+                    function = _coerce_tool_call(tool_call)
+                    if function is not None:
                         tool_calls.append({
-                            "id": f"ollama-{uuid.uuid4()}",  # Ollama doesn't provide IDs
+                            "id": f"ollama-{id_base}-{i}",
                             "type": "function",
-                            "function": {
-                                "name": tool_call["function"]["name"],
-                                "arguments": json.dumps(arguments) if isinstance(arguments, dict) else str(arguments)
-                            }
+                            "function": function
                         })
                 chat_response.tool_calls = tool_calls
             
+            if cache_key is not None:
+                await self._store_cached_response(cache_key, chat_response)
+            
             return chat_response
             
-        except asyncio.TimeoutError:
+        except (asyncio.TimeoutError, httpx.TimeoutException):
             raise ProviderTimeoutError(
                 f"Request timed out after {self.timeout} seconds",
                 provider=self.name
             )
         except ResponseError as e:
-            if "model" in str(e).lower() and "not found" in str(e).lower():
+            error_str = str(e).lower()
+            if "model" in error_str and "not found" in error_str:
                 raise ProviderModelNotFoundError(
                     f"Model '{model}' not found",
                     provider=self.name,
@@ -278,6 +340,35 @@ class OllamaProvider(BaseProvider):
             await self._handle_error(e, self.name)
             raise
     
+    def _build_chat_params(
+        self,
+        messages: List[Message],
+        model: str,
+        temperature: float,
+        max_tokens: Optional[int],
+        kwargs: Dict[str, Any],
+        stream: bool
+    ) -> Dict[str, Any]:
+        """Build the keyword arguments for AsyncClient.chat."""
+        options = {"temperature": temperature}
+        if max_tokens:
+            options["num_predict"] = max_tokens
+        options.update({key: kwargs[key] for key in kwargs.keys() & _ALLOWED_OPT_KEYS})
+        
+        chat_params = {
+            "model": model,
+            "messages": self._prepare_messages(messages),
+            "options": options,
+            "stream": stream
+        }
+        
+        # Add tools if provided (Ollama supports function calling). Stream chunks
+        # don't surface tool calls, so tools are only sent for non-streaming requests.
+        if not stream and kwargs.get("tools"):
+            chat_params["tools"] = kwargs["tools"]
+        
+        return chat_params
+    
     async def chat_completion_stream(
         self,
         messages: List[Message],
@@ -287,64 +378,73 @@ class OllamaProvider(BaseProvider):
         **kwargs
     ) -> AsyncGenerator[StreamChunk, None]:
         """Create a streaming chat completion using Ollama."""
+        # Opt-in coalescing of token chunks into larger batches
+        if kwargs.pop("coalesce", False):
+            async for chunk in coalesce_stream_chunks(
+                self.chat_completion_stream(messages, model, temperature, max_tokens, **kwargs)
+            ):
+                yield chunk
+            return
+        
         try:
             if not self.client:
                 await self.initialize()
             
-            # Convert messages to Ollama format
-            ollama_messages = self._prepare_messages(messages)
-            
-            # Prepare options
-            options = {"temperature": temperature}
-            if max_tokens:
-                options["num_predict"] = max_tokens
-            
-            # Add any additional options from kwargs
-            for key in ["top_p", "top_k", "seed"]:
-                if key in kwargs:
-                    options[key] = kwargs[key]
-            
             # Make the streaming request
             stream = await self.client.chat(
-                model=model,
-                messages=ollama_messages,
-                options=options,
-                stream=True
+                **self._build_chat_params(messages, model, temperature, max_tokens, kwargs, stream=True)
             )
             
-            # Track usage for final chunk
-            total_tokens = 0
+            # Local bindings for the per-token loop
+            chunk_cls = StreamChunk
             
             async for chunk in stream:
-                content = chunk.get("message", {}).get("content", "")
-                done = chunk.get("done", False)
+                # The SDK yields typed responses; plain dicts are also accepted
+                is_dict = isinstance(chunk, dict)
+                if is_dict:
+                    content = (chunk.get("message") or _EMPTY).get("content") or ""
+                    done = chunk.get("done", False)
+                else:
+                    content = getattr(chunk.message, "content", None) or ""
+                    done = chunk.done
+                
+                # Skip empty keepalive/metadata ticks; the final chunk is always sent
+                if not content and not done:
+                    continue
                 
                 if done:
                     # Final chunk with usage info
-                    yield StreamChunk(
+                    if is_dict:
+                        prompt_tokens = chunk.get("prompt_eval_count") or 0
+                        completion_tokens = chunk.get("eval_count") or 0
+                    else:
+                        prompt_tokens = chunk.prompt_eval_count or 0
+                        completion_tokens = chunk.eval_count or 0
+                    yield chunk_cls(
                         content=content,
                         is_final=True,
                         finish_reason="stop",
                         usage={
-                            "prompt_tokens": chunk.get("prompt_eval_count", 0),
-                            "completion_tokens": chunk.get("eval_count", 0),
-                            "total_tokens": chunk.get("prompt_eval_count", 0) + chunk.get("eval_count", 0)
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": completion_tokens,
+                            "total_tokens": prompt_tokens + completion_tokens
                         }
                     )
                 else:
                     # Regular content chunk
-                    yield StreamChunk(
+                    yield chunk_cls(
                         content=content,
                         is_final=False
                     )
                     
-        except asyncio.TimeoutError:
+        except (asyncio.TimeoutError, httpx.TimeoutException):
             raise ProviderTimeoutError(
                 f"Request timed out after {self.timeout} seconds",
                 provider=self.name
             )
         except ResponseError as e:
-            if "model" in str(e).lower() and "not found" in str(e).lower():
+            error_str = str(e).lower()
+            if "model" in error_str and "not found" in error_str:
                 raise ProviderModelNotFoundError(
                     f"Model '{model}' not found",
                     provider=self.name,
@@ -2,17 +2,22 @@
 OpenAI GPT provider implementation.
 """
 import os
-import json
-from typing import List, Dict, Any, Optional, AsyncGenerator
+import time
+import logging
+from operator import attrgetter
+from typing import ClassVar, List, Dict, Any, Optional, AsyncGenerator, Tuple
 import asyncio
 from datetime import datetime
 
+import httpx
+
 try:
-    from openai import AsyncOpenAI, APIError, APITimeoutError, APIStatusError
+    from openai import AsyncOpenAI, APIError, APITimeoutError, APIStatusError, DefaultAsyncHttpxClient
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
     AsyncOpenAI = None
+    DefaultAsyncHttpxClient = None
     # Create dummy exception classes that won't catch everything
     class APIError(Exception):
         """Dummy APIError when openai is not installed."""
@@ -28,17 +33,113 @@ except ImportError:
             super().__init__(message)
             self.status_code = status_code
 
+try:
+    # Requires the openai[aiohttp] extra; older SDKs don't provide it at all
+    from openai import DefaultAioHttpClient
+except ImportError:
+    DefaultAioHttpClient = None
+
+try:
+    import h2  # noqa: F401 - enables httpx's HTTP/2 support
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
+
 from .base import (
     BaseProvider, ProviderConfig, Message, ChatResponse, StreamChunk,
     ModelInfo, ProviderError, ProviderTimeoutError, ProviderModelNotFoundError,
-    ProviderAuthenticationError, ProviderRateLimitError, MessageRole
+    ProviderAuthenticationError, ProviderRateLimitError, MessageRole, HTTP_LIMITS,
+    role_and_content, coalesce_stream_chunks, parse_structured_content
 )
 from utils.config import config
+from utils import json_utils
+
+logger = logging.getLogger(__name__)
+
+# Request kwargs passed through to the OpenAI API unchanged
+_OPENAI_PASSTHROUGH = frozenset({"stop", "top_p", "frequency_penalty", "presence_penalty", "n", "user"})
+
+# Model lists loaded from the database, keyed by provider name:
+# (loaded_at, catalog_version, models)
+_MODELS_CACHE: Dict[str, Tuple[float, int, List[ModelInfo]]] = {}
+_MODELS_CACHE_TTL = 300
+
+# Fetches the fields the structured pass needs in one C-level call
+_message_fields = attrgetter("role_str", "content", "structured")
+
+# Roles whose content may carry a JSON tool envelope
+_STRUCTURED_ROLES = frozenset({"tool", "assistant"})
+
+def _load_models_from_db(provider_name: str) -> List[ModelInfo]:
+    """Load a provider's active models from the database."""
+    from utils.database import SessionLocal
+    from utils.repository.provider_repository import ProviderRepository
+    
+    db = SessionLocal()
+    try:
+        repo = ProviderRepository(db)
+        provider_config = repo.get_by_name(provider_name)
+        
+        if not provider_config:
+            return []
+        
+        return [
+            ModelInfo(
+                model_name=db_model.model_name,
+                display_name=db_model.display_name,
+                description=db_model.description,
+                context_window=db_model.context_window,
+                max_tokens=db_model.max_tokens,
+                supports_streaming=db_model.supports_streaming,
+                supports_functions=db_model.supports_functions,
+                capabilities=db_model.capabilities or {}
+            )
+            for db_model in provider_config.models
+            if db_model.is_active
+        ]
+    finally:
+        db.close()
+
+
+def _unpack_structured(role: str, parsed_content: Any) -> Optional[Dict[str, Any]]:
+    """Build the API dict for a parsed tool/assistant envelope, or None if it isn't one."""
+    if not isinstance(parsed_content, dict):
+        return None
+    
+    # Check if it's a tool message with tool_call_id
+    if role == "tool" and "tool_call_id" in parsed_content:
+        return {
+            "role": "tool",
+            "content": parsed_content["content"],
+            "tool_call_id": parsed_content["tool_call_id"],
+            "name": parsed_content.get("name")
+        }
+    # Check if it's an assistant message with tool_calls
+    if role == "assistant" and "tool_calls" in parsed_content:
+        return {
+            "role": "assistant",
+            "content": parsed_content["content"],
+            "tool_calls": parsed_content["tool_calls"]
+        }
+    return None
+
+
+# Batch statuses after which polling stops
+_BATCH_TERMINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
 
 
 class OpenAIProvider(BaseProvider):
     """OpenAI GPT provider implementation."""
     
+    # Clients shared across instances with identical settings, so providers
+    # using the same credentials reuse one connection pool
+    _client_pool: ClassVar[Dict[Tuple[Any, ...], "AsyncOpenAI"]] = {}
+    # Initialized providers holding each pooled client; closed when it drops to 0
+    _client_refs: ClassVar[Dict[Tuple[Any, ...], int]] = {}
+    
+    # Provider instances reused per name, credentials and settings; see shared()
+    _INSTANCES: ClassVar[Dict[Tuple[Any, ...], "OpenAIProvider"]] = {}
+    
     def __init__(self, config: ProviderConfig):
         """Initialize OpenAI provider."""
         if not OPENAI_AVAILABLE:
@@ -49,29 +150,138 @@ class OpenAIProvider(BaseProvider):
         super().__init__(config)
         self.api_key = os.getenv(config.api_key_env_var) if config.api_key_env_var else None
         self.client: Optional[AsyncOpenAI] = None
+        self._pool_key: Optional[Tuple[Any, ...]] = None
+        # Set for registry instances from shared(), which the registry owns
+        self._shared = False
         self.timeout = config.config.get("timeout", 60)
         self.max_retries = config.config.get("max_retries", 3)
         self.organization = config.config.get("organization")
+        # HTTP/2 multiplexes concurrent requests over one connection; needs the
+        # optional h2 package and falls back to HTTP/1.1 without it
+        self.http2 = config.config.get("http2", False)
+        # "httpx" (SDK default) or "aiohttp", which scales better under high concurrency
+        self.http_transport = config.config.get("http_transport", "httpx")
+        # Request defaults from config (e.g. an org-wide "user" or "top_p"),
+        # merged into every request body; per-call kwargs take precedence
+        self._base_params = {
+            key: value for key, value in config.config.get("default_params", {}).items()
+            if key in _OPENAI_PASSTHROUGH
+        }
+        # Stream coalescing defaults; callers can override per request with coalesce=
+        self.stream_coalesce = config.config.get("stream_coalesce", False)
+        self.stream_flush_chars = config.config.get("stream_flush_chars", 64)
+        self.stream_flush_interval = config.config.get("stream_flush_interval", 0.05)
+        # Pool sizing; the aiohttp transport maps this onto its TCPConnector
+        self.http_limits = httpx.Limits(
+            max_connections=config.config.get("max_connections", HTTP_LIMITS.max_connections),
+            max_keepalive_connections=config.config.get(
+                "max_keepalive_connections", HTTP_LIMITS.max_keepalive_connections
+            ),
+            keepalive_expiry=config.config.get("keepalive_expiry", HTTP_LIMITS.keepalive_expiry),
+        )
+    
+    @classmethod
+    def shared(cls, config: ProviderConfig) -> "OpenAIProvider":
+        """Return the registered provider for this config, creating it on first use."""
+        api_key = os.getenv(config.api_key_env_var) if config.api_key_env_var else None
+        key = (
+            config.name,
+            api_key,
+            config.config.get("organization"),
+            json_utils.dumps(config.config, sort_keys=True),
+        )
+        instance = cls._INSTANCES.get(key)
+        if instance is None:
+            instance = cls._INSTANCES[key] = cls(config)
+            instance._shared = True
+        return instance
+    
+    async def __aenter__(self) -> "OpenAIProvider":
+        await self.initialize()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        # Registry instances are shared by every caller of shared(); they are
+        # closed by aclose_all() on shutdown, not by one caller's exit
+        if not self._shared:
+            await self.aclose()
     
     async def _initialize(self):
-        """Initialize OpenAI client."""
+        """Initialize OpenAI client, reusing a pooled client for the same settings."""
         if not self.api_key:
             raise ProviderAuthenticationError(
                 f"API key not found. Please set {self.config.api_key_env_var} environment variable.",
                 provider=self.name
             )
         
-        # Initialize client with configuration
-        client_kwargs = {
-            "api_key": self.api_key,
-            "timeout": self.timeout,
-            "max_retries": self.max_retries,
-        }
-        
-        if self.organization:
-            client_kwargs["organization"] = self.organization
+        key = (self.api_key, self.organization, self.timeout, self.max_retries, self.http2, self.http_transport,
+               self.http_limits.max_connections, self.http_limits.max_keepalive_connections)
+        client = self._client_pool.get(key)
+        if client is None:
+            # Initialize client with configuration
+            client_kwargs = {
+                "api_key": self.api_key,
+                "timeout": self.timeout,
+                "max_retries": self.max_retries,
+                "http_client": self._build_http_client(),
+            }
+            
+            if self.organization:
+                client_kwargs["organization"] = self.organization
+            
+            client = self._client_pool[key] = AsyncOpenAI(**client_kwargs)
+        if self._pool_key != key:
+            self._client_refs[key] = self._client_refs.get(key, 0) + 1
+            self._pool_key = key
+        self.client = client
+    
+    def _build_http_client(self):
+        """Build the HTTP client backing AsyncOpenAI for the configured transport."""
+        if self.http_transport == "aiohttp":
+            try:
+                if DefaultAioHttpClient is None:
+                    raise RuntimeError("installed openai SDK has no aiohttp client")
+                return DefaultAioHttpClient(limits=self.http_limits)
+            except RuntimeError as e:
+                logger.warning(f"aiohttp transport unavailable, falling back to httpx: {e}")
+        http2 = self.http2
+        if http2 and not H2_AVAILABLE:
+            logger.warning("HTTP/2 requested but h2 is not installed, falling back to HTTP/1.1")
+            http2 = False
+        return DefaultAsyncHttpxClient(http2=http2, limits=self.http_limits)
+    
+    async def aclose(self):
+        """Release this provider's client.
         
-        self.client = AsyncOpenAI(**client_kwargs)
+        The pooled client is closed only when no other provider still uses it.
+        """
+        client, self.client = self.client, None
+        key, self._pool_key = self._pool_key, None
+        self._initialized = False
+        if client is None or key is None:
+            return
+        refs = self._client_refs.get(key, 0) - 1
+        if refs > 0:
+            self._client_refs[key] = refs
+            return
+        self._client_refs.pop(key, None)
+        if self._client_pool.get(key) is client:
+            del self._client_pool[key]
+        await client.close()
+    
+    @classmethod
+    async def aclose_all(cls):
+        """Close all pooled clients. Call on application shutdown."""
+        clients = list(cls._client_pool.values())
+        cls._client_pool.clear()
+        cls._client_refs.clear()
+        for instance in cls._INSTANCES.values():
+            instance.client = None
+            instance._pool_key = None
+            instance._initialized = False
+        cls._INSTANCES.clear()
+        for client in clients:
+            await client.close()
     
     async def validate_config(self) -> bool:
         """Validate OpenAI configuration by making a test API call."""
@@ -83,7 +293,8 @@ class OpenAIProvider(BaseProvider):
             models = await self.client.models.list()
             return True
         except Exception as e:
-            if "authentication" in str(e).lower() or "api key" in str(e).lower():
+            error_str = str(e).lower()
+            if "authentication" in error_str or "api key" in error_str:
                 raise ProviderAuthenticationError(
                     f"Invalid API key for OpenAI",
                     provider=self.name
@@ -94,36 +305,26 @@ class OpenAIProvider(BaseProvider):
             )
     
     async def list_models(self) -> List[ModelInfo]:
-        """List available OpenAI models from database."""
-        from utils.database import SessionLocal
-        from utils.repository.provider_repository import ProviderRepository
+        """List available OpenAI models from database, cached for a few minutes."""
+        from utils.repository.provider_repository import ProviderModelRepository
         
-        db = SessionLocal()
-        try:
-            repo = ProviderRepository(db)
-            provider_config = repo.get_by_name("openai")
-            
-            if not provider_config:
-                return []
-            
-            models = []
-            for db_model in provider_config.models:
-                if db_model.is_active:
-                    model_info = ModelInfo(
-                        model_name=db_model.model_name,
-                        display_name=db_model.display_name,
-                        description=db_model.description,
-                        context_window=db_model.context_window,
-                        max_tokens=db_model.max_tokens,
-                        supports_streaming=db_model.supports_streaming,
-                        supports_functions=db_model.supports_functions,
-                        capabilities=db_model.capabilities or {}
-                    )
-                    models.append(model_info)
-            
-            return models
-        finally:
-            db.close()
+        version = ProviderModelRepository.catalog_version
+        cached = _MODELS_CACHE.get("openai")
+        if (
+            cached is not None
+            and cached[1] == version
+            and time.monotonic() - cached[0] < _MODELS_CACHE_TTL
+        ):
+            return list(cached[2])
+        
+        models = _load_models_from_db("openai")
+        _MODELS_CACHE["openai"] = (time.monotonic(), version, models)
+        return list(models)
+    
+    @classmethod
+    def invalidate_models_cache(cls):
+        """Drop cached model lists, e.g. after the provider's models are edited."""
+        _MODELS_CACHE.clear()
     
     def _prepare_messages_for_openai(self, messages: List[Message]) -> List[Dict[str, Any]]:
         """
@@ -131,43 +332,28 @@ class OpenAIProvider(BaseProvider):
         
         OpenAI supports system messages directly in the messages array.
         """
-        openai_messages = []
+        return self._prepare_with_prefix_cache(messages, self._convert_messages_for_openai)
+    
+    def _convert_messages_for_openai(self, messages: List[Message]) -> List[Dict[str, Any]]:
+        """Convert messages to the API format without caching."""
+        # Content must be a plain str so the SDK's JSON encoder takes its fast path
+        openai_messages = [
+            {"role": role, "content": content if isinstance(content, str) else str(content)}
+            for role, content in map(role_and_content, messages)
+        ]
         
-        for msg in messages:
-            # Handle both string and enum roles
-            role_value = msg.role.value if hasattr(msg.role, 'value') else str(msg.role)
-            
-            # Check if this is a structured message (JSON content)
-            if isinstance(msg.content, str):
-                try:
-                    # Try to parse as structured content
-                    parsed_content = json.loads(msg.content)
-                    if isinstance(parsed_content, dict):
-                        # Check if it's a tool message with tool_call_id
-                        if role_value == "tool" and "tool_call_id" in parsed_content:
-                            openai_messages.append({
-                                "role": "tool",
-                                "content": parsed_content["content"],
-                                "tool_call_id": parsed_content["tool_call_id"],
-                                "name": parsed_content.get("name")
-                            })
-                            continue
-                        # Check if it's an assistant message with tool_calls
-                        elif role_value == "assistant" and "tool_calls" in parsed_content:
-                            openai_messages.append({
-                                "role": "assistant",
-                                "content": parsed_content["content"],
-                                "tool_calls": parsed_content["tool_calls"]
-                            })
-                            continue
-                except (json.JSONDecodeError, TypeError):
-                    pass
-            
-            # Convert to OpenAI format
-            openai_messages.append({
-                "role": role_value,
-                "content": msg.content
-            })
+        # Unpack structured (JSON) tool/assistant payloads in place
+        for i, (role, content, structured) in enumerate(map(_message_fields, messages)):
+            if role not in _STRUCTURED_ROLES:
+                continue
+            if structured is None:
+                # Messages not built via Message.from_stored are parsed here
+                structured = parse_structured_content(content)
+                if structured is None:
+                    continue
+            prepared = _unpack_structured(role, structured)
+            if prepared is not None:
+                openai_messages[i] = prepared
         
         return openai_messages
     
@@ -184,39 +370,24 @@ class OpenAIProvider(BaseProvider):
             if not self.client:
                 await self.initialize()
             
-            # Prepare messages
-            openai_messages = self._prepare_messages_for_openai(messages)
-            
-            # Create request parameters
-            request_params = {
-                "model": model,
-                "messages": openai_messages,
-                "temperature": temperature,
-            }
-            
-            # Add max_tokens if specified
-            if max_tokens is not None:
-                request_params["max_tokens"] = max_tokens
+            # Latency-tolerant callers can opt into the cheaper Batch API
+            if kwargs.pop("batch", False):
+                responses = await self.chat_completion_batch([{
+                    "messages": messages,
+                    "model": model,
+                    "temperature": temperature,
+                    "max_tokens": max_tokens,
+                    **kwargs,
+                }])
+                return responses[0]
             
-            # Add tools if provided (OpenAI supports function calling)
-            if "tools" in kwargs and kwargs["tools"]:
-                request_params["tools"] = kwargs["tools"]  # Already in OpenAI format
-                if "tool_choice" in kwargs:
-                    request_params["tool_choice"] = kwargs["tool_choice"]
+            request_params = self._build_request_params(messages, model, temperature, max_tokens, kwargs)
             
-            # Add any additional parameters
-            if "stop" in kwargs:
-                request_params["stop"] = kwargs["stop"]
-            if "top_p" in kwargs:
-                request_params["top_p"] = kwargs["top_p"]
-            if "frequency_penalty" in kwargs:
-                request_params["frequency_penalty"] = kwargs["frequency_penalty"]
-            if "presence_penalty" in kwargs:
-                request_params["presence_penalty"] = kwargs["presence_penalty"]
-            if "n" in kwargs:
-                request_params["n"] = kwargs["n"]
-            if "user" in kwargs:
-                request_params["user"] = kwargs["user"]
+            cache_key = self._response_cache_key(request_params, deterministic=temperature == 0)
+            if cache_key is not None:
+                cached = await self._get_cached_response(cache_key)
+                if cached is not None:
+                    return cached
             
             # Make the API call
             response = await self.client.chat.completions.create(**request_params)
@@ -238,7 +409,7 @@ class OpenAIProvider(BaseProvider):
                         }
                     })
             
-            return ChatResponse(
+            chat_response = ChatResponse(
                 id=response.id,
                 model=response.model,
                 content=choice.message.content or "",
@@ -247,6 +418,11 @@ class OpenAIProvider(BaseProvider):
                 tool_calls=tool_calls
             )
             
+            if cache_key is not None:
+                await self._store_cached_response(cache_key, chat_response)
+            
+            return chat_response
+            
         except APITimeoutError:
             raise ProviderTimeoutError(
                 f"Request timed out after {self.timeout} seconds",
@@ -281,6 +457,130 @@ class OpenAIProvider(BaseProvider):
             await self._handle_error(e, self.name)
             raise
     
+    def _build_request_params(
+        self,
+        messages: List[Message],
+        model: str,
+        temperature: float,
+        max_tokens: Optional[int],
+        kwargs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Build the /chat/completions request body."""
+        # Start from the per-provider defaults computed once in __init__
+        request_params = self._base_params.copy()
+        request_params["model"] = model
+        request_params["messages"] = self._prepare_messages_for_openai(messages)
+        request_params["temperature"] = temperature
+        
+        # Add max_tokens if specified
+        if max_tokens is not None:
+            request_params["max_tokens"] = max_tokens
+        
+        # Add tools if provided (OpenAI supports function calling)
+        if "tools" in kwargs and kwargs["tools"]:
+            request_params["tools"] = kwargs["tools"]  # Already in OpenAI format
+            if "tool_choice" in kwargs:
+                request_params["tool_choice"] = kwargs["tool_choice"]
+        
+        # Add any additional parameters
+        request_params.update({key: kwargs[key] for key in _OPENAI_PASSTHROUGH & kwargs.keys()})
+        return request_params
+    
+    async def chat_completion_batch(
+        self,
+        requests: List[Dict[str, Any]],
+        poll_interval: float = 30.0
+    ) -> List[ChatResponse]:
+        """
+        Run chat completions through the OpenAI Batch API.
+        
+        Batches cost half as much and use a separate rate-limit pool, but
+        complete within a 24h window, so this suits offline callers only.
+        
+        Args:
+            requests: chat_completion arguments per request (messages, model,
+                and optionally temperature, max_tokens and extra kwargs)
+            poll_interval: Seconds between batch status checks
+            
+        Returns:
+            Responses in the same order as the requests
+        """
+        if not self.client:
+            await self.initialize()
+        
+        lines = []
+        for i, request in enumerate(requests):
+            request = dict(request)
+            messages = request.pop("messages")
+            model = request.pop("model")
+            temperature = request.pop("temperature", 0.7)
+            max_tokens = request.pop("max_tokens", None)
+            lines.append(json_utils.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._build_request_params(messages, model, temperature, max_tokens, request),
+            }))
+        
+        try:
+            batch_file = await self.client.files.create(
+                file=("batch.jsonl", "\n".join(lines).encode()),
+                purpose="batch"
+            )
+            batch = await self.client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            while batch.status not in _BATCH_TERMINAL_STATUSES:
+                await asyncio.sleep(poll_interval)
+                batch = await self.client.batches.retrieve(batch.id)
+            
+            if batch.status != "completed" or not batch.output_file_id:
+                raise ProviderError(
+                    f"Batch {batch.id} ended with status '{batch.status}'",
+                    provider=self.name
+                )
+            
+            output = await self.client.files.content(batch.output_file_id)
+        except APIStatusError as e:
+            raise ProviderError(
+                f"OpenAI batch error: {str(e)}",
+                provider=self.name,
+                status_code=e.status_code
+            )
+        
+        results = {}
+        for line in output.text.splitlines():
+            if line.strip():
+                result = json_utils.loads(line)
+                results[result["custom_id"]] = result
+        
+        responses = []
+        for i in range(len(requests)):
+            result = results.get(str(i))
+            response = result.get("response") if result else None
+            if not response or response.get("status_code") != 200:
+                raise ProviderError(
+                    f"Batch request {i} failed: {(result or {}).get('error')}",
+                    provider=self.name,
+                    status_code=response.get("status_code") if response else None
+                )
+            
+            body = response["body"]
+            choice = body["choices"][0]
+            message = choice["message"]
+            responses.append(ChatResponse(
+                id=body["id"],
+                model=body["model"],
+                content=message.get("content") or "",
+                role=message["role"],
+                finish_reason=choice.get("finish_reason"),
+                tool_calls=message.get("tool_calls") or None
+            ))
+        
+        return responses
+    
     async def chat_completion_stream(
         self,
         messages: List[Message],
@@ -290,62 +590,46 @@ class OpenAIProvider(BaseProvider):
         **kwargs
     ) -> AsyncGenerator[StreamChunk, None]:
         """Create a streaming chat completion using OpenAI API."""
+        # Opt-in coalescing of token deltas into fewer, larger chunks
+        if kwargs.pop("coalesce", self.stream_coalesce):
+            async for chunk in coalesce_stream_chunks(
+                self.chat_completion_stream(messages, model, temperature, max_tokens, coalesce=False, **kwargs),
+                max_delay=self.stream_flush_interval,
+                max_chars=self.stream_flush_chars
+            ):
+                yield chunk
+            return
+        
         try:
             if not self.client:
                 await self.initialize()
             
-            # Prepare messages
-            openai_messages = self._prepare_messages_for_openai(messages)
-            
-            # Create request parameters
-            request_params = {
-                "model": model,
-                "messages": openai_messages,
-                "temperature": temperature,
-                "stream": True,
-            }
-            
-            # Add max_tokens if specified
-            if max_tokens is not None:
-                request_params["max_tokens"] = max_tokens
-            
-            # Add tools if provided (OpenAI supports function calling)
-            if "tools" in kwargs and kwargs["tools"]:
-                request_params["tools"] = kwargs["tools"]  # Already in OpenAI format
-                if "tool_choice" in kwargs:
-                    request_params["tool_choice"] = kwargs["tool_choice"]
-            
-            # Add any additional parameters
-            if "stop" in kwargs:
-                request_params["stop"] = kwargs["stop"]
-            if "top_p" in kwargs:
-                request_params["top_p"] = kwargs["top_p"]
-            if "frequency_penalty" in kwargs:
-                request_params["frequency_penalty"] = kwargs["frequency_penalty"]
-            if "presence_penalty" in kwargs:
-                request_params["presence_penalty"] = kwargs["presence_penalty"]
-            if "n" in kwargs:
-                request_params["n"] = kwargs["n"]
-            if "user" in kwargs:
-                request_params["user"] = kwargs["user"]
+            request_params = self._build_request_params(messages, model, temperature, max_tokens, kwargs)
+            request_params["stream"] = True
             
             # Stream the response
             stream = await self.client.chat.completions.create(**request_params)
             
             async for chunk in stream:
-                # Extract content from the first choice delta
-                if chunk.choices and chunk.choices[0].delta.content is not None:
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                
+                # Extract content from the first choice delta; role-only and
+                # finish-only deltas carry no text and are skipped
+                content = choice.delta.content
+                if content:
                     yield StreamChunk(
-                        content=chunk.choices[0].delta.content,
+                        content=content,
                         is_final=False
                     )
                 
                 # Check if this is the final chunk
-                if chunk.choices and chunk.choices[0].finish_reason is not None:
+                if choice.finish_reason is not None:
                     yield StreamChunk(
                         content="",
                         is_final=True,
-                        finish_reason=chunk.choices[0].finish_reason
+                        finish_reason=choice.finish_reason
                     )
                     
         except APITimeoutError:
@@ -1,7 +1,9 @@
 """
 Base repository class for database operations.
 """
+from weakref import WeakKeyDictionary
 from typing import Generic, TypeVar, Type, List, Optional, Any, Dict, Union
+from sqlalchemy import bindparam, insert, select, update, delete, exists
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import BaseModel
@@ -11,6 +13,26 @@ from utils.database import Base
 # Type variable for SQLAlchemy model
 ModelType = TypeVar("ModelType", bound=Base)
 
+# Record IDs found by get_by_field, per session: {(model, field, value): id}.
+# Sessions live for one request, so entries vanish with them.
+_field_lookup_ids: "WeakKeyDictionary[Session, Dict[tuple, Any]]" = WeakKeyDictionary()
+
+# SELECT ... WHERE field = :value statements by (model, field). Built once and
+# reused with a bound value, so hot lookups (auth by API key, username, email)
+# hit SQLAlchemy's compiled cache without rebuilding the statement per call.
+_field_select_stmts: Dict[tuple, Any] = {}
+
+
+def _select_by_field(model: Any, field_name: str) -> Any:
+    """Return the cached single-row select for a model field."""
+    key = (model, field_name)
+    stmt = _field_select_stmts.get(key)
+    if stmt is None:
+        stmt = _field_select_stmts[key] = (
+            select(model).where(getattr(model, field_name) == bindparam("value")).limit(1)
+        )
+    return stmt
+
 class BaseRepository(Generic[ModelType]):
     """Base repository class with common CRUD operations."""
     
@@ -33,7 +55,8 @@ class BaseRepository(Generic[ModelType]):
         Returns:
             Record or None if not found
         """
-        return self.db.query(self.model).filter(self.model.id == id).first()
+        # Served from the session's identity map without SQL when already loaded
+        return self.db.get(self.model, id)
     
     def get_by_field(self, field_name: str, value: Any) -> Optional[ModelType]:
         """Get a record by a specific field.
@@ -42,10 +65,47 @@ class BaseRepository(Generic[ModelType]):
             field_name: Name of the field
             value: Value to filter by
             
+        Lookups are remembered for the lifetime of the session (one request),
+        so repeats resolve through the identity map instead of re-querying.
+        
         Returns:
             Record or None if not found
         """
-        return self.db.query(self.model).filter(getattr(self.model, field_name) == value).first()
+        if field_name == "id":
+            return self.get(value)
+        
+        lookup_ids = _field_lookup_ids.get(self.db)
+        if lookup_ids is None:
+            lookup_ids = _field_lookup_ids[self.db] = {}
+        key = (self.model, field_name, value)
+        record_id = lookup_ids.get(key)
+        if record_id is not None:
+            db_item = self.get(record_id)
+            # Re-check in case the field changed since the lookup was cached
+            if db_item is not None and getattr(db_item, field_name) == value:
+                return db_item
+            lookup_ids.pop(key, None)
+        
+        db_item = self.db.scalars(_select_by_field(self.model, field_name), {"value": value}).first()
+        if db_item is not None:
+            lookup_ids[key] = db_item.id
+        return db_item
+    
+    def exists_by_field(self, field_name: str, value: Any) -> bool:
+        """Check whether any record has a specific field value.
+        
+        Runs SELECT EXISTS, so no row is loaded.
+        
+        Args:
+            field_name: Name of the field
+            value: Value to filter by
+            
+        Returns:
+            True if a matching record exists
+        """
+        return self.db.query(
+            exists().where(getattr(self.model, field_name) == value)
+        ).scalar()
     
     def list(self, skip: int = 0, limit: int = 100) -> List[ModelType]:
         """Get a list of records.
@@ -65,14 +125,18 @@ class BaseRepository(Generic[ModelType]):
         Args:
             **kwargs: Fields and values for the new record
             
+        Issues a single INSERT ... RETURNING instead of an add, flush and
+        refresh. The commit still expires the record as usual, so it is
+        reloaded only if an attribute is read afterwards.
+        
         Returns:
             Created record
         """
         try:
-            db_item = self.model(**kwargs)
-            self.db.add(db_item)
+            db_item = self.db.scalars(
+                insert(self.model).values(**kwargs).returning(self.model)
+            ).one()
             self.db.commit()
-            self.db.refresh(db_item)
             return db_item
         except SQLAlchemyError as e:
             self.db.rollback()
@@ -81,6 +145,9 @@ class BaseRepository(Generic[ModelType]):
     def update(self, id: Any, **kwargs) -> Optional[ModelType]:
         """Update a record.
         
+        Issues a single UPDATE ... RETURNING rather than loading the row first.
+        None values and names that aren't columns are ignored.
+        
         Args:
             id: Record ID
             **kwargs: Fields and values to update
@@ -88,14 +155,19 @@ class BaseRepository(Generic[ModelType]):
         Returns:
             Updated record or None if not found
         """
+        columns = self.model.__table__.columns
+        values = {key: value for key, value in kwargs.items() if value is not None and key in columns}
+        if not values:
+            return self.get(id)
+        
         try:
-            db_item = self.get(id)
-            if db_item:
-                for key, value in kwargs.items():
-                    if hasattr(db_item, key) and value is not None:
-                        setattr(db_item, key, value)
-                self.db.commit()
-                self.db.refresh(db_item)
+            db_item = self.db.scalars(
+                update(self.model)
+                .where(self.model.id == id)
+                .values(**values)
+                .returning(self.model)
+            ).first()
+            self.db.commit()
             return db_item
         except SQLAlchemyError as e:
             self.db.rollback()
@@ -104,6 +176,9 @@ class BaseRepository(Generic[ModelType]):
     def delete(self, id: Any) -> bool:
         """Delete a record.
         
+        Issues a single DELETE; dependent rows are removed by the database's
+        ON DELETE rules.
+        
         Args:
             id: Record ID
             
@@ -111,12 +186,9 @@ class BaseRepository(Generic[ModelType]):
             True if deleted, False if not found
         """
         try:
-            db_item = self.get(id)
-            if db_item:
-                self.db.delete(db_item)
-                self.db.commit()
-                return True
-            return False
+            result = self.db.execute(delete(self.model).where(self.model.id == id))
+            self.db.commit()
+            return result.rowcount > 0
         except SQLAlchemyError as e:
             self.db.rollback()
             raise e
\ No newline at end of file
@@ -2,14 +2,18 @@
 Chat repository for database operations.
 """
 import uuid
+from operator import attrgetter
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import desc, func
 
 from utils.models.db_models import Chat, Message, User
 from utils.repository.base import BaseRepository
 
+# Fetches the fields format_chat_for_response needs in one C-level call
+_message_fields = attrgetter("role", "content", "timestamp")
+
 class ChatRepository(BaseRepository):
     """Repository for chat operations."""
     
@@ -32,9 +36,23 @@ class ChatRepository(BaseRepository):
         """
         return self.get_by_field("custom_id", custom_id)
     
+    def exists_by_custom_id(self, custom_id: str) -> bool:
+        """Check whether a custom chat ID is taken.
+        
+        Args:
+            custom_id: Custom ID to check
+            
+        Returns:
+            True if a chat has this custom ID
+        """
+        return self.exists_by_field("custom_id", custom_id)
+    
     def list_by_user(self, user_id: uuid.UUID, skip: int = 0, limit: int = 100) -> List[Chat]:
         """Get a list of chats for a user.
         
+        Message counts are fetched in the same aggregate query and attached
+        to each chat as ``message_count``, so listing never loads messages.
+        
         Args:
             user_id: User ID
             skip: Number of records to skip
@@ -43,14 +61,22 @@ class ChatRepository(BaseRepository):
         Returns:
             List of chats
         """
-        return (
-            self.db.query(self.model)
+        rows = (
+            self.db.query(self.model, func.count(Message.id).label("message_count"))
+            .outerjoin(Message, Message.chat_id == self.model.id)
             .filter(self.model.user_id == user_id)
+            .group_by(self.model.id)
             .order_by(desc(self.model.updated_at))
             .offset(skip)
             .limit(limit)
             .all()
         )
+        
+        chats = []
+        for chat, message_count in rows:
+            chat.message_count = message_count
+            chats.append(chat)
+        return chats
     
     def create_chat(self, user_id: uuid.UUID, custom_id: Optional[str] = None, title: Optional[str] = None) -> Chat:
         """Create a new chat.
@@ -87,7 +113,7 @@ class ChatRepository(BaseRepository):
         """
         return (
             self.db.query(self.model)
-            .options(joinedload(self.model.messages))
+            .options(selectinload(self.model.messages))
             .filter(self.model.id == chat_id)
             .first()
         )
@@ -103,7 +129,7 @@ class ChatRepository(BaseRepository):
         """
         return (
             self.db.query(self.model)
-            .options(joinedload(self.model.messages))
+            .options(selectinload(self.model.messages))
             .filter(self.model.custom_id == custom_id)
             .first()
         )
@@ -117,17 +143,14 @@ class ChatRepository(BaseRepository):
         Returns:
             Formatted chat dictionary
         """
-        # Sort messages by timestamp
-        sorted_messages = sorted(chat.messages, key=lambda x: x.timestamp)
-        
-        # Format messages
+        # Messages arrive ordered by timestamp via the relationship's order_by
         messages = [
             {
-                "role": message.role,
-                "content": message.content,
-                "timestamp": message.timestamp.isoformat()
+                "role": role,
+                "content": content,
+                "timestamp": timestamp.isoformat()
             }
-            for message in sorted_messages
+            for role, content, timestamp in map(_message_fields, chat.messages)
         ]
         
         # Format chat
@@ -149,15 +172,16 @@ class ChatRepository(BaseRepository):
         Returns:
             Dictionary of formatted chats
         """
-        result = {}
-        
-        for chat in chats:
-            chat_id = chat.custom_id or str(chat.id)
-            result[chat_id] = {
+        # Unbound method skips a bound-method lookup per timestamp
+        isoformat = datetime.isoformat
+        return {
+            chat.custom_id or str(chat.id): {
                 "id": str(chat.id),
                 "title": chat.title or "Conversation",
-                "created_at": chat.created_at.isoformat(),
-                "updated_at": chat.updated_at.isoformat()
+                "created_at": isoformat(chat.created_at),
+                "updated_at": isoformat(chat.updated_at),
+                # Set by list_by_user's aggregate query; None for other sources
+                "message_count": getattr(chat, "message_count", None)
             }
-        
-        return result
\ No newline at end of file
+            for chat in chats
+        }
\ No newline at end of file
@@ -2,10 +2,11 @@
 Message repository for database operations.
 """
 import uuid
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, func, insert, tuple_
+from sqlalchemy.exc import SQLAlchemyError
 
 from utils.models.db_models import Message
 from utils.repository.base import BaseRepository
@@ -21,25 +22,58 @@ class MessageRepository(BaseRepository):
         """
         super().__init__(Message, db)
     
-    def list_by_chat(self, chat_id: uuid.UUID, skip: int = 0, limit: int = 1000) -> List[Message]:
+    def list_by_chat(
+        self,
+        chat_id: uuid.UUID,
+        skip: int = 0,
+        limit: int = 1000,
+        after: Optional[Tuple[datetime, uuid.UUID]] = None
+    ) -> List[Message]:
         """Get a list of messages for a chat.
         
         Args:
             chat_id: Chat ID
-            skip: Number of records to skip
+            skip: Number of records to skip (ignored when after is given)
             limit: Maximum number of records to return
+            after: (timestamp, id) of the last message already seen; only
+                messages after it are returned
             
         Returns:
             List of messages
         """
-        return (
-            self.db.query(self.model)
-            .filter(self.model.chat_id == chat_id)
-            .order_by(self.model.timestamp)
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+        query = self.db.query(self.model)
+        if after is not None:
+            # Keyset pagination walks the (chat_id, timestamp) index instead of
+            # scanning and discarding skipped rows. Rows from one bulk insert
+            # can share a timestamp, so the id breaks ties.
+            query = query.filter(
+                self.model.chat_id == chat_id,
+                tuple_(self.model.timestamp, self.model.id) > tuple_(*after)
+            )
+        else:
+            query = query.filter(self.model.chat_id == chat_id).offset(skip)
+        return query.order_by(self.model.timestamp, self.model.id).limit(limit).all()
+    
+    def page_by_chat(
+        self,
+        chat_id: uuid.UUID,
+        after: Optional[Tuple[datetime, uuid.UUID]] = None,
+        limit: int = 1000
+    ) -> Tuple[List[Message], Optional[Tuple[datetime, uuid.UUID]]]:
+        """Get one keyset-paginated page of messages for a chat.
+        
+        Args:
+            chat_id: Chat ID
+            after: Cursor returned by the previous page, or None for the first page
+            limit: Maximum number of records to return
+            
+        Returns:
+            Tuple of (messages, next_cursor); next_cursor is the last message's
+            (timestamp, id), or None on the last page
+        """
+        messages = self.list_by_chat(chat_id, limit=limit, after=after)
+        next_cursor = (messages[-1].timestamp, messages[-1].id) if len(messages) == limit else None
+        return messages, next_cursor
     
     def create_message(self, chat_id: uuid.UUID, role: str, content: str, tokens_used: int = 0) -> Message:
         """Create a new message.
@@ -53,14 +87,42 @@ class MessageRepository(BaseRepository):
         Returns:
             Created message
         """
+        # The timestamp comes from the column's server default, in the
+        # database's clock and time zone
         return self.create(
             chat_id=chat_id,
             role=role,
             content=content,
-            tokens_used=tokens_used,
-            timestamp=datetime.now()
+            tokens_used=tokens_used
         )
     
+    def bulk_create(self, messages: List[Dict[str, Any]]) -> int:
+        """Insert many messages in a single multi-row INSERT.
+        
+        Rows are timestamped with clock_timestamp() rather than now(), so
+        rows inserted together keep their order instead of sharing the
+        transaction's start time.
+        
+        Args:
+            messages: Rows with chat_id, role, content and optionally tokens_used
+            
+        Returns:
+            Number of messages inserted
+        """
+        if not messages:
+            return 0
+        
+        try:
+            self.db.execute(
+                insert(self.model).values(timestamp=func.clock_timestamp()),
+                messages
+            )
+            self.db.commit()
+            return len(messages)
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            raise e
+    
     def get_system_message_for_chat(self, chat_id: uuid.UUID) -> Optional[Message]:
         """Get the system message for a chat.
         
@@ -1,14 +1,23 @@
 """
 Repository for provider-related database operations.
 """
-from typing import List, Optional, Dict, Any
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, ClassVar, List, Optional, Dict, Any
 from uuid import UUID
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import and_, case, func, update
+from sqlalchemy.exc import SQLAlchemyError
 
 from .base import BaseRepository
 from utils.models.db_models import ProviderConfig, ProviderModel, ProviderUsage
 
+logger = logging.getLogger(__name__)
+
+# Default lookback for usage summaries, so they don't scan a user's full history
+USAGE_SUMMARY_WINDOW = timedelta(days=30)
+
 
 class ProviderRepository(BaseRepository[ProviderConfig]):
     """Repository for provider configurations."""
@@ -32,9 +41,10 @@ class ProviderRepository(BaseRepository[ProviderConfig]):
         ).first()
     
     def get_by_name(self, name: str) -> Optional[ProviderConfig]:
-        """Get provider configuration by name."""
+        """Get provider configuration by name, ignoring case."""
+        # Served by idx_provider_configs_lower_name
         return self.db.query(ProviderConfig).filter(
-            ProviderConfig.name == name
+            func.lower(ProviderConfig.name) == name.lower()
         ).first()
     
     def set_default_provider(self, provider_id: UUID) -> ProviderConfig:
@@ -47,41 +57,99 @@ class ProviderRepository(BaseRepository[ProviderConfig]):
         Returns:
             Updated provider configuration
         """
-        # First, unset any existing default
-        self.db.query(ProviderConfig).filter(
-            ProviderConfig.is_default == True
-        ).update({"is_default": False})
+        # First, unset the existing default. The partial unique index on
+        # is_default is checked row by row, so the swap can't be one statement.
+        self.db.execute(
+            update(ProviderConfig)
+            .where(ProviderConfig.is_default == True, ProviderConfig.id != provider_id)
+            .values(is_default=False)
+        )
         
         # Set the new default
-        provider = self.get(provider_id)
+        provider = self.db.scalars(
+            update(ProviderConfig)
+            .where(ProviderConfig.id == provider_id)
+            .values(is_default=True)
+            .returning(ProviderConfig)
+        ).first()
         if not provider:
+            self.db.rollback()
             raise ValueError(f"Provider with ID {provider_id} not found")
         
-        provider.is_default = True
         self.db.commit()
-        self.db.refresh(provider)
-        
         return provider
 
 
 class ProviderModelRepository(BaseRepository[ProviderModel]):
     """Repository for provider models."""
     
+    # Bumped on every model write so cached model catalogs can detect staleness
+    catalog_version: ClassVar[int] = 0
+    
     def __init__(self, db: Session):
         super().__init__(ProviderModel, db)
     
-    def get_by_provider(self, provider_id: UUID) -> List[ProviderModel]:
-        """Get all models for a specific provider."""
-        return self.db.query(ProviderModel).filter(
+    @classmethod
+    def _bump_catalog_version(cls):
+        """Mark cached model catalogs as stale."""
+        ProviderModelRepository.catalog_version += 1
+    
+    def create(self, **kwargs) -> ProviderModel:
+        """Create a model and invalidate cached catalogs."""
+        model = super().create(**kwargs)
+        self._bump_catalog_version()
+        return model
+    
+    def update(self, id: Any, **kwargs) -> Optional[ProviderModel]:
+        """Update a model and invalidate cached catalogs."""
+        model = super().update(id, **kwargs)
+        self._bump_catalog_version()
+        return model
+    
+    def delete(self, id: Any) -> bool:
+        """Delete a model and invalidate cached catalogs."""
+        deleted = super().delete(id)
+        self._bump_catalog_version()
+        return deleted
+    
+    def get_by_provider(self, provider_id: UUID, load_provider: bool = False) -> List[ProviderModel]:
+        """
+        Get all models for a specific provider.
+        
+        Args:
+            provider_id: Provider ID
+            load_provider: Load each model's provider with one extra
+                SELECT ... IN query, for callers that read model.provider
+        """
+        query = self.db.query(ProviderModel)
+        if load_provider:
+            query = query.options(selectinload(ProviderModel.provider))
+        return query.filter(
             and_(
                 ProviderModel.provider_id == provider_id,
                 ProviderModel.is_active == True
             )
         ).all()
     
-    def get_by_name(self, provider_id: UUID, model_name: str) -> Optional[ProviderModel]:
-        """Get a specific model by provider and name."""
-        return self.db.query(ProviderModel).filter(
+    def get_by_name(
+        self,
+        provider_id: UUID,
+        model_name: str,
+        load_provider: bool = False
+    ) -> Optional[ProviderModel]:
+        """
+        Get a specific model by provider and name.
+        
+        Args:
+            provider_id: Provider ID
+            model_name: Model name
+            load_provider: Join the provider into the same query, for callers
+                that read model.provider
+        """
+        query = self.db.query(ProviderModel)
+        if load_provider:
+            query = query.options(joinedload(ProviderModel.provider))
+        return query.filter(
             and_(
                 ProviderModel.provider_id == provider_id,
                 ProviderModel.model_name == model_name
@@ -110,6 +178,7 @@ class ProviderModelRepository(BaseRepository[ProviderModel]):
         model.capabilities = capabilities
         self.db.commit()
         self.db.refresh(model)
+        self._bump_catalog_version()
         
         return model
 
@@ -120,6 +189,38 @@ class ProviderUsageRepository(BaseRepository[ProviderUsage]):
     def __init__(self, db: Session):
         super().__init__(ProviderUsage, db)
     
+    @staticmethod
+    def build_usage_row(
+        user_id: UUID,
+        provider_id: UUID,
+        model_id: UUID,
+        chat_id: UUID,
+        message_id: UUID,
+        tokens_input: int,
+        tokens_output: int,
+        latency_ms: Optional[int] = None,
+        status: str = "success",
+        error_message: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Build a usage row mapping with totals and costs precomputed."""
+        # TODO: Calculate costs based on provider/model pricing
+        return {
+            "user_id": user_id,
+            "provider_id": provider_id,
+            "model_id": model_id,
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "tokens_input": tokens_input,
+            "tokens_output": tokens_output,
+            "tokens_total": tokens_input + tokens_output,
+            "cost_input": 0,
+            "cost_output": 0,
+            "cost_total": 0,
+            "latency_ms": latency_ms,
+            "status": status,
+            "error_message": error_message,
+        }
+    
     def track_usage(
         self,
         user_id: UUID,
@@ -151,35 +252,43 @@ class ProviderUsageRepository(BaseRepository[ProviderUsage]):
         Returns:
             Created usage record
         """
-        usage = ProviderUsage(
-            user_id=user_id,
-            provider_id=provider_id,
-            model_id=model_id,
-            chat_id=chat_id,
-            message_id=message_id,
-            tokens_input=tokens_input,
-            tokens_output=tokens_output,
-            tokens_total=tokens_input + tokens_output,
-            latency_ms=latency_ms,
-            status=status,
-            error_message=error_message
-        )
-        
-        # TODO: Calculate costs based on provider/model pricing
-        usage.cost_input = 0
-        usage.cost_output = 0
-        usage.cost_total = 0
+        usage = ProviderUsage(**self.build_usage_row(
+            user_id, provider_id, model_id, chat_id, message_id,
+            tokens_input, tokens_output, latency_ms, status, error_message
+        ))
         
+        # No refresh: the record is only reloaded if a caller reads it after commit
         self.db.add(usage)
         self.db.commit()
-        self.db.refresh(usage)
         
         return usage
     
+    def track_usage_bulk(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Insert many usage rows in one transaction.
+        
+        Args:
+            rows: Row mappings, usually from build_usage_row
+            
+        Returns:
+            Number of rows inserted
+        """
+        if not rows:
+            return 0
+        
+        try:
+            self.db.bulk_insert_mappings(ProviderUsage, rows)
+            self.db.commit()
+            return len(rows)
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            raise e
+    
     def get_user_usage_summary(
         self, 
         user_id: UUID,
-        provider_id: Optional[UUID] = None
+        provider_id: Optional[UUID] = None,
+        since: Optional[datetime] = None
     ) -> Dict[str, Any]:
         """
         Get usage summary for a user.
@@ -187,28 +296,95 @@ class ProviderUsageRepository(BaseRepository[ProviderUsage]):
         Args:
             user_id: User ID
             provider_id: Optional provider ID to filter by
+            since: Only count usage recorded at or after this time;
+                defaults to the last USAGE_SUMMARY_WINDOW
             
         Returns:
             Usage summary dictionary
         """
-        query = self.db.query(ProviderUsage).filter(
-            ProviderUsage.user_id == user_id
+        if since is None:
+            since = datetime.now(timezone.utc) - USAGE_SUMMARY_WINDOW
+        
+        query = self.db.query(
+            func.coalesce(func.sum(ProviderUsage.tokens_total), 0),
+            func.coalesce(func.sum(ProviderUsage.cost_total), 0),
+            func.count(),
+            func.coalesce(func.sum(case((ProviderUsage.status != "success", 1), else_=0)), 0)
+        ).filter(
+            ProviderUsage.user_id == user_id,
+            ProviderUsage.created_at >= since
         )
         
         if provider_id:
             query = query.filter(ProviderUsage.provider_id == provider_id)
         
-        usage_records = query.all()
-        
-        total_tokens = sum(u.tokens_total for u in usage_records)
-        total_cost = sum(u.cost_total for u in usage_records)
-        request_count = len(usage_records)
-        error_count = sum(1 for u in usage_records if u.status != "success")
+        total_tokens, total_cost, request_count, error_count = query.one()
         
         return {
-            "total_tokens": total_tokens,
+            "total_tokens": int(total_tokens),
             "total_cost": float(total_cost),
             "request_count": request_count,
-            "error_count": error_count,
+            "error_count": int(error_count),
             "success_rate": (request_count - error_count) / request_count if request_count > 0 else 0
-        }
\ No newline at end of file
+        }
+
+
+class UsageFlusher:
+    """
+    Buffers usage rows in memory and writes them in batches.
+    
+    Rows are flushed once batch_size have queued up or flush_interval
+    seconds have passed since the first queued row, whichever comes first.
+    Each flush runs in a worker thread on its own session.
+    """
+    
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int = 100,
+        flush_interval: float = 0.5
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+    
+    def submit(self, **usage: Any) -> None:
+        """Queue a usage record; accepts the arguments of track_usage."""
+        self._queue.put_nowait(ProviderUsageRepository.build_usage_row(**usage))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def _run(self) -> None:
+        """Drain the queue in batches until it is empty."""
+        loop = asyncio.get_running_loop()
+        while not self._queue.empty():
+            rows = [self._queue.get_nowait()]
+            deadline = loop.time() + self.flush_interval
+            while len(rows) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    rows.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Usage is best-effort: log a failed batch and keep draining
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except Exception:
+                logger.exception("Failed to write %d usage rows", len(rows))
+    
+    def _write(self, rows: List[Dict[str, Any]]) -> int:
+        db = self.session_factory()
+        try:
+            return ProviderUsageRepository(db).track_usage_bulk(rows)
+        finally:
+            db.close()
+    
+    async def flush(self) -> None:
+        """Wait for all queued rows to be written."""
+        if self._task is not None:
+            await self._task
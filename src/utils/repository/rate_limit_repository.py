@@ -1,15 +1,43 @@
 """
 Rate limit repository for database operations.
 """
+import time
 import uuid
 from typing import Optional, List
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import bindparam, func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from utils.models.db_models import RateLimit
 from utils.repository.base import BaseRepository
 
+
+# Deletes one batch of expired counters; ctid targets the selected rows directly.
+# Both conditions are served by idx_rate_limits_period_hour. Rows without an
+# hour bucket predate it and are never counted, so they are removed too.
+_DELETE_OLD_BATCH = text(
+    "DELETE FROM rate_limits WHERE ctid IN ("
+    "SELECT ctid FROM rate_limits WHERE period_hour < :threshold_hour OR period_hour IS NULL "
+    "LIMIT :batch_size)"
+)
+
+
+# A user's request total since an hour bucket. Built once and executed with
+# bound values, so every rate-limited request reuses the compiled SQL; served
+# by uq_rate_limits_user_endpoint_hour.
+_SUM_USAGE = select(func.coalesce(func.sum(RateLimit.request_count), 0)).where(
+    RateLimit.user_id == bindparam("user_id"),
+    RateLimit.endpoint == bindparam("endpoint"),
+    RateLimit.period_hour >= bindparam("since_hour")
+)
+
+
+def current_hour_bucket() -> int:
+    """Return the current UTC hour as hours since the epoch."""
+    return int(time.time()) // 3600
+
+
 class RateLimitRepository(BaseRepository):
     """Repository for rate limit operations."""
     
@@ -32,20 +60,12 @@ class RateLimitRepository(BaseRepository):
         Returns:
             Total request count within the period
         """
-        period_start = datetime.now() - timedelta(hours=period_hours)
+        since_hour = current_hour_bucket() - period_hours + 1
         
-        # Get sum of request counts for the period
-        result = (
-            self.db.query(func.sum(self.model.request_count))
-            .filter(
-                self.model.user_id == user_id,
-                self.model.endpoint == endpoint,
-                self.model.period_start >= period_start
-            )
-            .scalar()
+        return self.db.scalar(
+            _SUM_USAGE,
+            {"user_id": user_id, "endpoint": endpoint, "since_hour": since_hour}
         )
-        
-        return result or 0
     
     def increment_usage(self, user_id: uuid.UUID, endpoint: str) -> None:
         """Increment usage for a user and endpoint.
@@ -54,49 +74,45 @@ class RateLimitRepository(BaseRepository):
             user_id: User ID
             endpoint: API endpoint
         """
-        # Get current hour start
-        current_hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+        current_hour = current_hour_bucket()
         
-        # Try to get existing rate limit record for the current hour
-        rate_limit = (
-            self.db.query(self.model)
-            .filter(
-                self.model.user_id == user_id,
-                self.model.endpoint == endpoint,
-                self.model.period_start == current_hour
-            )
-            .first()
+        # Insert the hour's counter or bump it atomically if another request got there first
+        stmt = pg_insert(self.model).values(
+            user_id=user_id,
+            endpoint=endpoint,
+            request_count=1,
+            period_hour=current_hour,
+            period_start=datetime.fromtimestamp(current_hour * 3600, timezone.utc)
+        ).on_conflict_do_update(
+            index_elements=["user_id", "endpoint", "period_hour"],
+            set_={"request_count": self.model.request_count + 1}
         )
         
-        if rate_limit:
-            # Increment existing record
-            rate_limit.request_count += 1
-            self.db.commit()
-        else:
-            # Create new record
-            self.create(
-                user_id=user_id,
-                endpoint=endpoint,
-                request_count=1,
-                period_start=current_hour
-            )
+        self.db.execute(stmt)
+        self.db.commit()
     
-    def clean_old_records(self, hours: int = 24) -> int:
+    def clean_old_records(self, hours: int = 24, batch_size: int = 10_000) -> int:
         """Clean old rate limit records.
         
+        Rows are deleted in batches, each in its own transaction, so a large
+        backlog never holds locks or WAL for the whole cleanup at once.
+        
         Args:
             hours: Age threshold in hours
+            batch_size: Maximum rows deleted per transaction
             
         Returns:
             Number of deleted records
         """
-        threshold = datetime.now() - timedelta(hours=hours)
+        # Compared on the UTC hour bucket, so the server's local time zone doesn't matter
+        threshold_hour = current_hour_bucket() - hours
         
-        deleted = (
-            self.db.query(self.model)
-            .filter(self.model.period_start < threshold)
-            .delete(synchronize_session=False)
-        )
-        
-        self.db.commit()
-        return deleted
\ No newline at end of file
+        deleted = 0
+        while True:
+            result = self.db.execute(
+                _DELETE_OLD_BATCH, {"threshold_hour": threshold_hour, "batch_size": batch_size}
+            )
+            self.db.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                return deleted
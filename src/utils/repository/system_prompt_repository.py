@@ -2,13 +2,18 @@
 System prompt repository for database operations.
 """
 import uuid
-from typing import Optional, List, Dict, Any
+from datetime import datetime
+from operator import attrgetter
+from typing import Optional, List, Dict, Any, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, func
 
 from utils.models.db_models import SystemPrompt
 from utils.repository.base import BaseRepository
 
+# Fetches the response fields from a SystemPrompt in one C-level call
+_prompt_fields = attrgetter("id", "name", "content", "description", "created_at", "updated_at")
+
 class SystemPromptRepository(BaseRepository):
     """Repository for system prompt operations."""
     
@@ -31,23 +36,67 @@ class SystemPromptRepository(BaseRepository):
         """
         return self.get_by_field("name", name)
     
-    def list_prompts(self, skip: int = 0, limit: int = 100) -> List[SystemPrompt]:
+    def exists_by_name(self, name: str) -> bool:
+        """Check whether a system prompt name is taken.
+        
+        Args:
+            name: Name to check
+            
+        Returns:
+            True if a prompt has this name
+        """
+        return self.exists_by_field("name", name)
+    
+    def list_prompts(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        after_name: Optional[str] = None
+    ) -> List[SystemPrompt]:
         """Get a list of system prompts.
         
         Args:
-            skip: Number of records to skip
+            skip: Number of records to skip (ignored when after_name is given)
             limit: Maximum number of records to return
+            after_name: Only return prompts named after this one
             
         Returns:
             List of system prompts
         """
-        return (
-            self.db.query(self.model)
-            .order_by(self.model.name)
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+        query = self.db.query(self.model)
+        if after_name is not None:
+            # Keyset pagination walks the unique name index instead of
+            # scanning and discarding skipped rows
+            query = query.filter(self.model.name > after_name).order_by(self.model.name)
+        else:
+            query = query.order_by(self.model.name).offset(skip)
+        return query.limit(limit).all()
+    
+    def page_prompts(
+        self,
+        after_name: Optional[str] = None,
+        limit: int = 100
+    ) -> Tuple[List[SystemPrompt], Optional[str]]:
+        """Get one keyset-paginated page of system prompts.
+        
+        Args:
+            after_name: Cursor returned by the previous page, or None for the first page
+            limit: Maximum number of records to return
+            
+        Returns:
+            Tuple of (prompts, next_cursor); next_cursor is None on the last page
+        """
+        prompts = self.list_prompts(limit=limit, after_name=after_name)
+        next_cursor = prompts[-1].name if len(prompts) == limit else None
+        return prompts, next_cursor
+    
+    def get_prompts_version(self) -> Tuple[int, Optional[datetime]]:
+        """Get a cheap change marker for the prompt library.
+        
+        Returns:
+            Tuple of (prompt count, latest updated_at)
+        """
+        return self.db.query(func.count(self.model.id), func.max(self.model.updated_at)).one()
     
     def create_prompt(self, name: str, content: str, description: Optional[str] = None) -> SystemPrompt:
         """Create a new system prompt.
@@ -83,14 +132,7 @@ class SystemPromptRepository(BaseRepository):
         Returns:
             Formatted prompt dictionary
         """
-        return {
-            "id": str(prompt.id),
-            "name": prompt.name,
-            "content": prompt.content,
-            "description": prompt.description or "",
-            "created_at": prompt.created_at.isoformat(),
-            "updated_at": prompt.updated_at.isoformat()
-        }
+        return self.format_prompts_list([prompt])[0]
     
     def format_prompts_list(self, prompts: List[SystemPrompt]) -> List[Dict[str, Any]]:
         """Format a list of system prompts for API response.
@@ -101,4 +143,17 @@ class SystemPromptRepository(BaseRepository):
         Returns:
             List of formatted prompt dictionaries
         """
-        return [self.format_prompt_for_response(prompt) for prompt in prompts]
\ No newline at end of file
+        # Unbound method skips a bound-method lookup per timestamp
+        isoformat = datetime.isoformat
+        return [
+            {
+                "id": str(prompt_id),
+                "name": name,
+                "content": content,
+                "description": description or "",
+                "created_at": isoformat(created_at),
+                "updated_at": isoformat(updated_at)
+            }
+            for prompt_id, name, content, description, created_at, updated_at
+            in map(_prompt_fields, prompts)
+        ]
\ No newline at end of file
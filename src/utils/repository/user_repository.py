@@ -1,6 +1,7 @@
 """
 User repository for database operations.
 """
+import asyncio
 import uuid
 import secrets
 import hashlib
@@ -11,8 +12,36 @@ from passlib.context import CryptContext
 from utils.models.db_models import User
 from utils.repository.base import BaseRepository
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+try:
+    import argon2  # noqa: F401 - backend for passlib's argon2 scheme
+    ARGON2_AVAILABLE = True
+except ImportError:
+    ARGON2_AVAILABLE = False
+
+# Password hashing: argon2id spreads each hash over several cores when
+# argon2-cffi is installed; bcrypt hashes still verify and are upgraded on
+# the next successful login
+if ARGON2_AVAILABLE:
+    pwd_context = CryptContext(
+        schemes=["argon2", "bcrypt"],
+        deprecated="auto",
+        argon2__parallelism=4,
+        argon2__memory_cost=65536,
+        argon2__time_cost=2
+    )
+else:
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# Hash checked for unknown usernames. Built at import so the first unknown
+# login doesn't pay for hashing on top of verifying.
+DUMMY_HASH = pwd_context.hash(secrets.token_hex(16))
+
+
+def hash_api_key(api_key: str) -> bytes:
+    """Return the SHA-256 digest stored for an API key."""
+    return hashlib.sha256(api_key.encode()).digest()
+
 
 class UserRepository(BaseRepository):
     """Repository for user operations."""
@@ -47,6 +76,28 @@ class UserRepository(BaseRepository):
         """
         return self.get_by_field("email", email)
     
+    def exists_by_username(self, username: str) -> bool:
+        """Check whether a username is taken.
+        
+        Args:
+            username: Username to check
+            
+        Returns:
+            True if a user has this username
+        """
+        return self.exists_by_field("username", username)
+    
+    def exists_by_email(self, email: str) -> bool:
+        """Check whether an email is registered.
+        
+        Args:
+            email: Email to check
+            
+        Returns:
+            True if a user has this email
+        """
+        return self.exists_by_field("email", email)
+    
     def get_by_api_key(self, api_key: str) -> Optional[User]:
         """Get a user by API key.
         
@@ -56,7 +107,7 @@ class UserRepository(BaseRepository):
         Returns:
             User or None if not found
         """
-        return self.get_by_field("api_key", api_key)
+        return self.get_by_field("api_key_hash", hash_api_key(api_key))
     
     def create_user(self, username: str, email: str, password: str, is_admin: bool = False) -> User:
         """Create a new user.
@@ -68,7 +119,7 @@ class UserRepository(BaseRepository):
             is_admin: Whether the user is an admin
             
         Returns:
-            Created user
+            Created user, with the new raw key on its api_key attribute
         """
         # Hash the password
         hashed_password = pwd_context.hash(password)
@@ -77,13 +128,16 @@ class UserRepository(BaseRepository):
         api_key = self._generate_api_key()
         
         # Create user
-        return self.create(
+        user = self.create(
             username=username,
             email=email,
             hashed_password=hashed_password,
-            api_key=api_key,
+            api_key_hash=hash_api_key(api_key),
             is_admin=is_admin
         )
+        # Only the hash is persisted; the raw key is handed back once
+        user.api_key = api_key
+        return user
     
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify a password against a hash.
@@ -97,9 +151,24 @@ class UserRepository(BaseRepository):
         """
         return pwd_context.verify(plain_password, hashed_password)
     
-    def authenticate_user(self, username: str, password: str) -> Optional[User]:
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """Check whether a password hash uses a deprecated scheme or settings.
+        
+        Args:
+            hashed_password: Hashed password
+            
+        Returns:
+            True if the hash should be replaced
+        """
+        return pwd_context.needs_update(hashed_password)
+    
+    async def authenticate_user(self, username: str, password: str) -> Optional[User]:
         """Authenticate a user with username and password.
         
+        Hashing runs in the default executor so it doesn't block the event
+        loop. Unknown usernames are verified against a dummy hash, so they
+        take as long as a wrong password.
+        
         Args:
             username: Username
             password: Plain text password
@@ -107,13 +176,16 @@ class UserRepository(BaseRepository):
         Returns:
             User if authenticated, None otherwise
         """
+        loop = asyncio.get_running_loop()
         user = self.get_by_username(username)
-        if not user:
-            return None
-        if not self.verify_password(password, user.hashed_password):
-            return None
-        if not user.is_active:
+        hashed_password = user.hashed_password if user else DUMMY_HASH
+        
+        valid = await loop.run_in_executor(None, self.verify_password, password, hashed_password)
+        if not user or not valid or not user.is_active:
             return None
+        if self.needs_rehash(user.hashed_password):
+            new_hash = await loop.run_in_executor(None, pwd_context.hash, password)
+            user = self.update(user.id, hashed_password=new_hash)
         return user
     
     def regenerate_api_key(self, user_id: uuid.UUID) -> Optional[User]:
@@ -123,10 +195,13 @@ class UserRepository(BaseRepository):
             user_id: User ID
             
         Returns:
-            Updated user with new API key
+            Updated user, with the new raw key on its api_key attribute
         """
         api_key = self._generate_api_key()
-        return self.update(user_id, api_key=api_key)
+        user = self.update(user_id, api_key_hash=hash_api_key(api_key))
+        if user is not None:
+            user.api_key = api_key
+        return user
     
     def _generate_api_key(self) -> str:
         """Generate a secure API key.
@@ -1,25 +1,180 @@
 import os
-import json
+import copy
+import mmap
+import asyncio
+import threading
 import uuid
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable, Tuple
 from fastapi import HTTPException
 from .config import config
+from . import json_utils
 
 # Directory for storing system prompts
 SYSTEM_PROMPTS_DIR = config.SYSTEM_PROMPTS_DIR
 ACTIVE_PROMPT_FILE = config.SYSTEM_PROMPT_FILE
+INDEX_FILE = os.path.join(SYSTEM_PROMPTS_DIR, "index.json")
+
+# Seed content for the "basic" prompt; the Docker image copies it to /app
+BASE_PROMPT_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "base_system_prompt.txt")
+DOCKER_BASE_PROMPT_FILE = "/app/base_system_prompt.txt"
+
+# Prompts created on first run and protected from deletion, as
+# (id, name, description, content); None content means the base prompt
+DEFAULT_PROMPTS = (
+    (
+        "basic",
+        "Basic Assistant",
+        "A helpful, general-purpose AI assistant",
+        None
+    ),
+    (
+        "code-assistant",
+        "Code Assistant",
+        "Specialized for programming help and code explanations",
+        "You are a helpful code assistant. You help users write, debug, and understand code. When providing code examples, ensure they are correct, efficient, and well-documented. If you're unsure about something, acknowledge it rather than guessing."
+    ),
+    (
+        "research-assistant",
+        "Research Assistant",
+        "Focused on helping with research tasks and information synthesis",
+        "You are a research assistant specialized in finding, organizing, and synthesizing information. Provide comprehensive answers with relevant details, but prioritize accuracy over speculation. When appropriate, suggest related topics or research directions that might be valuable to the user."
+    ),
+)
+DEFAULT_PROMPT_IDS = frozenset(prompt_id for prompt_id, _, _, _ in DEFAULT_PROMPTS)
+
+# Set once SYSTEM_PROMPTS_DIR is known to exist, so path lookups on read
+# paths stop issuing a mkdir per call
+_dirs_ready = False
+
+# Parsed prompt files by path: {path: ((st_mtime_ns, st_size), value)}. A file
+# is only re-read when its stat changes; writers in this module store what
+# they wrote, so the in-process index is never re-parsed after a mutation.
+_file_cache: "OrderedDict[str, Tuple[Tuple[int, int], Any]]" = OrderedDict()
+_FILE_CACHE_SIZE = 128
+# Guards _file_cache, which handlers touch from asyncio.to_thread workers
+_file_cache_lock = threading.Lock()
+
+# Files at least this large are parsed straight from a read-only mapping
+# when orjson is available, instead of being copied into a bytes buffer
+_MMAP_MIN_SIZE = 1 << 20
+
+# Serializes read-modify-write cycles on index.json; handlers run file I/O in
+# worker threads, so concurrent creates/deletes could otherwise drop entries.
+# Reentrant so a caller holding it can pass a preloaded index along.
+_index_lock = threading.RLock()
+
+
+def _read_cached(path: str, parse: Callable[[bytes], Any], mappable: bool = False) -> Any:
+    """Return the parsed contents of a file, re-reading it only when it changed.
+    
+    Args:
+        path: File to read
+        parse: Converts the raw file contents to the cached value
+        mappable: parse also accepts a memoryview, so large files can be
+            parsed from a memory mapping without copying
+    
+    Raises:
+        FileNotFoundError: If the file doesn't exist
+    """
+    st = os.stat(path)
+    version = (st.st_mtime_ns, st.st_size)
+    with _file_cache_lock:
+        cached = _file_cache.get(path)
+        if cached is not None and cached[0] == version:
+            _file_cache.move_to_end(path)
+            return cached[1]
+    
+    with open(path, "rb") as file:
+        if mappable and st.st_size >= _MMAP_MIN_SIZE:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                value = parse(view)
+        else:
+            value = parse(file.read())
+    _store(path, version, value)
+    return value
+
+
+def _store(path: str, version: Tuple[int, int], value: Any) -> None:
+    """Cache a file's parsed contents under its stat version."""
+    with _file_cache_lock:
+        _file_cache[path] = (version, value)
+        _file_cache.move_to_end(path)
+        if len(_file_cache) > _FILE_CACHE_SIZE:
+            _file_cache.popitem(last=False)
+
+
+def _remember(path: str, value: Any) -> None:
+    """Cache contents this process just wrote, so they aren't read back.
+    
+    The value is shared with later readers and must not be mutated.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        # Removed or replaced underneath us; the next read goes to disk
+        _forget(path)
+        return
+    _store(path, (st.st_mtime_ns, st.st_size), value)
+
+
+def _decode_text(data: bytes) -> str:
+    """Decode a plain-text prompt file, stripping surrounding whitespace.
+    
+    Strips the bytes before decoding so only one str is built.
+    """
+    return data.strip().decode()
+
+
+def _forget(path: str) -> None:
+    """Drop a file's cached contents after writing or removing it."""
+    with _file_cache_lock:
+        _file_cache.pop(path, None)
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    """Replace a file's contents via a temp file and rename.
+    
+    os.replace is atomic on POSIX, so readers see the old or the new file,
+    never a truncated one, even if the process dies mid-write.
+    """
+    tmp_path = f"{path}.tmp.{os.getpid()}.{uuid.uuid4().hex}"
+    try:
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _write_json(path: str, obj: Any) -> None:
+    """Write an object to a prompt file as indented JSON and cache it."""
+    _atomic_write(path, json_utils.dumps_bytes(obj, indent=True))
+    _remember(path, obj)
 
 class SystemPromptManager:
     """
     Manager for system prompts with CRUD operations.
     Handles storage, retrieval, and management of system prompts.
+    
+    Prompts live as one JSON file each plus index.json. This is the legacy
+    file store: the API serves prompts from the system_prompts table through
+    SystemPromptManagerDB, and utils.migration imports these files into it.
     """
     
     @staticmethod
     def ensure_directories():
         """Ensure that the necessary directories exist"""
+        global _dirs_ready
+        if _dirs_ready:
+            return
         os.makedirs(SYSTEM_PROMPTS_DIR, exist_ok=True)
+        _dirs_ready = True
         
     @staticmethod
     def get_system_prompt() -> str:
@@ -30,15 +185,14 @@ class SystemPromptManager:
             str: The active system prompt
         """
         try:
-            if os.path.exists(ACTIVE_PROMPT_FILE):
-                with open(ACTIVE_PROMPT_FILE, "r") as file:
-                    return file.read().strip()
-            else:
+            try:
+                return _read_cached(ACTIVE_PROMPT_FILE, _decode_text)
+            except FileNotFoundError:
                 # Default system prompt if file doesn't exist
                 default_prompt = "You are a helpful AI assistant."
                 # Create the file with default prompt
-                with open(ACTIVE_PROMPT_FILE, "w") as file:
-                    file.write(default_prompt)
+                _atomic_write(ACTIVE_PROMPT_FILE, default_prompt.encode())
+                _forget(ACTIVE_PROMPT_FILE)
                 return default_prompt
         except Exception as e:
             print(f"Error reading system prompt file: {e}")
@@ -63,8 +217,10 @@ class SystemPromptManager:
                 }
                 
             # Save the new prompt to the file
-            with open(ACTIVE_PROMPT_FILE, "w") as file:
-                file.write(new_prompt)
+            data = new_prompt.encode()
+            _atomic_write(ACTIVE_PROMPT_FILE, data)
+            # Cache exactly what get_system_prompt would decode from disk
+            _remember(ACTIVE_PROMPT_FILE, _decode_text(data))
                 
             return {
                 "message": "System prompt updated successfully",
@@ -99,57 +255,51 @@ class SystemPromptManager:
         Returns:
             Dict[str, Any]: Dictionary containing prompt index information
         """
-        index_file = os.path.join(SYSTEM_PROMPTS_DIR, "index.json")
+        index_file = INDEX_FILE
         
         try:
             cls.ensure_directories()
             
-            if os.path.exists(index_file):
-                with open(index_file, "r") as file:
-                    return json.load(file)
-            else:
+            try:
+                # Callers edit the index in place, so hand out a copy
+                return copy.deepcopy(
+                    _read_cached(index_file, json_utils.loads, mappable=json_utils.ORJSON_AVAILABLE)
+                )
+            except FileNotFoundError:
                 # Create a new prompts index file with defaults
-                base_prompt_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "base_system_prompt.txt")
-                docker_path = "/app/base_system_prompt.txt"
-                
-                if os.path.exists(docker_path):
-                    base_prompt_path = docker_path
+                base_prompt_path = BASE_PROMPT_FILE
+                if os.path.exists(DOCKER_BASE_PROMPT_FILE):
+                    base_prompt_path = DOCKER_BASE_PROMPT_FILE
                 
                 base_prompt = "You are a helpful AI assistant."
                 if os.path.exists(base_prompt_path):
-                    with open(base_prompt_path, "r") as file:
-                        base_prompt = file.read().strip()
+                    with open(base_prompt_path, "rb") as file:
+                        base_prompt = _decode_text(file.read())
                 
+                created_at = datetime.now().isoformat()
                 default_prompts = {
-                    "basic": {
-                        "name": "Basic Assistant",
-                        "description": "A helpful, general-purpose AI assistant",
-                        "created_at": datetime.now().isoformat(),
-                        "content": base_prompt
-                    },
-                    "code-assistant": {
-                        "name": "Code Assistant",
-                        "description": "Specialized for programming help and code explanations",
-                        "created_at": datetime.now().isoformat(),
-                        "content": "You are a helpful code assistant. You help users write, debug, and understand code. When providing code examples, ensure they are correct, efficient, and well-documented. If you're unsure about something, acknowledge it rather than guessing."
-                    },
-                    "research-assistant": {
-                        "name": "Research Assistant",
-                        "description": "Focused on helping with research tasks and information synthesis",
-                        "created_at": datetime.now().isoformat(),
-                        "content": "You are a research assistant specialized in finding, organizing, and synthesizing information. Provide comprehensive answers with relevant details, but prioritize accuracy over speculation. When appropriate, suggest related topics or research directions that might be valuable to the user."
+                    prompt_id: {
+                        "name": name,
+                        "description": description,
+                        "created_at": created_at,
+                        "content": base_prompt if content is None else content
                     }
+                    for prompt_id, name, description, content in DEFAULT_PROMPTS
                 }
                 
-                # Create prompt files for each default prompt
-                for prompt_id, prompt_data in default_prompts.items():
-                    prompt_file_path = cls.get_system_prompt_file_path(prompt_id)
-                    with open(prompt_file_path, "w") as file:
-                        json.dump(prompt_data, file, indent=2)
-                
                 prompts_index = {"prompts": {prompt_id: {**prompt_data, "id": prompt_id} for prompt_id, prompt_data in default_prompts.items()}}
-                with open(index_file, "w") as file:
-                    json.dump(prompts_index, file, indent=2)
+                
+                # Serialize everything up front and write it in one pass; the
+                # directory was ensured above, and the index goes last so it
+                # never lists a prompt whose file wasn't written
+                pending_files = [
+                    (os.path.join(SYSTEM_PROMPTS_DIR, f"{prompt_id}.json"), json_utils.dumps_bytes(prompt_data, indent=True))
+                    for prompt_id, prompt_data in default_prompts.items()
+                ]
+                pending_files.append((index_file, json_utils.dumps_bytes(prompts_index, indent=True)))
+                for path, data in pending_files:
+                    _atomic_write(path, data)
+                    _forget(path)
                 
                 # Set the default "basic" prompt as active
                 cls.update_system_prompt(default_prompts["basic"]["content"])
@@ -160,32 +310,40 @@ class SystemPromptManager:
             return {"prompts": {}}
     
     @classmethod
-    def update_prompts_index(cls, prompt_id: str, prompt_info: Dict[str, Any]) -> None:
+    def update_prompts_index(
+        cls,
+        prompt_id: str,
+        prompt_info: Dict[str, Any],
+        prompts_index: Optional[Dict[str, Any]] = None
+    ) -> None:
         """
         Update the prompts index with information about a specific prompt.
         
         Args:
             prompt_id (str): The prompt ID
             prompt_info (Dict[str, Any]): Information about the prompt
+            prompts_index (Optional[Dict[str, Any]]): Index the caller already
+                loaded while holding _index_lock; loaded here when omitted
         """
-        index_file = os.path.join(SYSTEM_PROMPTS_DIR, "index.json")
+        index_file = INDEX_FILE
         
         try:
-            prompts_index = cls.get_prompts_index()
-            
-            # Update or add the prompt info in the index
-            prompts_index["prompts"][prompt_id] = {
-                "id": prompt_id,
-                "name": prompt_info.get("name", f"Prompt {prompt_id}"),
-                "description": prompt_info.get("description", ""),
-                "created_at": prompt_info.get("created_at", datetime.now().isoformat()),
-                "updated_at": datetime.now().isoformat(),
-                # Don't store the full content in the index to keep it smaller
-            }
-            
-            # Save the updated index
-            with open(index_file, "w") as file:
-                json.dump(prompts_index, file, indent=2)
+            with _index_lock:
+                if prompts_index is None:
+                    prompts_index = cls.get_prompts_index()
+                
+                # Update or add the prompt info in the index
+                prompts_index["prompts"][prompt_id] = {
+                    "id": prompt_id,
+                    "name": prompt_info.get("name", f"Prompt {prompt_id}"),
+                    "description": prompt_info.get("description", ""),
+                    "created_at": prompt_info.get("created_at", datetime.now().isoformat()),
+                    "updated_at": datetime.now().isoformat(),
+                    # Don't store the full content in the index to keep it smaller
+                }
+                
+                # Save the updated index
+                _write_json(index_file, prompts_index)
         except Exception as e:
             print(f"Error updating prompts index: {e}")
     
@@ -229,8 +387,7 @@ class SystemPromptManager:
             
             # Save the prompt to a file
             prompt_file_path = cls.get_system_prompt_file_path(prompt_id)
-            with open(prompt_file_path, "w") as file:
-                json.dump(prompt_data, file, indent=2)
+            _write_json(prompt_file_path, prompt_data)
             
             # Update the index
             cls.update_prompts_index(prompt_id, prompt_data)
@@ -261,14 +418,13 @@ class SystemPromptManager:
         file_path = cls.get_system_prompt_file_path(prompt_id)
         
         try:
-            if os.path.exists(file_path):
-                with open(file_path, "r") as file:
-                    prompt_data = json.load(file)
-                    # Add the ID to the data
-                    prompt_data["id"] = prompt_id
-                    return prompt_data
-            else:
+            try:
+                prompt_data = copy.deepcopy(_read_cached(file_path, json_utils.loads))
+            except FileNotFoundError:
                 return None
+            # Add the ID to the data
+            prompt_data["id"] = prompt_id
+            return prompt_data
         except Exception as e:
             print(f"Error loading system prompt {prompt_id}: {e}")
             return None
@@ -293,6 +449,7 @@ class SystemPromptManager:
                     "error": f"System prompt {prompt_id} not found",
                     "success": False
                 }
+            file_path = cls.get_system_prompt_file_path(prompt_id)
             
             # Apply updates
             if "name" in updates and updates["name"]:
@@ -310,13 +467,12 @@ class SystemPromptManager:
             # Remove ID before saving to file (it's derived from filename)
             file_data = {k: v for k, v in prompt_data.items() if k != "id"}
             
-            # Save the updated prompt
-            file_path = cls.get_system_prompt_file_path(prompt_id)
-            with open(file_path, "w") as file:
-                json.dump(file_data, file, indent=2)
-            
-            # Update the index
-            cls.update_prompts_index(prompt_id, file_data)
+            # Save the updated prompt and index in one pass, loading the
+            # index once
+            with _index_lock:
+                prompts_index = cls.get_prompts_index()
+                _write_json(file_path, file_data)
+                cls.update_prompts_index(prompt_id, file_data, prompts_index)
             
             return {
                 "message": f"System prompt {prompt_id} updated successfully",
@@ -341,7 +497,7 @@ class SystemPromptManager:
             Dict[str, Any]: Result of the operation
         """
         # Don't allow deletion of default prompts
-        if prompt_id in ["basic", "code-assistant", "research-assistant"]:
+        if prompt_id in DEFAULT_PROMPT_IDS:
             return {
                 "error": f"Cannot delete default system prompt: {prompt_id}",
                 "success": False
@@ -359,16 +515,17 @@ class SystemPromptManager:
             
             # Remove the prompt file
             os.remove(file_path)
+            _forget(file_path)
             
             # Update the index
-            prompts_index = cls.get_prompts_index()
-            if prompt_id in prompts_index["prompts"]:
-                del prompts_index["prompts"][prompt_id]
-                
-                # Save the updated index
-                index_file = os.path.join(SYSTEM_PROMPTS_DIR, "index.json")
-                with open(index_file, "w") as file:
-                    json.dump(prompts_index, file, indent=2)
+            with _index_lock:
+                prompts_index = cls.get_prompts_index()
+                if prompt_id in prompts_index["prompts"]:
+                    del prompts_index["prompts"][prompt_id]
+                    
+                    # Save the updated index
+                    index_file = INDEX_FILE
+                    _write_json(index_file, prompts_index)
             
             return {
                 "message": f"System prompt {prompt_id} deleted successfully",
@@ -418,10 +575,11 @@ class SystemPromptManager:
                 "success": False
             }
     
-    # HTTP handler methods for API integration
+    # HTTP handler methods for API integration. File I/O runs in the default
+    # executor so prompt CRUD never blocks the event loop.
     
     @staticmethod
-    def handle_get_active_prompt() -> Dict[str, Any]:
+    async def handle_get_active_prompt() -> Dict[str, Any]:
         """
         Handle request to get the active system prompt.
         
@@ -429,7 +587,7 @@ class SystemPromptManager:
             Dict[str, Any]: System prompt information
         """
         try:
-            prompt = SystemPromptManager.get_system_prompt()
+            prompt = await asyncio.to_thread(SystemPromptManager.get_system_prompt)
             return {
                 "prompt": prompt,
                 "success": True
@@ -441,7 +599,7 @@ class SystemPromptManager:
             }
     
     @staticmethod
-    def handle_update_active_prompt(request: Dict[str, Any]) -> Dict[str, Any]:
+    async def handle_update_active_prompt(request: Dict[str, Any]) -> Dict[str, Any]:
         """
         Handle request to update the active system prompt.
         
@@ -461,14 +619,14 @@ class SystemPromptManager:
         if not new_prompt or not isinstance(new_prompt, str):
             raise HTTPException(status_code=400, detail="Prompt must be a non-empty string")
             
-        result = SystemPromptManager.update_system_prompt(new_prompt)
+        result = await asyncio.to_thread(SystemPromptManager.update_system_prompt, new_prompt)
         if not result.get("success", False):
             raise HTTPException(status_code=500, detail=result.get("error", "Failed to update system prompt"))
             
         return result
     
     @classmethod
-    def handle_get_all_prompts(cls) -> Dict[str, Any]:
+    async def handle_get_all_prompts(cls) -> Dict[str, Any]:
         """
         Handle request to get all system prompts.
         
@@ -476,7 +634,7 @@ class SystemPromptManager:
             Dict[str, Any]: All system prompts
         """
         try:
-            prompts_index = cls.get_prompts_index()
+            prompts_index = await asyncio.to_thread(cls.get_prompts_index)
             return {
                 "prompts": prompts_index.get("prompts", {}),
                 "success": True
@@ -488,7 +646,7 @@ class SystemPromptManager:
             }
     
     @classmethod
-    def handle_get_prompt(cls, prompt_id: str) -> Dict[str, Any]:
+    async def handle_get_prompt(cls, prompt_id: str) -> Dict[str, Any]:
         """
         Handle request to get a specific system prompt.
         
@@ -501,7 +659,7 @@ class SystemPromptManager:
         Raises:
             HTTPException: If the prompt is not found
         """
-        prompt = cls.get_system_prompt_by_id(prompt_id)
+        prompt = await asyncio.to_thread(cls.get_system_prompt_by_id, prompt_id)
         if not prompt:
             raise HTTPException(status_code=404, detail=f"System prompt {prompt_id} not found")
             
@@ -511,7 +669,7 @@ class SystemPromptManager:
         }
     
     @classmethod
-    def handle_create_prompt(cls, request: Dict[str, Any]) -> Dict[str, Any]:
+    async def handle_create_prompt(cls, request: Dict[str, Any]) -> Dict[str, Any]:
         """
         Handle request to create a new system prompt.
         
@@ -532,7 +690,8 @@ class SystemPromptManager:
             
         description = request.get("description", "")
         
-        result = cls.create_system_prompt(
+        result = await asyncio.to_thread(
+            cls.create_system_prompt,
             name=request["name"],
             content=request["content"],
             description=description
@@ -544,7 +703,7 @@ class SystemPromptManager:
         return result
     
     @classmethod
-    def handle_update_prompt(cls, prompt_id: str, request: Dict[str, Any]) -> Dict[str, Any]:
+    async def handle_update_prompt(cls, prompt_id: str, request: Dict[str, Any]) -> Dict[str, Any]:
         """
         Handle request to update a system prompt.
         
@@ -572,7 +731,7 @@ class SystemPromptManager:
         if not updates:
             raise HTTPException(status_code=400, detail="No valid update fields provided")
             
-        result = cls.update_system_prompt_by_id(prompt_id, updates)
+        result = await asyncio.to_thread(cls.update_system_prompt_by_id, prompt_id, updates)
         
         if not result.get("success", False):
             status_code = 404 if "not found" in result.get("error", "") else 500
@@ -581,7 +740,7 @@ class SystemPromptManager:
         return result
     
     @classmethod
-    def handle_delete_prompt(cls, prompt_id: str) -> Dict[str, Any]:
+    async def handle_delete_prompt(cls, prompt_id: str) -> Dict[str, Any]:
         """
         Handle request to delete a system prompt.
         
@@ -594,7 +753,7 @@ class SystemPromptManager:
         Raises:
             HTTPException: If the prompt is not found or cannot be deleted
         """
-        result = cls.delete_system_prompt(prompt_id)
+        result = await asyncio.to_thread(cls.delete_system_prompt, prompt_id)
         
         if not result.get("success", False):
             status_code = 404 if "not found" in result.get("error", "") else 500
@@ -603,7 +762,7 @@ class SystemPromptManager:
         return result
     
     @classmethod
-    def handle_activate_prompt(cls, prompt_id: str) -> Dict[str, Any]:
+    async def handle_activate_prompt(cls, prompt_id: str) -> Dict[str, Any]:
         """
         Handle request to activate a system prompt.
         
@@ -616,7 +775,7 @@ class SystemPromptManager:
         Raises:
             HTTPException: If the prompt is not found or cannot be activated
         """
-        result = cls.activate_system_prompt(prompt_id)
+        result = await asyncio.to_thread(cls.activate_system_prompt, prompt_id)
         
         if not result.get("success", False):
             status_code = 404 if "not found" in result.get("error", "") else 500
@@ -5,8 +5,11 @@ from fastapi import HTTPException, Depends
 from sqlalchemy.orm import Session
 import uuid
 import os
-from typing import Dict, Any, Optional, List
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
 
+from utils import json_utils
 from utils.database import get_db
 from utils.repository.system_prompt_repository import SystemPromptRepository
 from utils.models.db_models import SystemPrompt
@@ -15,6 +18,10 @@ from utils.models.db_models import SystemPrompt
 from utils.config import config
 ACTIVE_PROMPT_FILE = config.SYSTEM_PROMPT_FILE
 
+# Encoded prompt library bodies by ETag, oldest first
+_prompts_json_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_PROMPTS_JSON_CACHE_SIZE = 32
+
 class SystemPromptManagerDB:
     """
     Database-backed manager for system prompts with CRUD operations.
@@ -219,8 +226,7 @@ class SystemPromptManagerDB:
             repo = SystemPromptRepository(db)
             
             # Check if a prompt with this name already exists
-            existing = repo.get_by_name(name)
-            if existing:
+            if repo.exists_by_name(name):
                 return {
                     "error": f"A system prompt with name '{name}' already exists",
                     "success": False
@@ -280,8 +286,7 @@ class SystemPromptManagerDB:
             if "name" in updates and updates["name"]:
                 # Check if name is being changed and if new name already exists
                 if updates["name"] != prompt.name:
-                    existing = repo.get_by_name(updates["name"])
-                    if existing:
+                    if repo.exists_by_name(updates["name"]):
                         return {
                             "error": f"A system prompt with name '{updates['name']}' already exists",
                             "success": False
@@ -474,6 +479,39 @@ class SystemPromptManagerDB:
             
         return result
     
+    @staticmethod
+    def get_all_prompts_json(db: Session) -> Tuple[Optional[str], bytes]:
+        """
+        Get all system prompts as encoded JSON, with an ETag for the library state.
+        
+        Encoded bodies are cached by ETag, so unchanged libraries are not
+        re-serialized.
+        
+        Args:
+            db: Database session
+            
+        Returns:
+            Tuple[Optional[str], bytes]: ETag (None if it couldn't be computed) and JSON body
+        """
+        try:
+            count, last_updated = SystemPromptRepository(db).get_prompts_version()
+        except Exception:
+            return None, json_utils.dumps_bytes(SystemPromptManagerDB.get_all_prompts(db))
+        
+        marker = f"{count}:{last_updated.isoformat() if last_updated else ''}"
+        etag = f'"{hashlib.sha1(marker.encode()).hexdigest()}"'
+        
+        body = _prompts_json_cache.get(etag)
+        if body is None:
+            result = SystemPromptManagerDB.get_all_prompts(db)
+            body = json_utils.dumps_bytes(result)
+            if not result["success"]:
+                return None, body
+            _prompts_json_cache[etag] = body
+            if len(_prompts_json_cache) > _PROMPTS_JSON_CACHE_SIZE:
+                _prompts_json_cache.popitem(last=False)
+        return etag, body
+    
     @staticmethod
     def handle_get_all_prompts(db: Session = Depends(get_db)) -> Dict[str, Any]:
         """
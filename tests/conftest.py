@@ -4,6 +4,8 @@ Minimal conftest.py for initial test setup
 import pytest
 import sys
 import os
+from sqlalchemy import event
+from sqlalchemy.orm import Session, raiseload
 
 # Add src to Python path so we can import our modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -15,4 +17,22 @@ def sample_data():
     return {
         "message": "Hello, test!",
         "status": "success"
-    }
\ No newline at end of file
+    }
+
+
+def _raise_on_lazy_load(orm_execute_state):
+    """Make relationships on selected rows raise instead of lazy loading."""
+    if orm_execute_state.is_select and not orm_execute_state.is_relationship_load:
+        orm_execute_state.statement = orm_execute_state.statement.options(raiseload("*"))
+
+
+@pytest.fixture(autouse=True)
+def no_lazy_loads():
+    """Fail tests that trigger an N+1 lazy load on a real session.
+    
+    Queries that need a relationship must ask for it with selectinload or
+    joinedload; explicit loader options take precedence over raiseload("*").
+    """
+    event.listen(Session, "do_orm_execute", _raise_on_lazy_load)
+    yield
+    event.remove(Session, "do_orm_execute", _raise_on_lazy_load)
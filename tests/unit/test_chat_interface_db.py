@@ -158,7 +158,7 @@ class TestChatInterfaceDB:
             MockMessage(role="system", content="System prompt"),
             MockMessage(role="user", content="Hello")
         ]
-        msg_repo_instance.list_by_chat.return_value = mock_messages
+        msg_repo_instance.page_by_chat.return_value = (mock_messages, None)
         
         mock_repositories['chat'].return_value = chat_repo_instance
         mock_repositories['message'].return_value = msg_repo_instance
@@ -194,7 +194,7 @@ class TestChatInterfaceDB:
             MockMessage(role="assistant", content="Previous response"),
             MockMessage(role="user", content="Hello again")
         ]
-        msg_repo_instance.list_by_chat.return_value = mock_messages
+        msg_repo_instance.page_by_chat.return_value = (mock_messages, None)
         
         mock_repositories['chat'].return_value = chat_repo_instance
         mock_repositories['message'].return_value = msg_repo_instance
@@ -210,6 +210,44 @@ class TestChatInterfaceDB:
         # Verify only user and assistant messages were created (not system)
         assert msg_repo_instance.create_message.call_count == 2
     
+    @pytest.mark.asyncio
+    async def test_chat_with_llm_submits_usage(self, mock_db, mock_repositories):
+        """Test a provider completion queues a usage record for the reply."""
+        user_id = uuid.uuid4()
+        provider_id = uuid.uuid4()
+        
+        provider_instance = Mock()
+        provider_instance.config.id = str(provider_id)
+        provider_instance.chat_completion = AsyncMock(return_value=Mock(
+            content="Mock assistant response", role="assistant",
+            usage={"prompt_tokens": 12, "completion_tokens": 5, "total_tokens": 17}
+        ))
+        provider_manager = Mock()
+        provider_manager.get_provider.return_value = provider_instance
+        usage_flusher = Mock()
+        chat_interface = ChatInterfaceDB(provider_manager=provider_manager, usage_flusher=usage_flusher)
+        
+        chat_repo_instance = Mock()
+        msg_repo_instance = Mock()
+        mock_chat = MockChat(user_id=user_id)
+        chat_repo_instance.create_chat.return_value = mock_chat
+        assistant_message = MockMessage(role="assistant", content="Mock assistant response")
+        msg_repo_instance.create_message.return_value = assistant_message
+        msg_repo_instance.page_by_chat.return_value = ([MockMessage(role="user", content="Hello")], None)
+        mock_repositories['chat'].return_value = chat_repo_instance
+        mock_repositories['message'].return_value = msg_repo_instance
+        
+        result = await chat_interface.chat_with_llm("Hello", user_id, None, mock_db)
+        
+        assert result["success"] is True
+        usage_flusher.submit.assert_called_once()
+        usage = usage_flusher.submit.call_args.kwargs
+        assert usage["user_id"] == user_id
+        assert usage["provider_id"] == provider_id
+        assert usage["chat_id"] == mock_chat.id
+        assert usage["message_id"] == assistant_message.id
+        assert (usage["tokens_input"], usage["tokens_output"]) == (12, 5)
+    
     @pytest.mark.asyncio
     async def test_chat_with_llm_invalid_chat_id(self, chat_interface_db, mock_db):
         """Test chat with invalid chat ID."""
@@ -229,7 +267,7 @@ class TestChatInterfaceDB:
         
         mock_chat = MockChat()
         chat_repo_instance.create_chat.return_value = mock_chat
-        msg_repo_instance.list_by_chat.return_value = []
+        msg_repo_instance.page_by_chat.return_value = ([], None)
         
         mock_repositories['chat'].return_value = chat_repo_instance
         mock_repositories['message'].return_value = msg_repo_instance
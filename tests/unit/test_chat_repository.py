@@ -65,26 +65,33 @@ class TestChatRepository:
         # Create mock query chain
         mock_query = Mock()
         mock_db.query.return_value = mock_query
+        mock_join = Mock()
         mock_filter = Mock()
+        mock_group = Mock()
         mock_order = Mock()
         mock_offset = Mock()
         mock_limit = Mock()
         
-        mock_query.filter.return_value = mock_filter
-        mock_filter.order_by.return_value = mock_order
+        mock_query.outerjoin.return_value = mock_join
+        mock_join.filter.return_value = mock_filter
+        mock_filter.group_by.return_value = mock_group
+        mock_group.order_by.return_value = mock_order
         mock_order.offset.return_value = mock_offset
         mock_offset.limit.return_value = mock_limit
-        mock_limit.all.return_value = mock_chats
+        mock_limit.all.return_value = [(mock_chats[0], 3), (mock_chats[1], 0)]
         
         # Call method
         result = repository.list_by_user(user_id)
         
         # Assertions
         assert result == mock_chats
+        assert result[0].message_count == 3
+        assert result[1].message_count == 0
         mock_db.query.assert_called_once()
         # Verify filter was called (checking the actual filter expression is complex with SQLAlchemy)
-        mock_query.filter.assert_called_once()
-        mock_filter.order_by.assert_called_once()
+        mock_join.filter.assert_called_once()
+        mock_filter.group_by.assert_called_once()
+        mock_group.order_by.assert_called_once()
         mock_order.offset.assert_called_once_with(0)
         mock_offset.limit.assert_called_once_with(100)
     
@@ -97,16 +104,20 @@ class TestChatRepository:
         # Create mock query chain
         mock_query = Mock()
         mock_db.query.return_value = mock_query
+        mock_join = Mock()
         mock_filter = Mock()
+        mock_group = Mock()
         mock_order = Mock()
         mock_offset = Mock()
         mock_limit = Mock()
         
-        mock_query.filter.return_value = mock_filter
-        mock_filter.order_by.return_value = mock_order
+        mock_query.outerjoin.return_value = mock_join
+        mock_join.filter.return_value = mock_filter
+        mock_filter.group_by.return_value = mock_group
+        mock_group.order_by.return_value = mock_order
         mock_order.offset.return_value = mock_offset
         mock_offset.limit.return_value = mock_limit
-        mock_limit.all.return_value = mock_chats
+        mock_limit.all.return_value = [(mock_chats[0], 1)]
         
         # Call method with custom pagination
         result = repository.list_by_user(user_id, skip=10, limit=5)
@@ -114,4 +125,44 @@ class TestChatRepository:
         # Assertions
         assert result == mock_chats
         mock_order.offset.assert_called_once_with(10)
-        mock_offset.limit.assert_called_once_with(5)
\ No newline at end of file
+        mock_offset.limit.assert_called_once_with(5)
+    
+    def test_format_chat_for_response(self, repository):
+        """Test chat formatting keeps the relationship's message order"""
+        created = datetime(2024, 1, 1, 12, 0, 0)
+        mock_chat = Mock(
+            id=uuid4(),
+            custom_id="custom-123",
+            title=None,
+            created_at=created,
+            updated_at=created,
+            messages=[
+                Mock(role="user", content="Hi", timestamp=datetime(2024, 1, 1, 12, 0, 1)),
+                Mock(role="assistant", content="Hello", timestamp=datetime(2024, 1, 1, 12, 0, 2))
+            ]
+        )
+        
+        result = repository.format_chat_for_response(mock_chat)
+        
+        assert result["title"] == ""
+        assert result["messages"] == [
+            {"role": "user", "content": "Hi", "timestamp": "2024-01-01T12:00:01"},
+            {"role": "assistant", "content": "Hello", "timestamp": "2024-01-01T12:00:02"}
+        ]
+    
+    def test_format_chats_list(self, repository):
+        """Test chats are keyed by custom ID, falling back to the chat ID"""
+        created = datetime(2024, 1, 1, 12, 0, 0)
+        chat_id = uuid4()
+        chats = [
+            Mock(id=uuid4(), custom_id="custom-123", title="Named", created_at=created, updated_at=created, message_count=4),
+            Mock(id=chat_id, custom_id=None, title=None, created_at=created, updated_at=created, message_count=0)
+        ]
+        
+        result = repository.format_chats_list(chats)
+        
+        assert list(result) == ["custom-123", str(chat_id)]
+        assert result["custom-123"]["title"] == "Named"
+        assert result["custom-123"]["message_count"] == 4
+        assert result[str(chat_id)]["title"] == "Conversation"
+        assert result[str(chat_id)]["created_at"] == "2024-01-01T12:00:00"
\ No newline at end of file
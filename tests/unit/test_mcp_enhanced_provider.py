@@ -0,0 +1,125 @@
+"""
+Unit tests for the MCP-enhanced provider's tool result cache.
+"""
+import pytest
+from unittest.mock import Mock, AsyncMock
+
+from utils.provider.base import ProviderConfig
+from utils.provider.mcp_enhanced_provider import MCPEnhancedProvider
+from utils.mcp.client import MCPClient
+from utils.mcp.models import Tool, ToolResult
+
+
+def make_tool(name, cacheable):
+    """Build an MCP tool definition."""
+    return Tool(name=name, input_schema={"type": "object"}, cacheable=cacheable)
+
+
+def tool_call(name, arguments):
+    """Build an OpenAI-format tool call."""
+    return {"id": f"call_{name}", "function": {"name": name, "arguments": arguments}}
+
+
+@pytest.fixture
+def mcp_host():
+    """Create a mock MCP host with one read-only and one side-effecting tool."""
+    host = Mock()
+    host.get_all_tools.return_value = {
+        "fs__read_file": make_tool("read_file", cacheable=True),
+        "fs__write_file": make_tool("write_file", cacheable=False),
+    }
+    host.call_tool = AsyncMock(
+        side_effect=lambda name, arguments: ToolResult(call_id=name, content={"ok": True})
+    )
+    return host
+
+
+@pytest.fixture
+def provider(mcp_host):
+    """Create an MCP-enhanced provider around a mock base provider."""
+    base_provider = Mock()
+    base_provider.config = ProviderConfig(name="test", display_name="Test", provider_type="test")
+    base_provider.display_name = "Test"
+    return MCPEnhancedProvider(base_provider, mcp_host)
+
+
+class TestToolResultCache:
+    """Test caching of read-only tool results within a completion."""
+
+    @pytest.mark.asyncio
+    async def test_read_only_tool_hits_cache(self, provider, mcp_host):
+        """Test a read-only tool called twice with the same arguments runs once."""
+        tool_cache = {}
+
+        first = await provider._execute_mcp_tools(
+            [tool_call("fs__read_file", '{"path": "a.txt"}')], tool_cache
+        )
+        second = await provider._execute_mcp_tools(
+            [tool_call("fs__read_file", '{"path": "a.txt"}')], tool_cache
+        )
+
+        assert second == first
+        mcp_host.call_tool.assert_awaited_once_with("fs__read_file", {"path": "a.txt"})
+        assert provider.get_cache_stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+    @pytest.mark.asyncio
+    async def test_read_only_tool_different_arguments(self, provider, mcp_host):
+        """Test different arguments to a read-only tool are separate cache entries."""
+        tool_cache = {}
+
+        await provider._execute_mcp_tools(
+            [tool_call("fs__read_file", '{"path": "a.txt"}'), tool_call("fs__read_file", '{"path": "b.txt"}')],
+            tool_cache
+        )
+
+        assert mcp_host.call_tool.await_count == 2
+        assert provider.get_cache_stats() == {"hits": 0, "misses": 2, "hit_rate": 0}
+
+    @pytest.mark.asyncio
+    async def test_non_read_only_tool_never_cached(self, provider, mcp_host):
+        """Test a tool without readOnlyHint runs every time and isn't counted."""
+        tool_cache = {}
+
+        for _ in range(2):
+            await provider._execute_mcp_tools(
+                [tool_call("fs__write_file", '{"path": "a.txt"}')], tool_cache
+            )
+
+        assert mcp_host.call_tool.await_count == 2
+        assert tool_cache == {}
+        assert provider.get_cache_stats() == {"hits": 0, "misses": 0, "hit_rate": 0}
+
+    @pytest.mark.asyncio
+    async def test_error_result_not_cached(self, provider, mcp_host):
+        """Test a failed read-only call is retried rather than replayed."""
+        mcp_host.call_tool.side_effect = None
+        mcp_host.call_tool.return_value = ToolResult(call_id="x", content={"error": "busy"}, is_error=True)
+        tool_cache = {}
+
+        for _ in range(2):
+            await provider._execute_mcp_tools(
+                [tool_call("fs__read_file", '{"path": "a.txt"}')], tool_cache
+            )
+
+        assert mcp_host.call_tool.await_count == 2
+        assert tool_cache == {}
+
+
+class TestReadOnlyHint:
+    """Test tools are marked cacheable from their readOnlyHint annotation."""
+
+    @pytest.mark.asyncio
+    async def test_discover_tools_uses_read_only_hint(self):
+        """Test only tools annotated readOnlyHint are cacheable."""
+        client = MCPClient("fs", Mock())
+        client._send_request = AsyncMock(return_value={"tools": [
+            {"name": "read_file", "inputSchema": {}, "annotations": {"readOnlyHint": True}},
+            {"name": "write_file", "inputSchema": {}, "annotations": {"readOnlyHint": False}},
+            {"name": "list_dir", "inputSchema": {}},
+        ]})
+
+        await client._discover_tools()
+
+        assert client.tools["read_file"].cacheable is True
+        assert client.tools["write_file"].cacheable is False
+        assert client.tools["list_dir"].cacheable is False
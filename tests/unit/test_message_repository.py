@@ -3,6 +3,7 @@ import uuid
 from datetime import datetime
 from unittest.mock import Mock, patch, MagicMock
 import pytest
+from sqlalchemy import column
 from sqlalchemy.orm import Session
 
 from utils.repository.message_repository import MessageRepository
@@ -11,6 +12,7 @@ from utils.repository.message_repository import MessageRepository
 class MockMessage:
     """Mock message model for testing."""
     # Class attributes for SQLAlchemy column references
+    id = None
     chat_id = None
     role = None
     timestamp = None
@@ -88,6 +90,45 @@ class TestMessageRepository:
         mock_query.offset.assert_called_once_with(2)
         mock_query.limit.assert_called_once_with(2)
     
+    def test_page_by_chat(self, message_repo, mock_db):
+        """Test keyset pagination returns a (timestamp, id) cursor for full pages."""
+        chat_id = uuid.uuid4()
+        messages = [
+            MockMessage(chat_id=chat_id, role="user", content=f"Message {i}", timestamp=datetime(2024, 1, 1))
+            for i in range(2)
+        ]
+        
+        mock_query = Mock()
+        mock_query.filter.return_value = mock_query
+        mock_query.order_by.return_value = mock_query
+        mock_query.limit.return_value = mock_query
+        mock_query.all.return_value = messages
+        mock_db.query.return_value = mock_query
+        
+        with patch.object(MockMessage, "timestamp", column("timestamp")), \
+                patch.object(MockMessage, "chat_id", column("chat_id")), \
+                patch.object(MockMessage, "id", column("id")):
+            page, cursor = message_repo.page_by_chat(chat_id, after=(datetime(2024, 1, 1), uuid.uuid4()), limit=2)
+            keyset = str(mock_query.filter.call_args.args[1])
+        
+        assert page == messages
+        assert cursor == (messages[-1].timestamp, messages[-1].id)
+        assert keyset == "(timestamp, id) > (:param_1, :param_2)"
+        mock_query.offset.assert_not_called()
+        mock_query.limit.assert_called_once_with(2)
+    
+    def test_page_by_chat_last_page(self, message_repo, mock_db):
+        """Test a short page ends pagination."""
+        chat_id = uuid.uuid4()
+        messages = [MockMessage(chat_id=chat_id, role="user", content="Message")]
+        
+        with patch.object(message_repo, "list_by_chat", return_value=messages) as mock_list:
+            page, cursor = message_repo.page_by_chat(chat_id, limit=2)
+        
+        assert page == messages
+        assert cursor is None
+        mock_list.assert_called_once_with(chat_id, limit=2, after=None)
+    
     def test_create_message(self, message_repo):
         """Test creating a message."""
         chat_id = uuid.uuid4()
@@ -113,7 +154,28 @@ class TestMessageRepository:
             assert call_args['role'] == role
             assert call_args['content'] == content
             assert call_args['tokens_used'] == tokens_used
-            assert 'timestamp' in call_args
+            # Timestamp is assigned by the database
+            assert 'timestamp' not in call_args
+    
+    def test_bulk_create(self, message_repo, mock_db):
+        """Test bulk creation issues one INSERT for all rows."""
+        chat_id = uuid.uuid4()
+        rows = [
+            {"chat_id": chat_id, "role": "user", "content": "Hello"},
+            {"chat_id": chat_id, "role": "assistant", "content": "Hi there!"}
+        ]
+        
+        with patch('utils.repository.message_repository.insert') as mock_insert:
+            result = message_repo.bulk_create(rows)
+        
+        assert result == 2
+        mock_db.execute.assert_called_once_with(mock_insert.return_value.values.return_value, rows)
+        mock_db.commit.assert_called_once()
+    
+    def test_bulk_create_empty(self, message_repo, mock_db):
+        """Test bulk creation with no rows is a no-op."""
+        assert message_repo.bulk_create([]) == 0
+        mock_db.execute.assert_not_called()
     
     def test_get_system_message_for_chat(self, message_repo, mock_db):
         """Test getting system message for a chat."""
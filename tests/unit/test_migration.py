@@ -2,13 +2,17 @@
 import pytest
 from unittest.mock import Mock, patch, mock_open, MagicMock, call
 import json
+import re
 import uuid
 from datetime import datetime
+from sqlalchemy import create_mock_engine
+from sqlalchemy.exc import ProgrammingError
 from sqlalchemy.orm import Session
 
+from utils.database import Base
 from utils.migration import (
     create_tables, get_anonymous_user, migrate_system_prompts,
-    migrate_chats, run_migration
+    migrate_chats, run_migration, run_sql_migrations
 )
 
 
@@ -309,7 +313,7 @@ class TestMigration:
             
             with patch('utils.migration.ChatRepository') as mock_chat_repo_class:
                 mock_chat_repo = Mock()
-                mock_chat_repo.get_by_custom_id.return_value = None
+                mock_chat_repo.exists_by_custom_id.return_value = False
                 mock_chat_repo.create_chat.return_value = mock_chat
                 mock_chat_repo_class.return_value = mock_chat_repo
                 
@@ -377,14 +381,13 @@ class TestMigration:
         }
         
         mock_user = MockUser(username="anonymous")
-        existing_chat = MockChat(custom_id="chat-123")
         
         with patch('utils.migration.get_anonymous_user') as mock_get_user:
             mock_get_user.return_value = mock_user
             
             with patch('utils.migration.ChatRepository') as mock_chat_repo_class:
                 mock_chat_repo = Mock()
-                mock_chat_repo.get_by_custom_id.return_value = existing_chat
+                mock_chat_repo.exists_by_custom_id.return_value = True
                 mock_chat_repo_class.return_value = mock_chat_repo
                 
                 with patch('utils.migration.MessageRepository'):
@@ -427,7 +430,7 @@ class TestMigration:
             
             with patch('utils.migration.ChatRepository') as mock_chat_repo_class:
                 mock_chat_repo = Mock()
-                mock_chat_repo.get_by_custom_id.return_value = None
+                mock_chat_repo.exists_by_custom_id.return_value = False
                 mock_chat_repo.create_chat.return_value = mock_chat
                 mock_chat_repo_class.return_value = mock_chat_repo
                 
@@ -504,4 +507,37 @@ class TestMigration:
                     exec(f.read())
         
         # Note: This test is tricky because of the if __name__ == "__main__" block
-        # In practice, we'd need to refactor the code to make it more testable
\ No newline at end of file
+        # In practice, we'd need to refactor the code to make it more testable
+
+
+class TestSqlMigrations:
+    """Test the SQL migrations against a schema built by create_all."""
+    
+    def test_migrations_after_create_all(self):
+        """Test no migration file fails on an index create_all already made."""
+        # create_all against a Postgres mock engine, recording the indexes it creates
+        created_indexes = set()
+        
+        def record_ddl(statement, *args, **kwargs):
+            if statement.__visit_name__ == "create_index":
+                created_indexes.add(statement.element.name)
+        
+        Base.metadata.create_all(create_mock_engine("postgresql://", record_ddl), checkfirst=False)
+        assert "idx_provider_configs_default" in created_indexes
+        
+        # Postgres rejects a plain CREATE INDEX whose name already exists
+        create_index = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE)
+        
+        def execute(statement, *args, **kwargs):
+            for if_not_exists, name in create_index.findall(str(statement)):
+                if name in created_indexes and not if_not_exists:
+                    raise ProgrammingError(str(statement), {}, Exception(f'relation "{name}" already exists'))
+        
+        mock_db = Mock(spec=Session)
+        mock_db.execute.side_effect = execute
+        
+        with patch('utils.migration.os.path.exists', side_effect=lambda path: not path.startswith("/app")):
+            run_sql_migrations(mock_db)
+        
+        mock_db.rollback.assert_not_called()
+        assert mock_db.commit.call_count == 6
\ No newline at end of file
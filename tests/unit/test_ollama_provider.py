@@ -4,19 +4,28 @@ Unit tests for Ollama provider
 import pytest
 from unittest.mock import Mock, AsyncMock, patch, MagicMock
 import asyncio
+import json
+import httpx
 import ollama
 from ollama import ResponseError
 
 from src.utils.provider.ollama import OllamaProvider
 from src.utils.provider.base import (
     ProviderConfig, Message, MessageRole, ChatResponse, StreamChunk,
-    ProviderError, ProviderTimeoutError, ProviderModelNotFoundError
+    ProviderError, ProviderTimeoutError, ProviderModelNotFoundError, HTTP_LIMITS
 )
 
 
 class TestOllamaProvider:
     """Test the Ollama provider implementation"""
     
+    @pytest.fixture(autouse=True)
+    def clear_client_pool(self):
+        """Keep pooled clients from leaking between tests."""
+        OllamaProvider._client_pool.clear()
+        yield
+        OllamaProvider._client_pool.clear()
+    
     @pytest.fixture
     def config(self):
         """Create test configuration."""
@@ -72,9 +81,22 @@ class TestOllamaProvider:
             assert provider.client == mock_client
             mock_client_class.assert_called_once_with(
                 host="http://localhost:11434",
-                timeout=30
+                timeout=30,
+                limits=HTTP_LIMITS
             )
     
+    @pytest.mark.asyncio
+    async def test_initialize_shares_client(self, config):
+        """Test providers for the same server share one pooled client"""
+        with patch('src.utils.provider.ollama.AsyncClient') as mock_client_class:
+            first = OllamaProvider(config)
+            second = OllamaProvider(config)
+            await first._initialize()
+            await second._initialize()
+            
+            assert first.client is second.client
+            mock_client_class.assert_called_once()
+    
     @pytest.mark.asyncio
     async def test_validate_config_success(self, provider):
         """Test successful config validation"""
@@ -127,6 +149,32 @@ class TestOllamaProvider:
             assert models[1].model_name == "mistral:latest"
             assert models[1].context_window == 128000  # default
     
+    @pytest.mark.asyncio
+    async def test_list_models_serializes_in_response(self, config):
+        """Test Ollama models serialize in a ModelListResponse with their own capabilities"""
+        # api_models imports ModelInfo via the utils package, so build the
+        # provider from the same modules the API uses
+        from utils.models.api_models import ModelListResponse
+        from utils.provider.ollama import OllamaProvider as ApiOllamaProvider
+        
+        mock_client = AsyncMock()
+        mock_client.list.return_value = {"models": [{"name": "llama3.1:8b"}, {"name": "mistral:latest"}]}
+        
+        ApiOllamaProvider._client_pool.clear()
+        try:
+            with patch('utils.provider.ollama.AsyncClient', return_value=mock_client):
+                models = await ApiOllamaProvider(config).list_models()
+        finally:
+            ApiOllamaProvider._client_pool.clear()
+        
+        response = ModelListResponse(success=True, provider="ollama", models=models)
+        payload = json.loads(response.model_dump_json())
+        
+        assert [m["capabilities"] for m in payload["models"]] == [
+            {"chat": True, "code": True, "reasoning": True}
+        ] * 2
+        assert models[0].capabilities is not models[1].capabilities
+    
     @pytest.mark.asyncio
     async def test_list_models_error_handling(self, provider):
         """Test list models error handling"""
@@ -139,6 +187,36 @@ class TestOllamaProvider:
                 await provider.list_models()
             assert "Unexpected error: API Error" in str(exc_info.value)
     
+    @pytest.mark.asyncio
+    async def test_list_models_cached(self, provider):
+        """Test list models is served from cache within the TTL"""
+        mock_client = AsyncMock()
+        mock_client.list.return_value = {"models": [{"name": "llama3.1:8b"}]}
+        
+        with patch('src.utils.provider.ollama.AsyncClient', return_value=mock_client):
+            first = await provider.list_models()
+            second = await provider.list_models()
+        
+        assert [m.model_name for m in second] == [m.model_name for m in first]
+        mock_client.list.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_list_models_stale_cache_served_on_refresh_failure(self, provider):
+        """Test a stale model list is returned while a failed refresh is logged"""
+        mock_client = AsyncMock()
+        mock_client.list.return_value = {"models": [{"name": "llama3.1:8b"}]}
+        
+        with patch('src.utils.provider.ollama.AsyncClient', return_value=mock_client):
+            await provider.list_models()
+            provider._models_ttl = 0
+            mock_client.list.side_effect = Exception("API Error")
+            
+            models = await provider.list_models()
+            await provider._models_refresh
+        
+        assert [m.model_name for m in models] == ["llama3.1:8b"]
+        assert mock_client.list.call_count == 2
+    
     @pytest.mark.asyncio
     async def test_chat_completion_success(self, provider):
         """Test successful chat completion"""
@@ -180,6 +258,29 @@ class TestOllamaProvider:
                 stream=False
             )
     
+    @pytest.mark.asyncio
+    async def test_chat_completion_response_cache(self, config):
+        """Test deterministic completions are served from the opt-in response cache"""
+        config.config["response_cache"] = True
+        provider = OllamaProvider(config)
+        mock_client = AsyncMock()
+        mock_client.chat.return_value = {
+            "message": {"content": "Cached answer", "role": "assistant"},
+            "prompt_eval_count": 10,
+            "eval_count": 8
+        }
+        messages = [Message(role=MessageRole.USER, content="Hello")]
+        
+        with patch('src.utils.provider.ollama.AsyncClient', return_value=mock_client):
+            first = await provider.chat_completion(messages=messages, model="llama3.1", temperature=0)
+            second = await provider.chat_completion(messages=messages, model="llama3.1", temperature=0)
+            # Non-deterministic requests always go to the model
+            await provider.chat_completion(messages=messages, model="llama3.1", temperature=0.7)
+        
+        assert second.content == first.content == "Cached answer"
+        assert second.id != first.id
+        assert mock_client.chat.call_count == 2
+    
     @pytest.mark.asyncio
     async def test_chat_completion_with_options(self, provider):
         """Test chat completion with additional options"""
@@ -219,14 +320,27 @@ class TestOllamaProvider:
         mock_client.chat.side_effect = asyncio.TimeoutError()
         
         with patch('src.utils.provider.ollama.AsyncClient', return_value=mock_client):
-            with patch('asyncio.wait_for', side_effect=asyncio.TimeoutError()):
-                messages = [Message(role=MessageRole.USER, content="Test")]
-                
-                with pytest.raises(ProviderTimeoutError) as exc_info:
-                    await provider.chat_completion(messages, model="test-model")
-                
-                assert "Request timed out after 30 seconds" in str(exc_info.value)
-                assert exc_info.value.provider == "ollama"
+            messages = [Message(role=MessageRole.USER, content="Test")]
+            
+            with pytest.raises(ProviderTimeoutError) as exc_info:
+                await provider.chat_completion(messages, model="test-model")
+            
+            assert "Request timed out after 30 seconds" in str(exc_info.value)
+            assert exc_info.value.provider == "ollama"
+    
+    @pytest.mark.asyncio
+    async def test_chat_completion_http_timeout(self, provider):
+        """Test HTTP client timeouts are mapped to ProviderTimeoutError"""
+        mock_client = AsyncMock()
+        mock_client.chat.side_effect = httpx.ReadTimeout("timed out")
+        
+        with patch('src.utils.provider.ollama.AsyncClient', return_value=mock_client):
+            messages = [Message(role=MessageRole.USER, content="Test")]
+            
+            with pytest.raises(ProviderTimeoutError) as exc_info:
+                await provider.chat_completion(messages, model="test-model")
+            
+            assert "Request timed out after 30 seconds" in str(exc_info.value)
     
     @pytest.mark.asyncio
     async def test_chat_completion_model_not_found(self, provider):
@@ -270,6 +384,7 @@ class TestOllamaProvider:
         async def mock_stream():
             chunks = [
                 {"message": {"content": "Hello "}, "done": False},
+                {"message": {"content": ""}, "done": False},
                 {"message": {"content": "there!"}, "done": False},
                 {
                     "message": {"content": ""},
@@ -311,6 +426,55 @@ class TestOllamaProvider:
             # Note: Can't use assert_called_once_with when using a regular function
             # The test verifies behavior through the chunks received
     
+    @pytest.mark.asyncio
+    async def test_chat_completion_stream_typed_chunks(self, provider):
+        """Test streaming with the SDK's typed response objects"""
+        mock_client = Mock()
+        
+        async def mock_stream():
+            yield ollama.ChatResponse(model="test-model", message={"role": "assistant", "content": "Hi"}, done=False)
+            yield ollama.ChatResponse(
+                model="test-model",
+                message={"role": "assistant", "content": ""},
+                done=True,
+                prompt_eval_count=4,
+                eval_count=1
+            )
+        
+        async def async_chat(*args, **kwargs):
+            return mock_stream()
+        
+        mock_client.chat = async_chat
+        
+        with patch('src.utils.provider.ollama.AsyncClient', return_value=mock_client):
+            messages = [Message(role=MessageRole.USER, content="Hi")]
+            chunks = [chunk async for chunk in provider.chat_completion_stream(messages, "test-model")]
+        
+        assert [c.content for c in chunks] == ["Hi", ""]
+        assert chunks[1].is_final is True
+        assert chunks[1].usage["total_tokens"] == 5
+    
+    @pytest.mark.asyncio
+    async def test_chat_completion_stream_http_timeout(self, provider):
+        """Test a client-side HTTP timeout mid-stream maps to ProviderTimeoutError"""
+        mock_client = Mock()
+        
+        async def mock_stream():
+            yield {"message": {"content": "Start"}, "done": False}
+            raise httpx.ReadTimeout("Read timed out")
+        
+        async def async_chat(*args, **kwargs):
+            return mock_stream()
+        
+        mock_client.chat = async_chat
+        
+        with patch('src.utils.provider.ollama.AsyncClient', return_value=mock_client):
+            messages = [Message(role=MessageRole.USER, content="Test")]
+            
+            with pytest.raises(ProviderTimeoutError):
+                async for _ in provider.chat_completion_stream(messages, "test-model"):
+                    pass
+    
     @pytest.mark.asyncio
     async def test_chat_completion_stream_error(self, provider):
         """Test streaming error handling"""
@@ -423,4 +587,81 @@ class TestOllamaProvider:
             assert converted_messages[0] == {"role": "system", "content": "You are helpful"}
             assert converted_messages[1] == {"role": "user", "content": "Hello"}
             assert converted_messages[2] == {"role": "assistant", "content": "Hi there"}
-            assert converted_messages[3] == {"role": "user", "content": "How are you?"}
\ No newline at end of file
+            assert converted_messages[3] == {"role": "user", "content": "How are you?"}
+    
+    def test_prepare_messages_structured_content(self, provider):
+        """Test structured tool/assistant payloads are unpacked and plain text is untouched"""
+        tool_calls = [{"function": {"name": "fs__ls", "arguments": {"path": "."}}}]
+        messages = [
+            Message(role=MessageRole.USER, content="{not json"),
+            Message(role="assistant", content='{"role": "assistant", "content": null, "tool_calls": ' + json.dumps(tool_calls) + '}'),
+            Message(role="tool", content='{"role": "tool", "content": "a.txt", "name": "fs__ls"}'),
+            Message(role=MessageRole.ASSISTANT, content='{"answer": 42}'),
+        ]
+        
+        prepared = provider._prepare_messages(messages)
+        
+        assert prepared[0] == {"role": "user", "content": "{not json"}
+        assert prepared[1] == {"role": "assistant", "content": "", "tool_calls": tool_calls}
+        assert prepared[2] == {"role": "tool", "content": "a.txt", "name": "fs__ls"}
+        assert prepared[3] == {"role": "assistant", "content": '{"answer": 42}'}
+    
+    def test_prepare_messages_structured_trailing_whitespace(self, provider):
+        """Test structured payloads with surrounding whitespace are still unpacked"""
+        messages = [
+            Message(role="tool", content='{"role": "tool", "content": "a.txt", "name": "fs__ls"}\n'),
+            Message(role="tool", content='  {"role": "tool", "content": "b.txt", "name": "fs__ls"} '),
+        ]
+        
+        prepared = provider._prepare_messages(messages)
+        
+        assert prepared[0] == {"role": "tool", "content": "a.txt", "name": "fs__ls"}
+        assert prepared[1] == {"role": "tool", "content": "b.txt", "name": "fs__ls"}
+    
+    @pytest.mark.asyncio
+    async def test_chat_completion_tool_calls(self, provider):
+        """Test Ollama tool calls are converted to the standard format"""
+        mock_client = AsyncMock()
+        mock_client.chat.return_value = {
+            "message": {
+                "content": "",
+                "role": "assistant",
+                "tool_calls": [
+                    {"function": {"name": "fs__ls", "arguments": {"path": "."}}},
+                    {"function": {"name": "fs__read", "arguments": {"path": "a.txt"}}}
+                ]
+            },
+            "done": True
+        }
+        
+        with patch('src.utils.provider.ollama.AsyncClient', return_value=mock_client):
+            messages = [Message(role=MessageRole.USER, content="List files")]
+            
+            response = await provider.chat_completion(messages, model="test-model")
+            
+            assert len(response.tool_calls) == 2
+            assert response.tool_calls[0]["type"] == "function"
+            assert response.tool_calls[0]["function"]["name"] == "fs__ls"
+            assert json.loads(response.tool_calls[0]["function"]["arguments"]) == {"path": "."}
+            assert json.loads(response.tool_calls[1]["function"]["arguments"]) == {"path": "a.txt"}
+            assert response.tool_calls[0]["id"] != response.tool_calls[1]["id"]
+    
+    @pytest.mark.asyncio
+    async def test_chat_completion_typed_tool_calls(self, provider):
+        """Test SDK tool call objects are converted like dict tool calls"""
+        mock_client = AsyncMock()
+        tool_call = ollama.Message.ToolCall(
+            function=ollama.Message.ToolCall.Function(name="fs__ls", arguments={"path": "."})
+        )
+        mock_client.chat.return_value = {
+            "message": {"content": "", "role": "assistant", "tool_calls": [tool_call]},
+            "done": True
+        }
+        
+        with patch('src.utils.provider.ollama.AsyncClient', return_value=mock_client):
+            messages = [Message(role=MessageRole.USER, content="List files")]
+            
+            response = await provider.chat_completion(messages, model="test-model")
+            
+            assert response.tool_calls[0]["function"]["name"] == "fs__ls"
+            assert json.loads(response.tool_calls[0]["function"]["arguments"]) == {"path": "."}
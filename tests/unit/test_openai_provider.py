@@ -2,10 +2,11 @@
 Unit tests for OpenAI provider.
 """
 import pytest
-from unittest.mock import Mock, AsyncMock, patch
+from unittest.mock import ANY, Mock, AsyncMock, patch
 import os
 
 from utils.provider.openai import OpenAIProvider
+from utils.repository.provider_repository import ProviderModelRepository
 from utils.provider.base import (
     ProviderConfig, Message, MessageRole, 
     ProviderAuthenticationError, ProviderError,
@@ -30,6 +31,20 @@ def provider_config():
     )
 
 
+@pytest.fixture(autouse=True)
+def reset_shared_state():
+    """Keep pooled clients and cached model lists from leaking between tests."""
+    OpenAIProvider._client_pool.clear()
+    OpenAIProvider._client_refs.clear()
+    OpenAIProvider._INSTANCES.clear()
+    OpenAIProvider.invalidate_models_cache()
+    yield
+    OpenAIProvider._client_pool.clear()
+    OpenAIProvider._client_refs.clear()
+    OpenAIProvider._INSTANCES.clear()
+    OpenAIProvider.invalidate_models_cache()
+
+
 @pytest.fixture
 def mock_env():
     """Mock environment variables."""
@@ -73,9 +88,129 @@ class TestOpenAIProvider:
         mock_client_class.assert_called_once_with(
             api_key="test-api-key",
             timeout=30,
-            max_retries=2
+            max_retries=2,
+            http_client=ANY
         )
     
+    @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
+    @patch("utils.provider.openai.DefaultAioHttpClient")
+    @patch("utils.provider.openai.AsyncOpenAI")
+    async def test_initialize_aiohttp_transport(self, mock_client_class, mock_aiohttp_client, provider_config, mock_env):
+        """Test the aiohttp transport is used when configured."""
+        provider_config.config["http_transport"] = "aiohttp"
+        provider = OpenAIProvider(provider_config)
+        await provider.initialize()
+        
+        mock_aiohttp_client.assert_called_once()
+        assert mock_client_class.call_args.kwargs["http_client"] is mock_aiohttp_client.return_value
+    
+    @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
+    @patch("utils.provider.openai.H2_AVAILABLE", True)
+    @patch("utils.provider.openai.DefaultAsyncHttpxClient")
+    @patch("utils.provider.openai.AsyncOpenAI")
+    async def test_initialize_http2(self, mock_client_class, mock_http_client, provider_config, mock_env):
+        """Test http2 is passed to httpx when h2 is installed."""
+        provider_config.config["http2"] = True
+        provider = OpenAIProvider(provider_config)
+        await provider.initialize()
+        
+        assert mock_http_client.call_args.kwargs["http2"] is True
+    
+    @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
+    @patch("utils.provider.openai.H2_AVAILABLE", False)
+    @patch("utils.provider.openai.DefaultAsyncHttpxClient")
+    @patch("utils.provider.openai.AsyncOpenAI")
+    async def test_initialize_http2_without_h2(self, mock_client_class, mock_http_client, provider_config, mock_env):
+        """Test http2 falls back to HTTP/1.1 when h2 is missing."""
+        provider_config.config["http2"] = True
+        provider = OpenAIProvider(provider_config)
+        await provider.initialize()
+        
+        assert mock_http_client.call_args.kwargs["http2"] is False
+    
+    @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
+    @patch("utils.provider.openai.DefaultAsyncHttpxClient")
+    @patch("utils.provider.openai.AsyncOpenAI")
+    async def test_aclose(self, mock_client_class, mock_http_client, provider_config, mock_env):
+        """Test aclose closes the client and drops it from the pool."""
+        provider_config.config["max_connections"] = 50
+        mock_client = AsyncMock()
+        mock_client_class.return_value = mock_client
+        provider = OpenAIProvider(provider_config)
+        await provider.initialize()
+        
+        assert mock_http_client.call_args.kwargs["limits"].max_connections == 50
+        
+        await provider.aclose()
+        
+        mock_client.close.assert_awaited_once()
+        assert provider.client is None
+        assert OpenAIProvider._client_pool == {}
+    
+    @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
+    @patch("utils.provider.openai.AsyncOpenAI")
+    async def test_aclose_keeps_client_used_by_other_provider(self, mock_client_class, provider_config, mock_env):
+        """Test aclose only closes a pooled client once its last user releases it."""
+        mock_client = AsyncMock()
+        mock_client_class.return_value = mock_client
+        first = OpenAIProvider(provider_config)
+        provider_config.name = "openai-secondary"
+        second = OpenAIProvider(provider_config)
+        await first.initialize()
+        await second.initialize()
+        
+        await first.aclose()
+        
+        mock_client.close.assert_not_awaited()
+        assert second.client is mock_client
+        
+        await second.aclose()
+        
+        mock_client.close.assert_awaited_once()
+        assert OpenAIProvider._client_pool == {}
+    
+    @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
+    @patch("utils.provider.openai.AsyncOpenAI")
+    async def test_shared_instance_context_manager(self, mock_client_class, provider_config, mock_env):
+        """Test shared() reuses instances and leaving the context keeps the client open."""
+        mock_client = AsyncMock()
+        mock_client_class.return_value = mock_client
+        
+        provider = OpenAIProvider.shared(provider_config)
+        assert OpenAIProvider.shared(provider_config) is provider
+        
+        async with provider as entered:
+            assert entered is provider
+            assert provider.client is mock_client
+        
+        mock_client.close.assert_not_awaited()
+        assert provider.client is mock_client
+    
+    @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
+    @patch("utils.provider.openai.AsyncOpenAI")
+    async def test_context_manager_closes_own_instance(self, mock_client_class, provider_config, mock_env):
+        """Test the context manager closes a provider created directly."""
+        mock_client = AsyncMock()
+        mock_client_class.return_value = mock_client
+        
+        async with OpenAIProvider(provider_config) as provider:
+            assert provider.client is mock_client
+        
+        mock_client.close.assert_awaited_once()
+        assert provider.client is None
+    
+    @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
+    @patch("utils.provider.openai.AsyncOpenAI")
+    async def test_initialize_shares_client(self, mock_client_class, provider_config, mock_env):
+        """Test providers with the same settings share one pooled client."""
+        first = OpenAIProvider(provider_config)
+        second = OpenAIProvider(provider_config)
+        await first.initialize()
+        await second.initialize()
+        
+        assert first.client is second.client
+        mock_client_class.assert_called_once()
+    
     @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
     async def test_list_models(self, provider_config, mock_env):
         """Test listing models from database."""
@@ -106,7 +241,16 @@ class TestOpenAIProvider:
             with patch("utils.repository.provider_repository.ProviderRepository", return_value=mock_repo):
                 provider = OpenAIProvider(provider_config)
                 models = await provider.list_models()
+                # Served from the cache without another database round-trip
+                cached_models = await provider.list_models()
+                mock_repo.get_by_name.assert_called_once_with("openai")
+                
+                # A model write elsewhere bumps the catalog version and forces a reload
+                ProviderModelRepository._bump_catalog_version()
+                await provider.list_models()
+                assert mock_repo.get_by_name.call_count == 2
         
+        assert [m.model_name for m in cached_models] == ["gpt-4o"]
         assert len(models) == 1
         assert models[0].model_name == "gpt-4o"
         assert models[0].display_name == "GPT-4o"
@@ -130,6 +274,38 @@ class TestOpenAIProvider:
         assert prepared[1] == {"role": "user", "content": "Hello"}
         assert prepared[2] == {"role": "assistant", "content": "Hi there!"}
     
+    @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
+    def test_build_request_params(self, provider_config, mock_env):
+        """Test configured default params are merged and overridden by call kwargs."""
+        provider_config.config["default_params"] = {"user": "org-default", "top_p": 0.9, "bogus": 1}
+        provider = OpenAIProvider(provider_config)
+        messages = [Message(role=MessageRole.USER, content="Hello")]
+        
+        params = provider._build_request_params(messages, "gpt-4o", 0.2, None, {"top_p": 0.5, "seed": 7})
+        
+        assert params == {
+            "model": "gpt-4o",
+            "messages": [{"role": "user", "content": "Hello"}],
+            "temperature": 0.2,
+            "user": "org-default",
+            "top_p": 0.5
+        }
+    
+    @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
+    def test_prepare_messages_structured(self, provider_config, mock_env):
+        """Test tool envelopes are unpacked into fresh dicts, parsed or pre-parsed."""
+        provider = OpenAIProvider(provider_config)
+        envelope = '{"content": "42", "tool_call_id": "call_1", "name": "calc"}'
+        stored = Message.from_stored(MessageRole.TOOL, envelope)
+        
+        first = provider._convert_messages_for_openai([Message(role=MessageRole.TOOL, content=envelope + "\n"), stored])
+        second = provider._convert_messages_for_openai([stored])
+        
+        expected = {"role": "tool", "content": "42", "tool_call_id": "call_1", "name": "calc"}
+        assert first == [expected, expected]
+        assert second == [expected]
+        assert second[0] is not first[1]
+    
     @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
     @patch("utils.provider.openai.AsyncOpenAI")
     async def test_chat_completion_success(self, mock_client_class, provider_config, mock_env):
@@ -168,6 +344,76 @@ class TestOpenAIProvider:
         assert response.role == "assistant"
         assert response.finish_reason == "stop"
     
+    @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
+    @patch("utils.provider.openai.AsyncOpenAI")
+    async def test_chat_completion_response_cache(self, mock_client_class, provider_config, mock_env):
+        """Test deterministic completions are served from the opt-in response cache."""
+        mock_client = AsyncMock()
+        mock_client_class.return_value = mock_client
+        
+        mock_message = Mock()
+        mock_message.content = "Cached answer"
+        mock_message.role = "assistant"
+        mock_message.tool_calls = None
+        
+        mock_choice = Mock()
+        mock_choice.message = mock_message
+        mock_choice.finish_reason = "stop"
+        
+        mock_response = Mock()
+        mock_response.id = "chatcmpl-123"
+        mock_response.model = "gpt-4o"
+        mock_response.choices = [mock_choice]
+        
+        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+        
+        provider_config.config["response_cache"] = True
+        provider = OpenAIProvider(provider_config)
+        messages = [Message(role=MessageRole.USER, content="Hello")]
+        
+        first = await provider.chat_completion(messages=messages, model="gpt-4o", temperature=0)
+        second = await provider.chat_completion(messages=messages, model="gpt-4o", temperature=0)
+        
+        assert second.content == first.content == "Cached answer"
+        assert second.id != first.id
+        mock_client.chat.completions.create.assert_called_once()
+    
+    @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
+    @patch("utils.provider.openai.AsyncOpenAI")
+    async def test_chat_completion_batch(self, mock_client_class, provider_config, mock_env):
+        """Test batch=True routes the request through the Batch API."""
+        mock_client = AsyncMock()
+        mock_client_class.return_value = mock_client
+        
+        mock_client.files.create = AsyncMock(return_value=Mock(id="file-in"))
+        mock_client.batches.create = AsyncMock(
+            return_value=Mock(id="batch-1", status="in_progress", output_file_id=None)
+        )
+        mock_client.batches.retrieve = AsyncMock(
+            return_value=Mock(id="batch-1", status="completed", output_file_id="file-out")
+        )
+        mock_client.files.content = AsyncMock(return_value=Mock(text=(
+            '{"custom_id": "0", "response": {"status_code": 200, "body": {"id": "chatcmpl-b1", '
+            '"model": "gpt-4o", "choices": [{"message": {"role": "assistant", "content": "Batched"}, '
+            '"finish_reason": "stop"}]}}, "error": null}\n'
+        )))
+        
+        provider = OpenAIProvider(provider_config)
+        messages = [Message(role=MessageRole.USER, content="Hello")]
+        
+        with patch("utils.provider.openai.asyncio.sleep", new=AsyncMock()):
+            response = await provider.chat_completion(messages=messages, model="gpt-4o", batch=True)
+        
+        assert response.id == "chatcmpl-b1"
+        assert response.content == "Batched"
+        assert mock_client.files.create.call_args.kwargs["purpose"] == "batch"
+        mock_client.batches.create.assert_called_once_with(
+            input_file_id="file-in",
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        mock_client.chat.completions.create.assert_not_called()
+    
     @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
     @patch("utils.provider.openai.AsyncOpenAI")
     async def test_chat_completion_model_not_found(self, mock_client_class, provider_config, mock_env):
@@ -200,6 +446,13 @@ class TestOpenAIProvider:
         
         # Create mock stream chunks
         async def mock_stream():
+            # Role-only opening chunk with empty content is skipped
+            chunk0 = Mock()
+            chunk0.choices = [Mock()]
+            chunk0.choices[0].delta.content = ""
+            chunk0.choices[0].finish_reason = None
+            yield chunk0
+            
             # First chunk with content
             chunk1 = Mock()
             chunk1.choices = [Mock()]
@@ -241,4 +494,34 @@ class TestOpenAIProvider:
         assert chunks[1].is_final is False
         assert chunks[2].content == ""
         assert chunks[2].is_final is True
-        assert chunks[2].finish_reason == "stop"
\ No newline at end of file
+        assert chunks[2].finish_reason == "stop"
+    
+    @patch("utils.provider.openai.OPENAI_AVAILABLE", True)
+    @patch("utils.provider.openai.AsyncOpenAI")
+    async def test_streaming_completion_coalesced(self, mock_client_class, provider_config, mock_env):
+        """Test coalesced streaming batches deltas and folds the tail into the final chunk."""
+        mock_client = AsyncMock()
+        mock_client_class.return_value = mock_client
+        
+        async def mock_stream():
+            for content, finish_reason in (("Hel", None), ("lo", None), (" world", None), ("!", "stop")):
+                chunk = Mock()
+                chunk.choices = [Mock()]
+                chunk.choices[0].delta.content = content
+                chunk.choices[0].finish_reason = finish_reason
+                yield chunk
+        
+        mock_client.chat.completions.create = AsyncMock(return_value=mock_stream())
+        
+        provider_config.config.update({"stream_flush_chars": 8, "stream_flush_interval": 60})
+        provider = OpenAIProvider(provider_config)
+        messages = [Message(role=MessageRole.USER, content="Hello")]
+        
+        chunks = [
+            chunk async for chunk in provider.chat_completion_stream(
+                messages=messages, model="gpt-4o", coalesce=True
+            )
+        ]
+        
+        assert [(c.content, c.is_final) for c in chunks] == [("Hello world", False), ("!", True)]
+        assert chunks[-1].finish_reason == "stop"
\ No newline at end of file
@@ -3,14 +3,17 @@ Unit tests for base provider infrastructure.
 """
 import pytest
 from typing import List, AsyncGenerator
-from datetime import datetime
+from datetime import datetime, timezone
 import asyncio
+from unittest.mock import patch
 
 from src.utils.provider.base import (
     BaseProvider, ProviderConfig, Message, ChatResponse, StreamChunk,
     ModelInfo, MessageRole, ProviderError, ProviderTimeoutError,
-    ProviderAuthenticationError, ProviderRateLimitError, ProviderModelNotFoundError
+    ProviderAuthenticationError, ProviderRateLimitError, ProviderModelNotFoundError,
+    coalesce_stream_chunks, tools_digest
 )
+from src.utils import json_utils
 
 
 class MockProvider(BaseProvider):
@@ -151,6 +154,31 @@ class TestMessage:
         assert msg.role == MessageRole.SYSTEM
         assert msg.content == "You are helpful"
     
+    def test_message_from_stored(self):
+        """Test structured content is parsed once when building from storage."""
+        structured = Message.from_stored("tool", '{"role": "tool", "content": "ok", "name": "fs__ls"}')
+        plain = Message.from_stored(MessageRole.USER, "{hello}")
+        
+        assert structured.structured == {"role": "tool", "content": "ok", "name": "fs__ls"}
+        assert plain.structured is None
+        assert plain == Message(role=MessageRole.USER, content="{hello}")
+    
+    def test_message_from_stored_surrounding_whitespace(self):
+        """Test structured content with surrounding whitespace is still parsed."""
+        msg = Message.from_stored("tool", '{"content": "ok", "name": "fs__ls"}\n')
+        
+        assert msg.structured == {"content": "ok", "name": "fs__ls"}
+    
+    def test_message_string_role_normalized(self):
+        """Test string roles are normalized to MessageRole at construction."""
+        msg = Message(role="tool", content="result")
+        assert msg.role is MessageRole.TOOL
+        assert msg.role_str == "tool"
+        assert msg.to_dict() == {"role": "tool", "content": "result"}
+        
+        with pytest.raises(ValueError):
+            Message(role="narrator", content="Once upon a time")
+    
     def test_message_roles(self):
         """Test all message roles."""
         for role in [MessageRole.SYSTEM, MessageRole.USER, MessageRole.ASSISTANT]:
@@ -221,6 +249,15 @@ class TestChatResponse:
         assert response.usage["total_tokens"] == 15
         assert isinstance(response.created_at, datetime)
     
+    def test_chat_response_created_at_compat(self):
+        """Test a created_at datetime is still accepted and round-trips."""
+        created = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+        response = ChatResponse(id="test-123", model="test-model", content="Hi", created_at=created)
+        
+        assert response.created_at == created
+        assert response.model_dump()["created_at"] == created
+        assert "created_at_ts" not in response.model_dump()
+    
     def test_chat_response_minimal(self):
         """Test creating chat response with minimal fields."""
         response = ChatResponse(
@@ -264,6 +301,55 @@ class TestStreamChunk:
         assert chunk.usage["total_tokens"] == 7
 
 
+class TestCoalesceStreamChunks:
+    """Test stream chunk coalescing."""
+    
+    @pytest.mark.asyncio
+    async def test_coalesce_grows_batches(self):
+        """Test batches grow after the first chunk and content is preserved."""
+        async def stream():
+            for token in ["a", "b", "c", "d", "e", "f", "g"]:
+                yield StreamChunk(content=token)
+            yield StreamChunk(content="", is_final=True, finish_reason="stop", usage={"total_tokens": 7})
+        
+        chunks = [
+            chunk async for chunk in coalesce_stream_chunks(stream(), max_batch_size=4, max_delay=60)
+        ]
+        
+        assert [c.content for c in chunks] == ["a", "bc", "defg", ""]
+        assert chunks[-1].is_final is True
+        assert chunks[-1].usage == {"total_tokens": 7}
+    
+    @pytest.mark.asyncio
+    async def test_coalesce_merges_pending_into_final(self):
+        """Test content still pending at the end is sent with the final chunk."""
+        async def stream():
+            yield StreamChunk(content="a")
+            yield StreamChunk(content="b")
+            yield StreamChunk(content="c", is_final=True, finish_reason="stop")
+        
+        chunks = [
+            chunk async for chunk in coalesce_stream_chunks(stream(), min_batch_size=4, max_delay=60)
+        ]
+        
+        assert [c.content for c in chunks] == ["abc"]
+        assert chunks[0].finish_reason == "stop"
+    
+    @pytest.mark.asyncio
+    async def test_coalesce_flushes_by_chars(self):
+        """Test max_chars flushes on accumulated text instead of chunk count."""
+        async def stream():
+            for token in ["Hel", "lo", " world", "!"]:
+                yield StreamChunk(content=token)
+            yield StreamChunk(content="", is_final=True, finish_reason="stop")
+        
+        chunks = [
+            chunk async for chunk in coalesce_stream_chunks(stream(), max_delay=60, max_chars=8)
+        ]
+        
+        assert [(c.content, c.is_final) for c in chunks] == [("Hello world", False), ("!", True)]
+
+
 class TestProviderErrors:
     """Test provider error classes."""
     
@@ -347,6 +433,22 @@ class TestBaseProvider:
         await provider.initialize()
         assert provider.initialized is False  # Not called again
     
+    @pytest.mark.asyncio
+    async def test_provider_initialize_concurrent(self, provider):
+        """Test concurrent first calls run _initialize only once."""
+        calls = 0
+        
+        async def slow_initialize():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0)
+        
+        provider._initialize = slow_initialize
+        await asyncio.gather(*(provider.initialize() for _ in range(5)))
+        
+        assert calls == 1
+        assert provider._initialized is True
+    
     @pytest.mark.asyncio
     async def test_provider_validate_config(self, provider):
         """Test config validation."""
@@ -389,6 +491,60 @@ class TestBaseProvider:
         assert prepared[0] == {"role": "system", "content": "System prompt"}
         assert prepared[1] == {"role": "user", "content": "User message"}
     
+    def test_prepare_with_prefix_cache(self, config):
+        """Test only the new tail of a conversation is prepared on later turns."""
+        config.config["prefix_cache"] = True
+        provider = MockProvider(config)
+        prepared_counts = []
+        
+        def prepare(messages):
+            prepared_counts.append(len(messages))
+            return [msg.to_dict() for msg in messages]
+        
+        history = [
+            Message(role=MessageRole.SYSTEM, content="System prompt"),
+            Message(role=MessageRole.USER, content="Hi")
+        ]
+        first = provider._prepare_with_prefix_cache(history, prepare)
+        
+        next_turn = history + [
+            Message(role=MessageRole.ASSISTANT, content="Hello!"),
+            Message(role=MessageRole.USER, content="How are you?")
+        ]
+        second = provider._prepare_with_prefix_cache(next_turn, prepare)
+        
+        assert prepared_counts == [2, 2]
+        assert second[:2] == first
+        assert second == [msg.to_dict() for msg in next_turn]
+    
+    def test_prepare_with_prefix_cache_disabled_by_default(self, provider):
+        """Test the prefix cache is off unless enabled in the provider config."""
+        prepared_counts = []
+        
+        def prepare(messages):
+            prepared_counts.append(len(messages))
+            return [msg.to_dict() for msg in messages]
+        
+        history = [Message(role=MessageRole.USER, content="Hi")]
+        provider._prepare_with_prefix_cache(history, prepare)
+        provider._prepare_with_prefix_cache(history, prepare)
+        
+        assert prepared_counts == [1, 1]
+        assert not provider._prefix_cache
+    
+    def test_tools_digest_memoized(self):
+        """Test tool schemas are serialized once per list and digested by content."""
+        tools = [{"type": "function", "function": {"name": "search", "parameters": {}}}]
+        
+        with patch("src.utils.provider.base.json_utils.dumps", wraps=json_utils.dumps) as dumps:
+            first = tools_digest(tools)
+            second = tools_digest(tools)
+        
+        assert first == second
+        assert dumps.call_count == 1
+        assert tools_digest([dict(tools[0])]) == first
+        assert tools_digest([{"type": "function", "function": {"name": "other"}}]) != first
+    
     @pytest.mark.asyncio
     async def test_chat_completion(self, provider):
         """Test chat completion."""
@@ -0,0 +1,218 @@
+"""Unit tests for provider repositories."""
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import Mock, patch
+import pytest
+from sqlalchemy.orm import Session
+
+from utils.repository import provider_repository
+from utils.repository.provider_repository import (
+    ProviderRepository, ProviderModelRepository, ProviderUsageRepository, UsageFlusher,
+    USAGE_SUMMARY_WINDOW
+)
+from utils.models.db_models import ProviderUsage
+
+
+@pytest.fixture
+def mock_db():
+    """Create a mock database session."""
+    return Mock(spec=Session)
+
+
+@pytest.fixture
+def usage_repo(mock_db):
+    """Create a provider usage repository with mock database."""
+    return ProviderUsageRepository(mock_db)
+
+
+def usage_kwargs(**overrides):
+    """Build track_usage arguments."""
+    kwargs = {
+        "user_id": uuid.uuid4(),
+        "provider_id": uuid.uuid4(),
+        "model_id": uuid.uuid4(),
+        "chat_id": uuid.uuid4(),
+        "message_id": uuid.uuid4(),
+        "tokens_input": 10,
+        "tokens_output": 5,
+    }
+    kwargs.update(overrides)
+    return kwargs
+
+
+class TestProviderRepository:
+    """Test cases for ProviderRepository."""
+
+    def test_set_default_provider(self, mock_db):
+        """Test setting a new default swaps the flag and commits."""
+        provider = Mock()
+        mock_db.scalars.return_value.first.return_value = provider
+        repo = ProviderRepository(mock_db)
+
+        assert repo.set_default_provider(uuid.uuid4()) is provider
+
+        mock_db.execute.assert_called_once()
+        mock_db.commit.assert_called_once()
+
+    def test_set_default_provider_not_found(self, mock_db):
+        """Test an unknown provider leaves the current default in place."""
+        mock_db.scalars.return_value.first.return_value = None
+        repo = ProviderRepository(mock_db)
+
+        with pytest.raises(ValueError):
+            repo.set_default_provider(uuid.uuid4())
+
+        mock_db.rollback.assert_called_once()
+        mock_db.commit.assert_not_called()
+
+
+    def test_get_by_name_ignores_case(self, mock_db):
+        """Test provider names match case-insensitively via lower(name)."""
+        repo = ProviderRepository(mock_db)
+
+        repo.get_by_name("OpenAI")
+
+        condition = mock_db.query.return_value.filter.call_args.args[0]
+        assert condition.left.name == "lower"
+        assert condition.right.value == "openai"
+
+
+class TestProviderModelRepository:
+    """Test cases for ProviderModelRepository."""
+
+    def test_get_by_provider_is_lazy_by_default(self, mock_db):
+        """Test get_by_provider doesn't eager-load providers unless asked."""
+        ProviderModelRepository(mock_db).get_by_provider(uuid.uuid4())
+
+        mock_db.query.return_value.options.assert_not_called()
+
+    def test_get_by_provider_selectin_loads_provider(self, mock_db):
+        """Test get_by_provider can load providers in one IN query."""
+        with patch.object(provider_repository, "selectinload") as mock_selectinload:
+            ProviderModelRepository(mock_db).get_by_provider(uuid.uuid4(), load_provider=True)
+
+        mock_db.query.return_value.options.assert_called_once_with(mock_selectinload.return_value)
+
+    def test_get_by_name_joined_loads_provider(self, mock_db):
+        """Test get_by_name joins the provider into the single-row query."""
+        with patch.object(provider_repository, "joinedload") as mock_joinedload:
+            ProviderModelRepository(mock_db).get_by_name(uuid.uuid4(), "gpt-4o", load_provider=True)
+
+        mock_db.query.return_value.options.assert_called_once_with(mock_joinedload.return_value)
+
+
+class TestProviderUsageRepository:
+    """Test cases for ProviderUsageRepository."""
+
+    def test_build_usage_row(self):
+        """Test usage rows carry precomputed totals and zero costs."""
+        row = ProviderUsageRepository.build_usage_row(**usage_kwargs())
+
+        assert row["tokens_total"] == 15
+        assert row["cost_total"] == 0
+        assert row["status"] == "success"
+
+    def test_track_usage_skips_refresh(self, usage_repo, mock_db):
+        """Test track_usage doesn't reload the record after commit."""
+        usage = usage_repo.track_usage(**usage_kwargs())
+
+        assert isinstance(usage, ProviderUsage)
+        assert usage.tokens_total == 15
+        mock_db.add.assert_called_once_with(usage)
+        mock_db.commit.assert_called_once()
+        mock_db.refresh.assert_not_called()
+
+    def test_track_usage_bulk(self, usage_repo, mock_db):
+        """Test many rows are written in one transaction."""
+        rows = [ProviderUsageRepository.build_usage_row(**usage_kwargs()) for _ in range(3)]
+
+        assert usage_repo.track_usage_bulk(rows) == 3
+        mock_db.bulk_insert_mappings.assert_called_once_with(ProviderUsage, rows)
+        mock_db.commit.assert_called_once()
+
+    def test_track_usage_bulk_empty(self, usage_repo, mock_db):
+        """Test an empty batch touches nothing."""
+        assert usage_repo.track_usage_bulk([]) == 0
+        mock_db.bulk_insert_mappings.assert_not_called()
+        mock_db.commit.assert_not_called()
+
+
+class TestUsageFlusher:
+    """Test cases for UsageFlusher."""
+
+    @pytest.mark.asyncio
+    async def test_flush_batches_rows(self):
+        """Test queued rows are written in batch_size chunks."""
+        db = Mock(spec=Session)
+        flusher = UsageFlusher(lambda: db, batch_size=2, flush_interval=0.01)
+
+        for _ in range(3):
+            flusher.submit(**usage_kwargs())
+        await flusher.flush()
+
+        batch_sizes = [len(c.args[1]) for c in db.bulk_insert_mappings.call_args_list]
+        assert batch_sizes == [2, 1]
+        assert db.commit.call_count == 2
+        assert db.close.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_flush_continues_after_failed_batch(self):
+        """Test a batch that fails to write is logged and later batches still run."""
+        db = Mock(spec=Session)
+        db.bulk_insert_mappings.side_effect = [ConnectionError("database unavailable"), None]
+        flusher = UsageFlusher(lambda: db, batch_size=1, flush_interval=0.01)
+
+        flusher.submit(**usage_kwargs())
+        flusher.submit(**usage_kwargs())
+        await flusher.flush()
+
+        assert db.bulk_insert_mappings.call_count == 2
+        assert db.commit.call_count == 1
+        assert db.close.call_count == 2
+
+
+class TestUsageSummary:
+    """Test cases for get_user_usage_summary."""
+
+    def test_summary_from_aggregate_row(self, usage_repo, mock_db):
+        """Test the summary is built from one aggregate row."""
+        query = mock_db.query.return_value
+        query.filter.return_value = query
+        query.one.return_value = (150, 0, 4, 1)
+
+        summary = usage_repo.get_user_usage_summary(uuid.uuid4(), provider_id=uuid.uuid4())
+
+        assert summary == {
+            "total_tokens": 150,
+            "total_cost": 0.0,
+            "request_count": 4,
+            "error_count": 1,
+            "success_rate": 0.75,
+        }
+        assert query.filter.call_count == 2
+        query.all.assert_not_called()
+
+    def test_summary_without_usage(self, usage_repo, mock_db):
+        """Test a user with no usage gets zeroed totals."""
+        query = mock_db.query.return_value
+        query.filter.return_value = query
+        query.one.return_value = (0, 0, 0, 0)
+
+        summary = usage_repo.get_user_usage_summary(uuid.uuid4())
+
+        assert summary["request_count"] == 0
+        assert summary["success_rate"] == 0
+
+    def test_summary_defaults_to_window(self, usage_repo, mock_db):
+        """Test the summary is limited to the default lookback window."""
+        query = mock_db.query.return_value
+        query.filter.return_value = query
+        query.one.return_value = (0, 0, 0, 0)
+
+        usage_repo.get_user_usage_summary(uuid.uuid4())
+        default_since = query.filter.call_args.args[1].right.value
+        usage_repo.get_user_usage_summary(uuid.uuid4(), since=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        explicit_since = query.filter.call_args.args[1].right.value
+
+        assert datetime.now(timezone.utc) - default_since >= USAGE_SUMMARY_WINDOW
+        assert explicit_since == datetime(2024, 1, 1, tzinfo=timezone.utc)
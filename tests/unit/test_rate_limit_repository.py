@@ -1,12 +1,12 @@
 """Unit tests for rate limit repository."""
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from unittest.mock import Mock, patch, MagicMock, PropertyMock
 import pytest
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
-from utils.repository.rate_limit_repository import RateLimitRepository
+from utils.repository.rate_limit_repository import RateLimitRepository, _SUM_USAGE
 
 
 class MockColumn:
@@ -22,6 +22,9 @@ class MockColumn:
     
     def __eq__(self, other):
         return f"{self.name} == {other}"
+    
+    def __add__(self, other):
+        return f"{self.name} + {other}"
 
 
 class MockRateLimit:
@@ -31,6 +34,7 @@ class MockRateLimit:
     endpoint = MockColumn('endpoint')
     request_count = MockColumn('request_count')
     period_start = MockColumn('period_start')
+    period_hour = MockColumn('period_hour')
     
     def __init__(self, **kwargs):
         self.id = kwargs.get('id', uuid.uuid4())
@@ -67,39 +71,29 @@ class TestRateLimitRepository:
         period_hours = 1
         expected_count = 42
         
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        mock_query.scalar.return_value = expected_count
-        mock_db.query.return_value = mock_query
-        
-        with patch('utils.repository.rate_limit_repository.datetime') as mock_datetime:
-            with patch('utils.repository.rate_limit_repository.func') as mock_func:
-                now = datetime(2024, 1, 1, 12, 0, 0)
-                mock_datetime.now.return_value = now
-                mock_func.sum.return_value = "SUM(request_count)"
-                
-                result = rate_limit_repo.get_current_usage(user_id, endpoint, period_hours)
-                
-                assert result == expected_count
-                mock_db.query.assert_called_once()
-                mock_query.filter.assert_called_once()
+        mock_db.scalar.return_value = expected_count
+        
+        with patch('utils.repository.rate_limit_repository.current_hour_bucket', return_value=1000):
+            result = rate_limit_repo.get_current_usage(user_id, endpoint, period_hours)
+        
+        assert result == expected_count
+        mock_db.scalar.assert_called_once_with(
+            _SUM_USAGE,
+            {"user_id": user_id, "endpoint": endpoint, "since_hour": 1000}
+        )
     
     def test_get_current_usage_no_records(self, rate_limit_repo, mock_db):
         """Test getting current usage when no records exist."""
         user_id = uuid.uuid4()
         endpoint = "/api/chat"
         
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        mock_query.scalar.return_value = None
-        mock_db.query.return_value = mock_query
+        # COALESCE in the statement turns an empty SUM into 0
+        mock_db.scalar.return_value = 0
         
-        with patch('utils.repository.rate_limit_repository.func') as mock_func:
-            mock_func.sum.return_value = "SUM(request_count)"
-            
-            result = rate_limit_repo.get_current_usage(user_id, endpoint)
-            
-            assert result == 0
+        result = rate_limit_repo.get_current_usage(user_id, endpoint)
+        
+        assert result == 0
+        assert "coalesce" in str(_SUM_USAGE)
     
     def test_get_current_usage_custom_period(self, rate_limit_repo, mock_db):
         """Test getting current usage with custom period."""
@@ -108,139 +102,88 @@ class TestRateLimitRepository:
         period_hours = 24
         expected_count = 100
         
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        mock_query.scalar.return_value = expected_count
-        mock_db.query.return_value = mock_query
-        
-        with patch('utils.repository.rate_limit_repository.datetime') as mock_datetime:
-            with patch('utils.repository.rate_limit_repository.func') as mock_func:
-                now = datetime(2024, 1, 2, 12, 0, 0)
-                mock_datetime.now.return_value = now
-                mock_func.sum.return_value = "SUM(request_count)"
-                
-                result = rate_limit_repo.get_current_usage(user_id, endpoint, period_hours)
-                
-                assert result == expected_count
-    
-    def test_increment_usage_existing_record(self, rate_limit_repo, mock_db):
-        """Test incrementing usage for existing record."""
-        user_id = uuid.uuid4()
-        endpoint = "/api/chat"
-        current_hour = datetime(2024, 1, 1, 12, 0, 0)
+        mock_db.scalar.return_value = expected_count
         
-        existing_record = MockRateLimit(
-            user_id=user_id,
-            endpoint=endpoint,
-            request_count=5,
-            period_start=current_hour
-        )
+        with patch('utils.repository.rate_limit_repository.current_hour_bucket', return_value=1000):
+            result = rate_limit_repo.get_current_usage(user_id, endpoint, period_hours)
         
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        mock_query.first.return_value = existing_record
-        mock_db.query.return_value = mock_query
-        
-        with patch('utils.repository.rate_limit_repository.datetime') as mock_datetime:
-            mock_datetime.now.return_value = current_hour
-            
-            rate_limit_repo.increment_usage(user_id, endpoint)
-            
-            assert existing_record.request_count == 6
-            mock_db.commit.assert_called_once()
+        assert result == expected_count
+        assert mock_db.scalar.call_args.args[1]["since_hour"] == 977
     
-    def test_increment_usage_new_record(self, rate_limit_repo, mock_db):
-        """Test incrementing usage for new record."""
+    def test_increment_usage_upserts(self, rate_limit_repo, mock_db):
+        """Test incrementing usage issues a single upsert for the current hour."""
         user_id = uuid.uuid4()
         endpoint = "/api/chat"
-        current_hour = datetime(2024, 1, 1, 12, 0, 0)
+        current_hour = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
         
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        mock_query.first.return_value = None
-        mock_db.query.return_value = mock_query
-        
-        with patch('utils.repository.rate_limit_repository.datetime') as mock_datetime:
-            mock_datetime.now.return_value = datetime(2024, 1, 1, 12, 30, 45)
+        with patch('utils.repository.rate_limit_repository.time.time', return_value=current_hour.timestamp()), \
+             patch('utils.repository.rate_limit_repository.pg_insert') as mock_insert:
+            rate_limit_repo.increment_usage(user_id, endpoint)
             
-            with patch.object(rate_limit_repo, 'create') as mock_create:
-                rate_limit_repo.increment_usage(user_id, endpoint)
-                
-                mock_create.assert_called_once_with(
-                    user_id=user_id,
-                    endpoint=endpoint,
-                    request_count=1,
-                    period_start=current_hour
-                )
+            mock_insert.assert_called_once_with(MockRateLimit)
+            mock_insert.return_value.values.assert_called_once_with(
+                user_id=user_id,
+                endpoint=endpoint,
+                request_count=1,
+                period_hour=473364,
+                period_start=current_hour
+            )
+            upsert = mock_insert.return_value.values.return_value.on_conflict_do_update
+            assert upsert.call_args[1] == {
+                'index_elements': ["user_id", "endpoint", "period_hour"],
+                'set_': {'request_count': "request_count + 1"}
+            }
+            mock_db.execute.assert_called_once_with(upsert.return_value)
+            mock_db.query.assert_not_called()
+            mock_db.commit.assert_called_once()
     
     def test_increment_usage_handles_minute_seconds(self, rate_limit_repo, mock_db):
         """Test that increment_usage properly truncates to hour start."""
         user_id = uuid.uuid4()
         endpoint = "/api/chat"
         
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        mock_query.first.return_value = None
-        mock_db.query.return_value = mock_query
-        
-        with patch('utils.repository.rate_limit_repository.datetime') as mock_datetime:
-            # Current time with minutes and seconds
-            current_time = datetime(2024, 1, 1, 12, 45, 30, 123456)
-            mock_datetime.now.return_value = current_time
+        # Current time with minutes and seconds
+        current_time = datetime(2024, 1, 1, 12, 45, 30, 123456, tzinfo=timezone.utc)
+        with patch('utils.repository.rate_limit_repository.time.time', return_value=current_time.timestamp()), \
+             patch('utils.repository.rate_limit_repository.pg_insert') as mock_insert:
+            rate_limit_repo.increment_usage(user_id, endpoint)
             
-            with patch.object(rate_limit_repo, 'create') as mock_create:
-                rate_limit_repo.increment_usage(user_id, endpoint)
-                
-                # Should truncate to hour start
-                expected_hour = datetime(2024, 1, 1, 12, 0, 0)
-                mock_create.assert_called_once()
-                call_args = mock_create.call_args[1]
-                assert call_args['period_start'] == expected_hour
+            # Should truncate to hour start
+            expected_hour = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+            call_args = mock_insert.return_value.values.call_args[1]
+            assert call_args['period_hour'] == 473364
+            assert call_args['period_start'] == expected_hour
     
     def test_clean_old_records(self, rate_limit_repo, mock_db):
         """Test cleaning old records."""
         hours = 24
         deleted_count = 10
+        mock_db.execute.return_value = Mock(rowcount=deleted_count)
         
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        mock_query.delete.return_value = deleted_count
-        mock_db.query.return_value = mock_query
-        
-        with patch('utils.repository.rate_limit_repository.datetime') as mock_datetime:
-            now = datetime(2024, 1, 2, 12, 0, 0)
-            mock_datetime.now.return_value = now
-            
+        with patch('utils.repository.rate_limit_repository.current_hour_bucket', return_value=1000):
             result = rate_limit_repo.clean_old_records(hours)
             
             assert result == deleted_count
-            mock_query.delete.assert_called_once_with(synchronize_session=False)
+            mock_db.execute.assert_called_once()
+            params = mock_db.execute.call_args[0][1]
+            assert params == {"threshold_hour": 976, "batch_size": 10_000}
+            # Legacy rows without an hour bucket are cleaned up as well
+            assert "period_hour IS NULL" in str(mock_db.execute.call_args[0][0])
             mock_db.commit.assert_called_once()
     
-    def test_clean_old_records_custom_hours(self, rate_limit_repo, mock_db):
-        """Test cleaning old records with custom hours."""
-        hours = 48
-        deleted_count = 25
-        
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        mock_query.delete.return_value = deleted_count
-        mock_db.query.return_value = mock_query
-        
-        with patch('utils.repository.rate_limit_repository.datetime') as mock_datetime:
-            now = datetime(2024, 1, 3, 12, 0, 0)
-            mock_datetime.now.return_value = now
-            
-            result = rate_limit_repo.clean_old_records(hours)
-            
-            assert result == deleted_count
+    def test_clean_old_records_in_batches(self, rate_limit_repo, mock_db):
+        """Test cleaning deletes batch by batch until a short batch."""
+        mock_db.execute.side_effect = [Mock(rowcount=100), Mock(rowcount=100), Mock(rowcount=25)]
+        
+        result = rate_limit_repo.clean_old_records(batch_size=100)
+        
+        assert result == 225
+        assert mock_db.execute.call_count == 3
+        assert mock_db.commit.call_count == 3
     
     def test_clean_old_records_none_deleted(self, rate_limit_repo, mock_db):
         """Test cleaning when no records are old enough."""
-        mock_query = Mock()
-        mock_query.filter.return_value = mock_query
-        mock_query.delete.return_value = 0
-        mock_db.query.return_value = mock_query
+        mock_db.execute.return_value = Mock(rowcount=0)
         
         result = rate_limit_repo.clean_old_records()
         
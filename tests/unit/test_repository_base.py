@@ -3,8 +3,9 @@ Unit tests for base repository class
 """
 import pytest
 from unittest.mock import Mock, MagicMock, patch, call
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy import Column, ForeignKey, Integer, String, create_engine
+from sqlalchemy.exc import InvalidRequestError, SQLAlchemyError
+from sqlalchemy.orm import Session, declarative_base, relationship, selectinload
 
 from src.utils.repository.base import BaseRepository
 
@@ -19,6 +20,7 @@ class MockModel:
     id = None
     name = None
     value = None
+    __table__ = Mock(columns={"id", "name", "value"})
 
 
 class TestBaseRepository:
@@ -53,25 +55,20 @@ class TestBaseRepository:
         """Test get method when record is found"""
         # Setup mock
         mock_record = Mock(id=1, name="test")
-        mock_query = Mock()
-        mock_query.filter.return_value.first.return_value = mock_record
-        mock_db.query.return_value = mock_query
+        mock_db.get.return_value = mock_record
         
         # Call method
         result = repository.get(1)
         
         # Assertions
         assert result == mock_record
-        mock_db.query.assert_called_once_with(MockModel)
-        mock_query.filter.assert_called_once()
-        mock_query.filter.return_value.first.assert_called_once()
+        mock_db.get.assert_called_once_with(MockModel, 1)
+        mock_db.query.assert_not_called()
     
     def test_get_not_found(self, repository, mock_db):
         """Test get method when record is not found"""
         # Setup mock
-        mock_query = Mock()
-        mock_query.filter.return_value.first.return_value = None
-        mock_db.query.return_value = mock_query
+        mock_db.get.return_value = None
         
         # Call method
         result = repository.get(999)
@@ -83,26 +80,63 @@ class TestBaseRepository:
         """Test get_by_field method when record is found"""
         # Setup mock
         mock_record = Mock(name="test_name")
-        mock_query = Mock()
-        mock_query.filter.return_value.first.return_value = mock_record
-        mock_db.query.return_value = mock_query
+        mock_db.scalars.return_value.first.return_value = mock_record
         
-        # Call method (no need to patch getattr for simple mock)
-        result = repository.get_by_field("name", "test_name")
+        # Call method
+        with patch("src.utils.repository.base._select_by_field") as mock_select:
+            result = repository.get_by_field("name", "test_name")
         
         # Assertions
         assert result == mock_record
-        mock_db.query.assert_called_once_with(MockModel)
+        mock_select.assert_called_once_with(MockModel, "name")
+        mock_db.scalars.assert_called_once_with(mock_select.return_value, {"value": "test_name"})
+    
+    def test_get_by_field_reuses_statement(self):
+        """Test the lookup statement is built once per model field"""
+        with patch("src.utils.repository.base.select") as mock_select, \
+                patch("src.utils.repository.base.bindparam"), \
+                patch.dict("src.utils.repository.base._field_select_stmts", clear=True):
+            from src.utils.repository.base import _select_by_field
+            first = _select_by_field(MockModel, "value")
+            second = _select_by_field(MockModel, "value")
+        
+        assert first is second
+        mock_select.assert_called_once_with(MockModel)
+    
+    def test_get_by_field_repeat_uses_identity_map(self, repository, mock_db):
+        """Test a repeated get_by_field in the same session skips the query"""
+        mock_record = Mock(id=7)
+        mock_record.name = "test_name"
+        mock_db.scalars.return_value.first.return_value = mock_record
+        mock_db.get.return_value = mock_record
+        
+        with patch("src.utils.repository.base._select_by_field"):
+            first = repository.get_by_field("name", "test_name")
+            second = repository.get_by_field("name", "test_name")
+        
+        assert first == second == mock_record
+        mock_db.scalars.assert_called_once()
+        mock_db.get.assert_called_once_with(MockModel, 7)
+    
+    def test_exists_by_field(self, repository, mock_db):
+        """Test exists_by_field runs an EXISTS query instead of loading a row"""
+        mock_db.query.return_value.scalar.return_value = True
+        
+        with patch('src.utils.repository.base.exists') as mock_exists:
+            result = repository.exists_by_field("name", "test_name")
+        
+        assert result is True
+        mock_db.query.assert_called_once_with(mock_exists.return_value.where.return_value)
+        mock_db.query.return_value.first.assert_not_called()
     
     def test_get_by_field_not_found(self, repository, mock_db):
         """Test get_by_field method when record is not found"""
         # Setup mock
-        mock_query = Mock()
-        mock_query.filter.return_value.first.return_value = None
-        mock_db.query.return_value = mock_query
+        mock_db.scalars.return_value.first.return_value = None
         
         # Call method
-        result = repository.get_by_field("name", "nonexistent")
+        with patch("src.utils.repository.base._select_by_field"):
+            result = repository.get_by_field("name", "nonexistent")
         
         # Assertions
         assert result is None
@@ -145,15 +179,20 @@ class TestBaseRepository:
         # Setup mock
         test_data = {"name": "test", "value": 42}
         
+        mock_record = Mock(**test_data)
+        mock_db.scalars.return_value.one.return_value = mock_record
+        
         # Call method
-        result = repository.create(**test_data)
+        with patch("src.utils.repository.base.insert") as mock_insert:
+            result = repository.create(**test_data)
         
         # Assertions
-        assert result.name == "test"
-        assert result.value == 42
-        mock_db.add.assert_called_once()
+        assert result == mock_record
+        mock_insert.assert_called_once_with(MockModel)
+        mock_insert.return_value.values.assert_called_once_with(name="test", value=42)
+        mock_insert.return_value.values.return_value.returning.assert_called_once_with(MockModel)
         mock_db.commit.assert_called_once()
-        mock_db.refresh.assert_called_once()
+        mock_db.refresh.assert_not_called()
         mock_db.rollback.assert_not_called()
     
     def test_create_failure(self, repository, mock_db):
@@ -162,7 +201,7 @@ class TestBaseRepository:
         mock_db.commit.side_effect = SQLAlchemyError("Database error")
         
         # Call method and expect exception
-        with pytest.raises(SQLAlchemyError):
+        with patch("src.utils.repository.base.insert"), pytest.raises(SQLAlchemyError):
             repository.create(name="test")
         
         # Assertions
@@ -171,54 +210,62 @@ class TestBaseRepository:
     def test_update_existing_record(self, repository, mock_db):
         """Test updating an existing record"""
         # Setup mock
-        mock_record = Mock(id=1, name="old_name", value=10)
-        repository.get = Mock(return_value=mock_record)
+        mock_record = Mock(id=1, name="new_name", value=20)
+        mock_db.scalars.return_value.first.return_value = mock_record
         
         # Call method
-        result = repository.update(1, name="new_name", value=20)
+        with patch("src.utils.repository.base.update") as mock_update:
+            result = repository.update(1, name="new_name", value=20)
         
         # Assertions
         assert result == mock_record
-        assert mock_record.name == "new_name"
-        assert mock_record.value == 20
+        mock_update.return_value.where.return_value.values.assert_called_once_with(name="new_name", value=20)
+        mock_db.scalars.assert_called_once()
         mock_db.commit.assert_called_once()
-        mock_db.refresh.assert_called_once_with(mock_record)
+        mock_db.query.assert_not_called()
     
     def test_update_nonexistent_record(self, repository, mock_db):
         """Test updating a non-existent record"""
         # Setup mock
-        repository.get = Mock(return_value=None)
+        mock_db.scalars.return_value.first.return_value = None
         
         # Call method
-        result = repository.update(999, name="new_name")
+        with patch("src.utils.repository.base.update"):
+            result = repository.update(999, name="new_name")
         
         # Assertions
         assert result is None
-        mock_db.commit.assert_not_called()
     
     def test_update_with_none_values(self, repository, mock_db):
-        """Test update skips None values"""
-        # Setup mock
-        mock_record = Mock(id=1, name="old_name", value=10)
-        repository.get = Mock(return_value=mock_record)
-        
+        """Test update skips None values and unknown fields"""
         # Call method with None value
-        result = repository.update(1, name="new_name", value=None)
+        with patch("src.utils.repository.base.update") as mock_update:
+            repository.update(1, name="new_name", value=None, unknown="x")
         
         # Assertions
-        assert mock_record.name == "new_name"
-        assert mock_record.value == 10  # Should not be changed
+        mock_update.return_value.where.return_value.values.assert_called_once_with(name="new_name")
+    
+    def test_update_without_values(self, repository, mock_db):
+        """Test update with nothing to change returns the current record"""
+        mock_record = Mock(id=1)
+        repository.get = Mock(return_value=mock_record)
+        
+        with patch("src.utils.repository.base.update") as mock_update:
+            result = repository.update(1, value=None)
+        
+        assert result == mock_record
+        mock_update.assert_not_called()
+        mock_db.commit.assert_not_called()
     
     def test_update_failure(self, repository, mock_db):
         """Test update with database error"""
         # Setup mock
-        mock_record = Mock(id=1)
-        repository.get = Mock(return_value=mock_record)
         mock_db.commit.side_effect = SQLAlchemyError("Database error")
         
         # Call method and expect exception
-        with pytest.raises(SQLAlchemyError):
-            repository.update(1, name="new_name")
+        with patch("src.utils.repository.base.update"):
+            with pytest.raises(SQLAlchemyError):
+                repository.update(1, name="new_name")
         
         # Assertions
         mock_db.rollback.assert_called_once()
@@ -226,40 +273,83 @@ class TestBaseRepository:
     def test_delete_existing_record(self, repository, mock_db):
         """Test deleting an existing record"""
         # Setup mock
-        mock_record = Mock(id=1)
-        repository.get = Mock(return_value=mock_record)
+        mock_db.execute.return_value.rowcount = 1
         
         # Call method
-        result = repository.delete(1)
+        with patch("src.utils.repository.base.delete") as mock_delete:
+            result = repository.delete(1)
         
         # Assertions
         assert result is True
-        mock_db.delete.assert_called_once_with(mock_record)
+        mock_delete.assert_called_once_with(MockModel)
+        mock_db.execute.assert_called_once()
         mock_db.commit.assert_called_once()
+        mock_db.query.assert_not_called()
     
     def test_delete_nonexistent_record(self, repository, mock_db):
         """Test deleting a non-existent record"""
         # Setup mock
-        repository.get = Mock(return_value=None)
+        mock_db.execute.return_value.rowcount = 0
         
         # Call method
-        result = repository.delete(999)
+        with patch("src.utils.repository.base.delete"):
+            result = repository.delete(999)
         
         # Assertions
         assert result is False
-        mock_db.delete.assert_not_called()
-        mock_db.commit.assert_not_called()
     
     def test_delete_failure(self, repository, mock_db):
         """Test delete with database error"""
         # Setup mock
-        mock_record = Mock(id=1)
-        repository.get = Mock(return_value=mock_record)
         mock_db.commit.side_effect = SQLAlchemyError("Database error")
         
         # Call method and expect exception
-        with pytest.raises(SQLAlchemyError):
-            repository.delete(1)
+        with patch("src.utils.repository.base.delete"):
+            with pytest.raises(SQLAlchemyError):
+                repository.delete(1)
         
         # Assertions
-        mock_db.rollback.assert_called_once()
\ No newline at end of file
+        mock_db.rollback.assert_called_once()
+
+
+GuardBase = declarative_base()
+
+
+class GuardParent(GuardBase):
+    __tablename__ = "guard_parents"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    children = relationship("GuardChild")
+
+
+class GuardChild(GuardBase):
+    __tablename__ = "guard_children"
+    id = Column(Integer, primary_key=True)
+    parent_id = Column(Integer, ForeignKey("guard_parents.id"))
+
+
+class TestLazyLoadGuard:
+    """Test the conftest raiseload guard against N+1 lazy loads"""
+    
+    @pytest.fixture
+    def session(self):
+        engine = create_engine("sqlite://")
+        GuardBase.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add(GuardParent(id=1, name="parent", children=[GuardChild(id=1)]))
+            session.commit()
+            session.expunge_all()
+            yield session
+    
+    def test_lazy_load_raises(self, session):
+        """Test reading an unloaded relationship fails loudly"""
+        parent = BaseRepository(GuardParent, session).get_by_field("name", "parent")
+        
+        with pytest.raises(InvalidRequestError):
+            parent.children
+    
+    def test_eager_load_allowed(self, session):
+        """Test relationships requested up front still load"""
+        parent = session.query(GuardParent).options(selectinload(GuardParent.children)).one()
+        
+        assert [child.id for child in parent.children] == [1]
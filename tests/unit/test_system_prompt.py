@@ -4,12 +4,36 @@ from unittest.mock import Mock, patch, mock_open, MagicMock
 import json
 import os
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from fastapi import HTTPException
 
+from utils import system_prompt
 from utils.system_prompt import SystemPromptManager
 
 
+@pytest.fixture(autouse=True)
+def clear_file_cache():
+    """Start each test with no cached prompt files or directory state."""
+    system_prompt._file_cache.clear()
+    system_prompt._dirs_ready = False
+    yield
+    system_prompt._file_cache.clear()
+    system_prompt._dirs_ready = False
+
+
+@pytest.fixture
+def mock_replace():
+    """Stub the rename that publishes atomically written files."""
+    with patch('utils.system_prompt.os.replace') as mock:
+        yield mock
+
+
+def file_stat(mtime_ns=1, size=10):
+    """Stat result for a prompt file."""
+    return Mock(st_mtime_ns=mtime_ns, st_size=size)
+
+
 @pytest.fixture
 def mock_config():
     """Mock configuration."""
@@ -67,44 +91,62 @@ class TestSystemPromptManager:
             # Assert
             mock_makedirs.assert_called_once_with("system_prompts", exist_ok=True)
     
+    def test_ensure_directories_once(self, mock_config):
+        """Test repeated path lookups only create the directory once."""
+        with patch('os.makedirs') as mock_makedirs:
+            SystemPromptManager.get_system_prompt_file_path("first")
+            SystemPromptManager.get_system_prompt_file_path("second")
+        
+        mock_makedirs.assert_called_once()
+    
     def test_get_system_prompt_existing_file(self, mock_config):
         """Test getting system prompt from existing file."""
         # Arrange
-        with patch('os.path.exists') as mock_exists:
-            mock_exists.return_value = True
-            with patch('builtins.open', mock_open(read_data="Existing prompt content")):
+        with patch('utils.system_prompt.os.stat', return_value=file_stat()):
+            with patch('builtins.open', mock_open(read_data=b"Existing prompt content")):
                 # Act
                 result = SystemPromptManager.get_system_prompt()
         
         # Assert
         assert result == "Existing prompt content"
     
-    def test_get_system_prompt_create_default(self, mock_config):
+    def test_get_system_prompt_cached_until_file_changes(self, mock_config):
+        """Test the active prompt is re-read only when its mtime changes."""
+        with patch('utils.system_prompt.os.stat', return_value=file_stat()) as mock_stat:
+            with patch('builtins.open', mock_open(read_data=b"First")) as mock_file:
+                assert SystemPromptManager.get_system_prompt() == "First"
+                assert SystemPromptManager.get_system_prompt() == "First"
+                assert mock_file.call_count == 1
+                
+                mock_stat.return_value = file_stat(mtime_ns=2)
+                mock_file.return_value.read.return_value = b"Second"
+                assert SystemPromptManager.get_system_prompt() == "Second"
+                assert mock_file.call_count == 2
+    
+    def test_get_system_prompt_create_default(self, mock_config, mock_replace):
         """Test creating default prompt when file doesn't exist."""
         # Arrange
-        with patch('os.path.exists') as mock_exists:
-            mock_exists.return_value = False
+        with patch('utils.system_prompt.os.stat', side_effect=FileNotFoundError):
             with patch('builtins.open', mock_open()) as mock_file:
                 # Act
                 result = SystemPromptManager.get_system_prompt()
         
         # Assert
         assert result == "You are a helpful AI assistant."
-        mock_file().write.assert_called_with("You are a helpful AI assistant.")
+        mock_file().write.assert_called_with(b"You are a helpful AI assistant.")
+        mock_replace.assert_called_once()
     
     def test_get_system_prompt_error_handling(self, mock_config):
         """Test error handling in get_system_prompt."""
         # Arrange
-        with patch('os.path.exists') as mock_exists:
-            mock_exists.side_effect = Exception("Test error")
-            
+        with patch('utils.system_prompt.os.stat', side_effect=Exception("Test error")):
             # Act
             result = SystemPromptManager.get_system_prompt()
         
         # Assert
         assert result == "You are a helpful AI assistant."
     
-    def test_update_system_prompt_success(self, mock_config):
+    def test_update_system_prompt_success(self, mock_config, mock_replace):
         """Test successful system prompt update."""
         # Arrange
         new_prompt = "Updated prompt content"
@@ -117,7 +159,20 @@ class TestSystemPromptManager:
         assert result["success"] is True
         assert result["prompt"] == new_prompt
         assert "updated successfully" in result["message"]
-        mock_file().write.assert_called_with(new_prompt)
+        mock_file().write.assert_called_with(new_prompt.encode())
+        mock_replace.assert_called_once()
+    
+    def test_update_system_prompt_cache_matches_disk(self, mock_config, mock_replace):
+        """Test the cached prompt after an update is what a read from disk would return."""
+        new_prompt = "\u00a0Updated prompt\u00a0\n"
+        
+        with patch('utils.system_prompt.os.stat', return_value=file_stat()):
+            with patch('builtins.open', mock_open()):
+                SystemPromptManager.update_system_prompt(new_prompt)
+            
+            with patch('builtins.open', mock_open(read_data=new_prompt.encode())) as mock_file:
+                assert SystemPromptManager.get_system_prompt() == "\u00a0Updated prompt\u00a0"
+                mock_file.assert_not_called()
     
     def test_update_system_prompt_invalid_input(self, mock_config):
         """Test update with invalid input."""
@@ -145,9 +200,8 @@ class TestSystemPromptManager:
         """Test getting existing prompts index."""
         # Arrange
         with patch('os.makedirs') as mock_makedirs:
-            with patch('os.path.exists') as mock_exists:
-                mock_exists.return_value = True
-                with patch('builtins.open', mock_open(read_data=json.dumps(sample_prompts_index))):
+            with patch('utils.system_prompt.os.stat', return_value=file_stat()):
+                with patch('builtins.open', mock_open(read_data=json.dumps(sample_prompts_index).encode())):
                     # Act
                     result = SystemPromptManager.get_prompts_index()
         
@@ -156,13 +210,14 @@ class TestSystemPromptManager:
         assert "basic" in result["prompts"]
         assert "code-assistant" in result["prompts"]
     
-    def test_get_prompts_index_create_defaults(self, mock_config):
+    def test_get_prompts_index_create_defaults(self, mock_config, mock_replace):
         """Test creating default prompts index."""
         # Arrange
-        with patch('os.makedirs') as mock_makedirs:
+        with patch('os.makedirs') as mock_makedirs, \
+                patch('utils.system_prompt.os.stat', side_effect=FileNotFoundError):
             with patch('os.path.exists') as mock_exists:
-                # First call for index check, subsequent calls for base_system_prompt.txt paths
-                mock_exists.side_effect = [False, False, False]
+                # Checks for the base_system_prompt.txt paths
+                mock_exists.side_effect = [False, False]
                 
                 # Mock the file operations
                 mock_files = {}
@@ -185,7 +240,7 @@ class TestSystemPromptManager:
         # Verify update_system_prompt was called with basic prompt content
         mock_update.assert_called_once()
     
-    def test_update_prompts_index(self, mock_config, sample_prompts_index):
+    def test_update_prompts_index(self, mock_config, mock_replace, sample_prompts_index):
         """Test updating prompts index."""
         # Arrange
         prompt_id = "new-prompt"
@@ -205,12 +260,74 @@ class TestSystemPromptManager:
                 # Assert
                 # Verify json.dump was called
                 handle = mock_file()
-                written_data = ''.join(call.args[0] for call in handle.write.call_args_list)
+                written_data = b''.join(call.args[0] for call in handle.write.call_args_list)
                 if written_data:  # If data was written
                     parsed = json.loads(written_data)
                     assert prompt_id in parsed["prompts"]
     
-    def test_create_system_prompt_success(self, mock_config):
+    def test_update_prompts_index_keeps_index_in_memory(self, tmp_path, sample_prompts_index):
+        """Test mutations are served from memory instead of re-parsing index.json."""
+        with patch.object(system_prompt, 'INDEX_FILE', str(tmp_path / "index.json")):
+            (tmp_path / "index.json").write_text(json.dumps(sample_prompts_index))
+            
+            with patch.object(system_prompt.json_utils, 'loads', wraps=json.loads) as mock_loads:
+                SystemPromptManager.update_prompts_index("new-prompt", {"name": "New Prompt"})
+                SystemPromptManager.update_prompts_index("other-prompt", {"name": "Other Prompt"})
+                result = SystemPromptManager.get_prompts_index()
+            
+            # Only the first read parses the file
+            assert mock_loads.call_count == 1
+            assert {"new-prompt", "other-prompt"} <= set(result["prompts"])
+            on_disk = json.loads((tmp_path / "index.json").read_text())
+            assert on_disk["prompts"] == result["prompts"]
+    
+    @pytest.mark.skipif(not system_prompt.json_utils.ORJSON_AVAILABLE, reason="orjson not installed")
+    def test_get_prompts_index_parses_large_index_from_mmap(self, tmp_path, sample_prompts_index):
+        """Test large index files are parsed from a memory mapping."""
+        index_path = tmp_path / "index.json"
+        index_path.write_text(json.dumps(sample_prompts_index))
+        
+        with patch.object(system_prompt, 'INDEX_FILE', str(index_path)), \
+                patch.object(system_prompt, '_MMAP_MIN_SIZE', 0), \
+                patch.object(system_prompt.json_utils, 'loads', wraps=system_prompt.json_utils.loads) as mock_loads:
+            result = SystemPromptManager.get_prompts_index()
+        
+        assert result == sample_prompts_index
+        assert isinstance(mock_loads.call_args.args[0], memoryview)
+    
+    def test_file_cache_concurrent_access(self, tmp_path):
+        """Test the file cache stays consistent when used from worker threads."""
+        paths = []
+        for i in range(4):
+            path = tmp_path / f"prompt_{i}.txt"
+            path.write_text(f"prompt {i}")
+            paths.append(str(path))
+        
+        def worker(n):
+            for _ in range(200):
+                path = paths[n % len(paths)]
+                assert system_prompt._read_cached(path, system_prompt._decode_text) == f"prompt {n % len(paths)}"
+                system_prompt._forget(paths[(n + 1) % len(paths)])
+        
+        with patch.object(system_prompt, '_FILE_CACHE_SIZE', 2), \
+                ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(worker, range(8)))
+        
+        assert len(system_prompt._file_cache) <= 2
+    
+    def test_failed_write_keeps_previous_file(self, tmp_path):
+        """Test an interrupted write leaves the old file and no temp files behind."""
+        path = tmp_path / "index.json"
+        path.write_text('{"prompts": {}}')
+        
+        with patch('utils.system_prompt.os.replace', side_effect=OSError("disk full")):
+            with pytest.raises(OSError):
+                system_prompt._write_json(str(path), {"prompts": {"new": {}}})
+        
+        assert json.loads(path.read_text()) == {"prompts": {}}
+        assert [p.name for p in tmp_path.iterdir()] == ["index.json"]
+    
+    def test_create_system_prompt_success(self, mock_config, mock_replace):
         """Test successful prompt creation."""
         # Arrange
         with patch('uuid.uuid4') as mock_uuid:
@@ -246,9 +363,8 @@ class TestSystemPromptManager:
         # Arrange
         prompt_id = "test-prompt"
         
-        with patch('os.path.exists') as mock_exists:
-            mock_exists.return_value = True
-            with patch('builtins.open', mock_open(read_data=json.dumps(sample_prompt_data))):
+        with patch('os.makedirs'), patch('utils.system_prompt.os.stat', return_value=file_stat()):
+            with patch('builtins.open', mock_open(read_data=json.dumps(sample_prompt_data).encode())):
                 # Act
                 result = SystemPromptManager.get_system_prompt_by_id(prompt_id)
         
@@ -260,22 +376,21 @@ class TestSystemPromptManager:
     def test_get_system_prompt_by_id_not_found(self, mock_config):
         """Test getting prompt by ID when not found."""
         # Arrange
-        with patch('os.path.exists') as mock_exists:
-            mock_exists.return_value = False
-            
+        with patch('os.makedirs'), patch('utils.system_prompt.os.stat', side_effect=FileNotFoundError):
             # Act
             result = SystemPromptManager.get_system_prompt_by_id("non-existent")
         
         # Assert
         assert result is None
     
-    def test_update_system_prompt_by_id_success(self, mock_config, sample_prompt_data):
+    def test_update_system_prompt_by_id_success(self, mock_config, mock_replace, sample_prompt_data, sample_prompts_index):
         """Test successful prompt update by ID."""
         # Arrange
         prompt_id = "test-prompt"
         updates = {"name": "Updated Name", "content": "Updated content"}
         
-        with patch.object(SystemPromptManager, 'get_system_prompt_by_id') as mock_get:
+        with patch.object(SystemPromptManager, 'get_system_prompt_by_id') as mock_get, \
+                patch.object(SystemPromptManager, 'get_prompts_index', return_value=sample_prompts_index) as mock_get_index:
             mock_get.return_value = {**sample_prompt_data, "id": prompt_id}
             
             with patch('builtins.open', mock_open()) as mock_file:
@@ -287,7 +402,9 @@ class TestSystemPromptManager:
         assert result["success"] is True
         assert result["prompt"]["name"] == "Updated Name"
         assert result["prompt"]["content"] == "Updated content"
-        mock_update_index.assert_called_once()
+        # The index is loaded once and handed to the writer
+        mock_get_index.assert_called_once()
+        assert mock_update_index.call_args.args[2] is sample_prompts_index
     
     def test_update_system_prompt_by_id_not_found(self, mock_config):
         """Test updating non-existent prompt."""
@@ -302,7 +419,7 @@ class TestSystemPromptManager:
         assert result["success"] is False
         assert "not found" in result["error"]
     
-    def test_delete_system_prompt_success(self, mock_config, sample_prompts_index):
+    def test_delete_system_prompt_success(self, mock_config, mock_replace, sample_prompts_index):
         """Test successful prompt deletion."""
         # Arrange
         prompt_id = "custom-prompt"
@@ -370,20 +487,22 @@ class TestSystemPromptManager:
     
     # HTTP handler tests
     
-    def test_handle_get_active_prompt(self, mock_config):
+    @pytest.mark.asyncio
+    async def test_handle_get_active_prompt(self, mock_config):
         """Test HTTP handler for getting active prompt."""
         # Arrange
         with patch.object(SystemPromptManager, 'get_system_prompt') as mock_get:
             mock_get.return_value = "Active prompt content"
             
             # Act
-            result = SystemPromptManager.handle_get_active_prompt()
+            result = await SystemPromptManager.handle_get_active_prompt()
         
         # Assert
         assert result["success"] is True
         assert result["prompt"] == "Active prompt content"
     
-    def test_handle_update_active_prompt_success(self, mock_config):
+    @pytest.mark.asyncio
+    async def test_handle_update_active_prompt_success(self, mock_config):
         """Test HTTP handler for updating active prompt."""
         # Arrange
         request = {"prompt": "New prompt content"}
@@ -392,37 +511,40 @@ class TestSystemPromptManager:
             mock_update.return_value = {"success": True, "prompt": "New prompt content"}
             
             # Act
-            result = SystemPromptManager.handle_update_active_prompt(request)
+            result = await SystemPromptManager.handle_update_active_prompt(request)
         
         # Assert
         assert result["success"] is True
         mock_update.assert_called_once_with("New prompt content")
     
-    def test_handle_update_active_prompt_missing_field(self):
+    @pytest.mark.asyncio
+    async def test_handle_update_active_prompt_missing_field(self):
         """Test HTTP handler with missing prompt field."""
         # Arrange
         request = {}
         
         # Act & Assert
         with pytest.raises(HTTPException) as exc_info:
-            SystemPromptManager.handle_update_active_prompt(request)
+            await SystemPromptManager.handle_update_active_prompt(request)
         assert exc_info.value.status_code == 400
         assert "Prompt field is required" in str(exc_info.value.detail)
     
-    def test_handle_get_all_prompts(self, mock_config, sample_prompts_index):
+    @pytest.mark.asyncio
+    async def test_handle_get_all_prompts(self, mock_config, sample_prompts_index):
         """Test HTTP handler for getting all prompts."""
         # Arrange
         with patch.object(SystemPromptManager, 'get_prompts_index') as mock_get_index:
             mock_get_index.return_value = sample_prompts_index
             
             # Act
-            result = SystemPromptManager.handle_get_all_prompts()
+            result = await SystemPromptManager.handle_get_all_prompts()
         
         # Assert
         assert result["success"] is True
         assert result["prompts"] == sample_prompts_index["prompts"]
     
-    def test_handle_get_prompt(self, mock_config, sample_prompt_data):
+    @pytest.mark.asyncio
+    async def test_handle_get_prompt(self, mock_config, sample_prompt_data):
         """Test HTTP handler for getting specific prompt."""
         # Arrange
         prompt_id = "test-prompt"
@@ -431,13 +553,14 @@ class TestSystemPromptManager:
             mock_get.return_value = {**sample_prompt_data, "id": prompt_id}
             
             # Act
-            result = SystemPromptManager.handle_get_prompt(prompt_id)
+            result = await SystemPromptManager.handle_get_prompt(prompt_id)
         
         # Assert
         assert result["success"] is True
         assert result["prompt"]["id"] == prompt_id
     
-    def test_handle_get_prompt_not_found(self, mock_config):
+    @pytest.mark.asyncio
+    async def test_handle_get_prompt_not_found(self, mock_config):
         """Test HTTP handler when prompt not found."""
         # Arrange
         with patch.object(SystemPromptManager, 'get_system_prompt_by_id') as mock_get:
@@ -445,10 +568,11 @@ class TestSystemPromptManager:
             
             # Act & Assert
             with pytest.raises(HTTPException) as exc_info:
-                SystemPromptManager.handle_get_prompt("non-existent")
+                await SystemPromptManager.handle_get_prompt("non-existent")
             assert exc_info.value.status_code == 404
     
-    def test_handle_create_prompt(self, mock_config):
+    @pytest.mark.asyncio
+    async def test_handle_create_prompt(self, mock_config):
         """Test HTTP handler for creating prompt."""
         # Arrange
         request = {
@@ -465,7 +589,7 @@ class TestSystemPromptManager:
             }
             
             # Act
-            result = SystemPromptManager.handle_create_prompt(request)
+            result = await SystemPromptManager.handle_create_prompt(request)
         
         # Assert
         assert result["success"] is True
@@ -475,20 +599,22 @@ class TestSystemPromptManager:
             description="New description"
         )
     
-    def test_handle_create_prompt_missing_fields(self):
+    @pytest.mark.asyncio
+    async def test_handle_create_prompt_missing_fields(self):
         """Test HTTP handler with missing required fields."""
         # Act & Assert
         with pytest.raises(HTTPException) as exc_info:
-            SystemPromptManager.handle_create_prompt({"name": "Test"})
+            await SystemPromptManager.handle_create_prompt({"name": "Test"})
         assert exc_info.value.status_code == 400
         assert "Content field is required" in str(exc_info.value.detail)
         
         with pytest.raises(HTTPException) as exc_info:
-            SystemPromptManager.handle_create_prompt({"content": "Test"})
+            await SystemPromptManager.handle_create_prompt({"content": "Test"})
         assert exc_info.value.status_code == 400
         assert "Name field is required" in str(exc_info.value.detail)
     
-    def test_handle_update_prompt(self, mock_config):
+    @pytest.mark.asyncio
+    async def test_handle_update_prompt(self, mock_config):
         """Test HTTP handler for updating prompt."""
         # Arrange
         prompt_id = "test-prompt"
@@ -498,13 +624,14 @@ class TestSystemPromptManager:
             mock_update.return_value = {"success": True, "prompt": {"name": "Updated Name"}}
             
             # Act
-            result = SystemPromptManager.handle_update_prompt(prompt_id, request)
+            result = await SystemPromptManager.handle_update_prompt(prompt_id, request)
         
         # Assert
         assert result["success"] is True
         mock_update.assert_called_once()
     
-    def test_handle_delete_prompt(self, mock_config):
+    @pytest.mark.asyncio
+    async def test_handle_delete_prompt(self, mock_config):
         """Test HTTP handler for deleting prompt."""
         # Arrange
         prompt_id = "test-prompt"
@@ -513,13 +640,14 @@ class TestSystemPromptManager:
             mock_delete.return_value = {"success": True, "message": "Deleted"}
             
             # Act
-            result = SystemPromptManager.handle_delete_prompt(prompt_id)
+            result = await SystemPromptManager.handle_delete_prompt(prompt_id)
         
         # Assert
         assert result["success"] is True
         mock_delete.assert_called_once_with(prompt_id)
     
-    def test_handle_activate_prompt(self, mock_config):
+    @pytest.mark.asyncio
+    async def test_handle_activate_prompt(self, mock_config):
         """Test HTTP handler for activating prompt."""
         # Arrange
         prompt_id = "test-prompt"
@@ -528,7 +656,7 @@ class TestSystemPromptManager:
             mock_activate.return_value = {"success": True, "message": "Activated"}
             
             # Act
-            result = SystemPromptManager.handle_activate_prompt(prompt_id)
+            result = await SystemPromptManager.handle_activate_prompt(prompt_id)
         
         # Assert
         assert result["success"] is True
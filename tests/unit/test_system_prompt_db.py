@@ -2,6 +2,7 @@
 import pytest
 from unittest.mock import Mock, patch, MagicMock, mock_open
 from fastapi import HTTPException
+import json
 import uuid
 from datetime import datetime
 
@@ -181,6 +182,28 @@ class TestSystemPromptManagerDB:
         assert len(result["prompts"]) == 2
         assert str(mock_prompts[0].id) in result["prompts"]
     
+    def test_get_all_prompts_json_cached_by_etag(self, mock_db, mock_repo):
+        """Test the encoded prompt library is reused while its version is unchanged."""
+        prompt = MockSystemPrompt(id=uuid.uuid4(), name="Prompt 1")
+        
+        mock_repo_instance = Mock()
+        mock_repo_instance.get_prompts_version.return_value = (1, datetime(2024, 1, 1))
+        mock_repo_instance.list_prompts.return_value = [prompt]
+        mock_repo_instance.format_prompts_list.return_value = [{"id": str(prompt.id), "name": prompt.name}]
+        mock_repo.return_value = mock_repo_instance
+        
+        with patch.dict('utils.system_prompt_db._prompts_json_cache', clear=True):
+            etag, body = SystemPromptManagerDB.get_all_prompts_json(mock_db)
+            cached_etag, cached_body = SystemPromptManagerDB.get_all_prompts_json(mock_db)
+            
+            mock_repo_instance.get_prompts_version.return_value = (2, datetime(2024, 1, 2))
+            new_etag, _ = SystemPromptManagerDB.get_all_prompts_json(mock_db)
+        
+        assert json.loads(body)["prompts"][str(prompt.id)]["name"] == "Prompt 1"
+        assert (cached_etag, cached_body) == (etag, body)
+        assert new_etag != etag
+        assert mock_repo_instance.list_prompts.call_count == 2
+    
     def test_get_prompt_by_id_uuid(self, mock_db, mock_repo):
         """Test getting prompt by UUID."""
         # Arrange
@@ -234,7 +257,7 @@ class TestSystemPromptManagerDB:
         }
         
         mock_repo_instance = Mock()
-        mock_repo_instance.get_by_name.return_value = None
+        mock_repo_instance.exists_by_name.return_value = False
         mock_repo_instance.create_prompt.return_value = new_prompt
         mock_repo_instance.format_prompt_for_response.return_value = mock_formatted
         mock_repo.return_value = mock_repo_instance
@@ -255,10 +278,8 @@ class TestSystemPromptManagerDB:
     def test_create_prompt_duplicate_name(self, mock_db, mock_repo):
         """Test creating prompt with duplicate name."""
         # Arrange
-        existing_prompt = MockSystemPrompt(name="Existing Prompt")
-        
         mock_repo_instance = Mock()
-        mock_repo_instance.get_by_name.return_value = existing_prompt
+        mock_repo_instance.exists_by_name.return_value = True
         mock_repo.return_value = mock_repo_instance
         
         # Act
@@ -292,7 +313,7 @@ class TestSystemPromptManagerDB:
         
         mock_repo_instance = Mock()
         mock_repo_instance.get.return_value = mock_prompt
-        mock_repo_instance.get_by_name.return_value = None
+        mock_repo_instance.exists_by_name.return_value = False
         mock_repo_instance.update.return_value = mock_updated
         mock_repo_instance.format_prompt_for_response.return_value = mock_formatted
         mock_repo.return_value = mock_repo_instance
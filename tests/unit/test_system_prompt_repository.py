@@ -3,6 +3,7 @@ import uuid
 from datetime import datetime
 from unittest.mock import Mock, patch, MagicMock
 import pytest
+from sqlalchemy import column
 from sqlalchemy.orm import Session
 
 from utils.repository.system_prompt_repository import SystemPromptRepository
@@ -104,6 +105,40 @@ class TestSystemPromptRepository:
         mock_query.offset.assert_called_once_with(2)
         mock_query.limit.assert_called_once_with(2)
     
+    def test_page_prompts(self, system_prompt_repo, mock_db):
+        """Test keyset pagination returns a cursor for full pages."""
+        prompts = [MockSystemPrompt(name=f"Prompt {i}", content=f"Content {i}") for i in range(2)]
+        
+        mock_query = Mock()
+        mock_query.filter.return_value = mock_query
+        mock_query.order_by.return_value = mock_query
+        mock_query.limit.return_value = mock_query
+        mock_query.all.return_value = prompts
+        mock_db.query.return_value = mock_query
+        
+        with patch.object(MockSystemPrompt, "name", column("name")):
+            page, cursor = system_prompt_repo.page_prompts(after_name="Alpha", limit=2)
+        
+        assert page == prompts
+        assert cursor == "Prompt 1"
+        mock_query.filter.assert_called_once()
+        mock_query.offset.assert_not_called()
+        mock_query.limit.assert_called_once_with(2)
+    
+    def test_page_prompts_last_page(self, system_prompt_repo, mock_db):
+        """Test a short page ends pagination."""
+        mock_query = Mock()
+        mock_query.order_by.return_value = mock_query
+        mock_query.offset.return_value = mock_query
+        mock_query.limit.return_value = mock_query
+        mock_query.all.return_value = [MockSystemPrompt(name="Only", content="Content")]
+        mock_db.query.return_value = mock_query
+        
+        page, cursor = system_prompt_repo.page_prompts(limit=2)
+        
+        assert len(page) == 1
+        assert cursor is None
+    
     def test_create_prompt(self, system_prompt_repo):
         """Test creating a prompt."""
         name = "New Prompt"
@@ -224,6 +259,7 @@ class TestSystemPromptRepository:
         assert result[0]["description"] == "Desc 1"
         assert result[1]["name"] == "Prompt 2"
         assert result[1]["description"] == ""
+        assert result[0] == system_prompt_repo.format_prompt_for_response(prompts[0])
     
     def test_format_empty_prompts_list(self, system_prompt_repo):
         """Test formatting empty list of prompts."""
@@ -6,7 +6,7 @@ from unittest.mock import Mock, patch
 from uuid import uuid4
 from sqlalchemy.orm import Session
 
-from src.utils.repository.user_repository import UserRepository, pwd_context
+from src.utils.repository.user_repository import UserRepository, hash_api_key, pwd_context
 
 
 class TestUserRepository:
@@ -57,7 +57,7 @@ class TestUserRepository:
     def test_get_by_api_key(self, repository):
         """Test getting user by API key"""
         # Mock the parent method
-        mock_user = Mock( api_key="test-api-key")
+        mock_user = Mock(api_key_hash=hash_api_key("test-api-key"))
         repository.get_by_field = Mock(return_value=mock_user)
         
         # Call method
@@ -65,7 +65,16 @@ class TestUserRepository:
         
         # Assertions
         assert result == mock_user
-        repository.get_by_field.assert_called_once_with("api_key", "test-api-key")
+        repository.get_by_field.assert_called_once_with("api_key_hash", hash_api_key("test-api-key"))
+    
+    def test_get_by_api_key_not_cached_across_calls(self, repository):
+        """Test each API key lookup goes to the database, so rotated keys stop working"""
+        mock_user = Mock(id=uuid4())
+        repository.get_by_field = Mock(side_effect=[mock_user, None])
+        
+        assert repository.get_by_api_key("test-api-key") == mock_user
+        assert repository.get_by_api_key("test-api-key") is None
+        assert repository.get_by_field.call_count == 2
     
     def test_create_user(self, repository):
         """Test creating a new user"""
@@ -92,9 +101,10 @@ class TestUserRepository:
             username="newuser",
             email="new@example.com",
             hashed_password="hashed_password",
-            api_key="generated-api-key",
+            api_key_hash=hash_api_key("generated-api-key"),
             is_admin=False
         )
+        assert result.api_key == "generated-api-key"
     
     def test_create_admin_user(self, repository):
         """Test creating an admin user"""
@@ -134,7 +144,8 @@ class TestUserRepository:
         assert result is False
         mock_verify.assert_called_once_with("wrongpass", "hashedpass")
     
-    def test_authenticate_user_success(self, repository):
+    @pytest.mark.asyncio
+    async def test_authenticate_user_success(self, repository):
         """Test successful user authentication"""
         # Mock user
         mock_user = Mock()
@@ -144,28 +155,52 @@ class TestUserRepository:
         # Mock methods
         repository.get_by_username = Mock(return_value=mock_user)
         repository.verify_password = Mock(return_value=True)
+        repository.needs_rehash = Mock(return_value=False)
         
         # Call method
-        result = repository.authenticate_user("testuser", "correctpass")
+        result = await repository.authenticate_user("testuser", "correctpass")
         
         # Assertions
         assert result == mock_user
         repository.get_by_username.assert_called_once_with("testuser")
         repository.verify_password.assert_called_once_with("correctpass", "hashed_password")
     
-    def test_authenticate_user_not_found(self, repository):
+    @pytest.mark.asyncio
+    async def test_authenticate_user_upgrades_hash(self, repository):
+        """Test a deprecated password hash is replaced on successful login"""
+        mock_user = Mock(id=uuid4(), hashed_password="old_hash", is_active=True)
+        upgraded_user = Mock()
+        
+        repository.get_by_username = Mock(return_value=mock_user)
+        repository.verify_password = Mock(return_value=True)
+        repository.needs_rehash = Mock(return_value=True)
+        repository.update = Mock(return_value=upgraded_user)
+        
+        with patch.object(pwd_context, 'hash', return_value="new_hash"):
+            result = await repository.authenticate_user("testuser", "correctpass")
+        
+        assert result == upgraded_user
+        repository.update.assert_called_once_with(mock_user.id, hashed_password="new_hash")
+    
+    @pytest.mark.asyncio
+    async def test_authenticate_user_not_found(self, repository):
         """Test authentication when user not found"""
         # Mock methods
         repository.get_by_username = Mock(return_value=None)
+        repository.verify_password = Mock(return_value=False)
         
         # Call method
-        result = repository.authenticate_user("nonexistent", "password")
+        with patch('src.utils.repository.user_repository.DUMMY_HASH', "dummy_hash"):
+            result = await repository.authenticate_user("nonexistent", "password")
         
         # Assertions
         assert result is None
         repository.get_by_username.assert_called_once_with("nonexistent")
+        # A missing user still pays for a password check
+        repository.verify_password.assert_called_once_with("password", "dummy_hash")
     
-    def test_authenticate_user_wrong_password(self, repository):
+    @pytest.mark.asyncio
+    async def test_authenticate_user_wrong_password(self, repository):
         """Test authentication with wrong password"""
         # Mock user
         mock_user = Mock()
@@ -176,13 +211,14 @@ class TestUserRepository:
         repository.verify_password = Mock(return_value=False)
         
         # Call method
-        result = repository.authenticate_user("testuser", "wrongpass")
+        result = await repository.authenticate_user("testuser", "wrongpass")
         
         # Assertions
         assert result is None
         repository.verify_password.assert_called_once_with("wrongpass", "hashed_password")
     
-    def test_authenticate_user_inactive(self, repository):
+    @pytest.mark.asyncio
+    async def test_authenticate_user_inactive(self, repository):
         """Test authentication with inactive user"""
         # Mock user
         mock_user = Mock()
@@ -194,7 +230,7 @@ class TestUserRepository:
         repository.verify_password = Mock(return_value=True)
         
         # Call method
-        result = repository.authenticate_user("testuser", "correctpass")
+        result = await repository.authenticate_user("testuser", "correctpass")
         
         # Assertions
         assert result is None
@@ -213,7 +249,8 @@ class TestUserRepository:
         # Assertions
         assert result == mock_user
         mock_gen.assert_called_once()
-        repository.update.assert_called_once_with(user_id, api_key="new-api-key")
+        repository.update.assert_called_once_with(user_id, api_key_hash=hash_api_key("new-api-key"))
+        assert result.api_key == "new-api-key"
     
     def test_generate_api_key(self, repository):
         """Test API key generation"""